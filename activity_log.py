@@ -0,0 +1,87 @@
+"""
+Activity log for the Keep Awake Utility.
+A fixed-capacity ring of compact records (monotonic time, action, dx/dy)
+kept in preallocated arrays. Appending writes one slot and bumps a
+counter; nothing is formatted until the log is displayed. There is a
+single writer (the scheduler thread) and readers never take a lock:
+each slot carries the number of the record in it, cleared while the
+writer rewrites the slot, and a reader keeps only the records it copied
+whose slot still had that number before and after the copy.
+"""
+
+import time
+from array import array
+
+from clock import SYSTEM_CLOCK
+from input_inject import KEY, MOUSE
+
+DEFAULT_CAPACITY = 128
+
+# Action codes stored in the ring
+ACTION_CODES = {MOUSE: 0, KEY: 1}
+ACTION_NAMES = {code: action for action, code in ACTION_CODES.items()}
+
+
+class ActivityLog:
+    def __init__(self, capacity=DEFAULT_CAPACITY, clock=SYSTEM_CLOCK):
+        """Keep the last capacity injections; clock supplies monotonic and wall time"""
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.clock = clock
+        self.wall_clock = getattr(clock, "wall", time.time)
+        self._times = array("d", bytes(8 * capacity))
+        self._actions = array("b", bytes(capacity))
+        self._dx = array("b", bytes(capacity))
+        self._dy = array("b", bytes(capacity))
+        # Record number held by each slot, -1 while empty or being rewritten
+        self._seq = array("q", [-1]) * capacity
+        # Total records ever written; the slot for record n is n % capacity
+        self._count = 0
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def append(self, action, dx=0, dy=0, at=None):
+        """Record one injection; called from the single writer thread"""
+        count = self._count
+        slot = count % self.capacity
+        self._seq[slot] = -1
+        self._times[slot] = self.clock() if at is None else at
+        self._actions[slot] = ACTION_CODES[action]
+        self._dx[slot] = dx
+        self._dy[slot] = dy
+        # Publish the slot only after it is fully written
+        self._seq[slot] = count
+        self._count = count + 1
+
+    def recent(self, n=5):
+        """The last n records as (time, action, dx, dy), oldest first"""
+        end = self._count
+        start = max(0, end - min(n, self.capacity))
+        records = []
+        for index in range(start, end):
+            slot = index % self.capacity
+            if self._seq[slot] != index:
+                continue
+            record = (self._times[slot], self._actions[slot], self._dx[slot], self._dy[slot])
+            # The writer rewrote the slot while it was being copied (it overwrites oldest first)
+            if self._seq[slot] != index:
+                continue
+            records.append((record[0], ACTION_NAMES[record[1]], record[2], record[3]))
+        return records
+
+    def format(self, record):
+        at, action, dx, dy = record
+        stamp = self._wall_time(at)
+        if action == MOUSE:
+            return f"[{stamp}] Mouse moved by ({dx}, {dy}) pixels"
+        return f"[{stamp}] Pressed 'Shift' key"
+
+    def formatted(self, n=5):
+        return [self.format(record) for record in self.recent(n)]
+
+    def _wall_time(self, at):
+        # Map the monotonic stamp onto the wall clock as of now
+        wall = self.wall_clock() - (self.clock() - at)
+        return time.strftime("%H:%M:%S", time.localtime(wall))
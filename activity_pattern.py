@@ -0,0 +1,173 @@
+"""
+Activity patterns for the Keep Awake Utility.
+A pattern is an activity type (mouse, keyboard or both), a base interval
+and a jitter distribution. The runner precomputes a batch of gaps and
+actions and schedules each injection at its exact deadline on the shared
+scheduler, so the scheduler thread sleeps straight to the next one.
+Switching patterns swaps the batch in place; no thread is restarted.
+"""
+
+import random
+import threading
+from array import array
+
+from input_inject import KEY, MOUSE
+
+ACTIVITY_TYPES = ["both", "mouse", "keyboard"]
+JITTER_KINDS = ["none", "uniform", "gaussian", "exponential"]
+DEFAULT_INTERVAL = 6.0
+DEFAULT_SPREAD = 0.2
+BATCH_SIZE = 64
+# Shortest gap jitter may produce, and the cap for the long exponential tail
+MIN_GAP = 0.5
+MAX_GAP_FACTOR = 3.0
+
+
+class ActivityPattern:
+    def __init__(self, kind="both", interval=DEFAULT_INTERVAL, jitter="none", spread=DEFAULT_SPREAD):
+        """What to inject and how far apart; spread is the jitter width as a fraction of interval"""
+        if kind not in ACTIVITY_TYPES:
+            raise ValueError(f"Unknown activity type '{kind}'")
+        if jitter not in JITTER_KINDS:
+            raise ValueError(f"Unknown jitter '{jitter}'")
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        self.kind = kind
+        self.interval = float(interval)
+        self.jitter = jitter
+        self.spread = max(0.0, float(spread))
+
+    def max_gap(self):
+        """Longest gap this pattern can produce; the idle gate uses it as its margin"""
+        if self.jitter == "none":
+            return self.interval
+        if self.jitter == "uniform":
+            return self.interval * (1 + self.spread)
+        return self.interval * MAX_GAP_FACTOR
+
+    def _gap(self, rng):
+        if self.jitter == "uniform":
+            gap = self.interval * (1 + rng.uniform(-self.spread, self.spread))
+        elif self.jitter == "gaussian":
+            gap = rng.gauss(self.interval, self.interval * self.spread)
+        elif self.jitter == "exponential":
+            gap = rng.expovariate(1.0 / self.interval)
+        else:
+            return self.interval
+        return min(max(gap, MIN_GAP), self.max_gap())
+
+    def _action(self, rng):
+        if self.kind == "mouse":
+            return MOUSE
+        if self.kind == "keyboard":
+            return KEY
+        return MOUSE if rng.random() < 0.5 else KEY
+
+    def batch(self, rng, size=BATCH_SIZE):
+        """Precompute (gaps, actions) for the next size injections"""
+        gaps = array("d", (self._gap(rng) for _ in range(size)))
+        actions = [self._action(rng) for _ in range(size)]
+        return gaps, actions
+
+    def describe(self):
+        jitter = "" if self.jitter == "none" else f", {self.jitter} jitter ±{self.spread * 100:.0f}%"
+        return f"{self.kind} every {self.interval:g} s{jitter}"
+
+
+class ActivityRunner:
+    def __init__(self, scheduler, pattern, inject, seed=None):
+        """Call inject(action) at each precomputed deadline of pattern"""
+        self.scheduler = scheduler
+        self.pattern = pattern
+        self.inject = inject
+        self.rng = random.Random(seed)
+        self.job = None
+        self.deadline = None
+        self.batches = 0
+        self.fired = 0
+        self._gaps = array("d")
+        self._actions = []
+        self._pos = 0
+        # Bumped on every arm; a tick already popped for an older job must not arm a second chain
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def start(self, first_delay=0.0):
+        """First injection after first_delay, then follow the pattern"""
+        with self._lock:
+            self.scheduler.cancel(self.job)
+            self._refill()
+            self._arm(self.scheduler.clock() + first_delay)
+
+    def stop(self):
+        with self._lock:
+            self.scheduler.cancel(self.job)
+            self.job = None
+
+    def set_pattern(self, pattern):
+        """Switch patterns at runtime; the next injection follows the new pattern"""
+        with self._lock:
+            self.pattern = pattern
+            if self.job is None:
+                return
+            self.scheduler.cancel(self.job)
+            self._refill()
+            self._arm(self.scheduler.clock() + self._gaps[0])
+
+    def _refill(self):
+        self._gaps, self._actions = self.pattern.batch(self.rng)
+        self._pos = 0
+        self.batches += 1
+
+    def _arm(self, deadline):
+        self.deadline = deadline
+        self._generation += 1
+        self.job = self.scheduler.call_at(deadline, self._tick, self._generation)
+
+    def _tick(self, generation):
+        with self._lock:
+            if self.job is None or generation != self._generation:
+                return
+            action = self._actions[self._pos]
+            self._pos += 1
+            if self._pos == len(self._gaps):
+                self._refill()
+            # Anchored to the previous deadline so callback time never stretches the gaps
+            deadline = self.deadline + self._gaps[self._pos]
+            now = self.scheduler.clock()
+            if deadline <= now:
+                deadline = now + self._gaps[self._pos]
+            self._arm(deadline)
+        self.fired += 1
+        self.inject(action)
+
+
+def parse_pattern_args(argv, default=None):
+    """Build an ActivityPattern from --activity=TYPE, --interval=SECS and --jitter=KIND[:SPREAD]"""
+    pattern = default or ActivityPattern()
+    kind, interval, jitter, spread = pattern.kind, pattern.interval, pattern.jitter, pattern.spread
+    for arg in argv:
+        try:
+            if arg.startswith("--activity="):
+                value = arg.split("=", 1)[1]
+                if value not in ACTIVITY_TYPES:
+                    raise ValueError(value)
+                kind = value
+            elif arg.startswith("--interval="):
+                value = float(arg.split("=", 1)[1])
+                if value <= 0:
+                    raise ValueError(value)
+                interval = value
+            elif arg.startswith("--jitter="):
+                value, _, width = arg.split("=", 1)[1].partition(":")
+                if value not in JITTER_KINDS:
+                    raise ValueError(value)
+                spread = float(width) if width else spread
+                jitter = value
+        except ValueError:
+            print(f"Warning: Invalid activity pattern parameter: {arg}")
+    return ActivityPattern(kind, interval, jitter, spread)
+
+
+def has_pattern_args(argv):
+    return any(arg.startswith(("--activity=", "--interval=", "--jitter=")) for arg in argv)
@@ -0,0 +1,344 @@
+"""
+asyncio runtime for the console Keep Awake Utility (--runtime=asyncio).
+AsyncScheduler offers the Scheduler interface on an asyncio event loop, so
+activity ticks, the countdown, the shutdown grace period and every other
+job become loop timer handles on the main thread. AsyncConsoleRuntime reads
+stdin commands on the same loop, so a command and a job never run at the
+same time and stop/cancel drop pending handles immediately, without
+waiting for a scheduler thread to go idle.
+
+Helpers that keep their own thread (journal writer, trigger watcher,
+metrics server) hand jobs to the loop with call_soon_threadsafe. The
+advanced menu still prompts with input(), so it runs on a short-lived
+thread while it is open.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+
+from clock import SYSTEM_CLOCK
+from scheduler import Job, Scheduler
+
+RUNTIMES = ["threads", "asyncio"]
+COMMAND_PROMPT = "\nEnter command (start/stop/timer/status/advanced/exit): "
+
+
+class AsyncScheduler(Scheduler):
+    def __init__(self, loop=None, clock=SYSTEM_CLOCK, name="keep-awake-loop"):
+        """Run jobs on loop (a new event loop by default); VirtualClock needs the threaded Scheduler"""
+        if getattr(clock, "virtual", False):
+            raise ValueError("AsyncScheduler runs in real time; use Scheduler with a VirtualClock")
+        super().__init__(clock, name)
+        self.loop = loop or asyncio.new_event_loop()
+        self._jobs = set()
+        self._jobs_lock = threading.Lock()
+        self._owner = None
+
+    def start(self):
+        """Bind to the calling thread, which must be the one that runs the loop"""
+        if self._running:
+            return
+        self._running = True
+        self._owner = threading.get_ident()
+        self._started_mono = self.clock()
+        self._started_wall = self.wall_clock()
+
+    def stop(self, timeout=1.0):
+        """Cancel every pending job; there is no thread to join"""
+        self._running = False
+        with self._jobs_lock:
+            jobs = list(self._jobs)
+            self._jobs.clear()
+        for job in jobs:
+            self._cancel_handle(job)
+        return True
+
+    def cancel(self, job):
+        """Cancel a pending job; its loop handle is dropped right away"""
+        if job is None:
+            return
+        with self._jobs_lock:
+            self._jobs.discard(job)
+        self._cancel_handle(job)
+
+    def wait_idle(self, timeout=1.0):
+        """On the loop thread nothing else can be running; other threads wait for the current job"""
+        if threading.get_ident() == self._owner:
+            return True
+        with self._idle:
+            return self._idle.wait_for(lambda: self._current is None, timeout)
+
+    def on_thread(self):
+        return not self.is_alive() or self._owner is None or threading.get_ident() == self._owner
+
+    def is_alive(self):
+        return self._running and not self.loop.is_closed()
+
+    def pending(self):
+        with self._jobs_lock:
+            return sum(1 for job in self._jobs if not job.cancelled)
+
+    def next_deadline(self):
+        with self._jobs_lock:
+            deadlines = [job.deadline for job in self._jobs if not job.cancelled]
+        return min(deadlines) if deadlines else None
+
+    def run_due(self):
+        raise RuntimeError("AsyncScheduler jobs run on the event loop")
+
+    def _push(self, deadline, interval, fn, args):
+        job = Job(self, deadline, interval, fn, args)
+        job.handle = None
+        with self._jobs_lock:
+            self._jobs.add(job)
+        self._on_loop(self._arm, job)
+        return job
+
+    def _on_loop(self, fn, *args):
+        # Direct call on the loop thread; other threads must not touch the loop's timer heap
+        if self._owner is None or threading.get_ident() == self._owner:
+            fn(*args)
+        elif not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(fn, *args)
+
+    def _arm(self, job):
+        if job.cancelled:
+            return
+        delay = max(0.0, job.deadline - self.clock())
+        job.handle = self.loop.call_at(self.loop.time() + delay, self._fire_job, job)
+
+    def _cancel_handle(self, job):
+        job.cancelled = True
+        handle = getattr(job, "handle", None)
+        if handle is not None:
+            self._on_loop(handle.cancel)
+
+    def _fire_job(self, job):
+        if job.cancelled:
+            return
+        now = self.clock()
+        drift = max(0.0, now - job.deadline)
+        self.wakeups += 1
+        if job.interval is not None:
+            # Same anchoring as Scheduler: missed periods are skipped, never bunched up
+            job.deadline += job.interval
+            if job.deadline <= now:
+                job.deadline += (int((now - job.deadline) // job.interval) + 1) * job.interval
+            self._arm(job)
+        else:
+            job.cancelled = True
+            with self._jobs_lock:
+                self._jobs.discard(job)
+        with self._idle:
+            self._current = job
+            self._calling = threading.current_thread()
+        self._fire(job, drift)
+
+
+class AsyncConsoleRuntime:
+    def __init__(self, app, lines=None):
+        """Drive app's commands from stdin, or from lines (a list, for tests) when given"""
+        self.app = app
+        self.scheduler = app.scheduler
+        self.loop = app.scheduler.loop
+        self.script = lines
+        self.commands = 0
+        self.interrupted = False
+        self._lines = None
+        self._exit = None
+        self._buffer = ""
+        self._reader_fd = None
+        self._want_line = None
+        self._reader_thread = None
+
+    def run(self, interactive=True):
+        """Run until exit, EOF, SIGTERM or Ctrl+C, then shut the app down"""
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._main(interactive))
+        except KeyboardInterrupt:
+            # Windows, where Ctrl+C cannot be turned into a loop callback
+            self.interrupted = True
+        if self.interrupted:
+            print("\nReceived interrupt signal.")
+            if interactive:
+                self.app.stop_keep_awake()
+        self.app.shutdown()
+        self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        print("Exiting Keep Awake Utility. Goodbye!")
+
+    def request_exit(self, interrupted=False):
+        """End the run; safe to call from a signal handler on the loop"""
+        self.interrupted = self.interrupted or interrupted
+        self._exit.set()
+        self._lines.put_nowait(None)
+
+    async def _main(self, interactive):
+        self._lines = asyncio.Queue()
+        self._exit = asyncio.Event()
+        self._install_signals()
+        if not interactive:
+            print("Running in non-interactive mode. Press Ctrl+C to exit.")
+            await self._exit.wait()
+            return
+        self._start_reading()
+        try:
+            while not self._exit.is_set():
+                command = await self.prompt(COMMAND_PROMPT)
+                if command is None or not await self.handle(command.strip().lower()):
+                    return
+        finally:
+            self._stop_reading()
+
+    def _install_signals(self):
+        try:
+            import signal
+
+            self.loop.add_signal_handler(signal.SIGTERM, self.request_exit)
+            self.loop.add_signal_handler(signal.SIGINT, self.request_exit, True)
+        except (NotImplementedError, RuntimeError, ValueError, AttributeError):
+            # Not on Windows or off the main thread; Ctrl+C then arrives as KeyboardInterrupt
+            pass
+
+    async def prompt(self, text):
+        """The next input line, or None at EOF or exit"""
+        print(text, end="", flush=True)
+        if self.script is not None:
+            # Let due jobs run between scripted commands, as they would while a user types
+            await asyncio.sleep(0)
+            line = self.script.pop(0) if self.script else None
+            if line is not None:
+                print(line)
+            return line
+        if self._want_line is not None:
+            self._want_line.set()
+        return await self._lines.get()
+
+    async def handle(self, command):
+        """Run one command on the loop; False once the session should end"""
+        self.commands += 1
+        app = self.app
+        try:
+            if command == "start":
+                app.start_keep_awake()
+            elif command == "stop":
+                app.stop_keep_awake()
+            elif command == "timer":
+                app.print_timer_options()
+                app.select_timer(await self.prompt("\nSelect a timer option (1-5): ") or "")
+            elif command == "status":
+                app.print_status()
+            elif command == "advanced":
+                await self.run_blocking(app.advanced_features)
+            elif command == "cancel":
+                app.cancel_shutdown()
+            elif command == "exit":
+                if not app.active:
+                    return False
+                confirm = await self.prompt("Keep awake is still active. Are you sure you want to exit? (y/n): ")
+                if (confirm or "").lower() == "y":
+                    app.stop_keep_awake()
+                    return False
+            else:
+                print("Unknown command. Available commands: start, stop, timer, status, advanced, exit")
+        except Exception as e:
+            print(f"Error: {str(e)}")
+        return True
+
+    async def run_blocking(self, fn):
+        """Run a menu that prompts with input() on its own thread, with stdin handed over to it"""
+        self._stop_reading()
+        future = self.loop.create_future()
+
+        def settle(setter, value):
+            if not future.done():
+                setter(value)
+
+        def call():
+            try:
+                result = fn()
+                outcome = (future.set_result, result)
+            except BaseException as e:
+                outcome = (future.set_exception, e)
+            try:
+                self.loop.call_soon_threadsafe(settle, *outcome)
+            except RuntimeError:
+                # The loop already closed after an exit request
+                pass
+
+        threading.Thread(target=call, name="console-menu", daemon=True).start()
+        # An exit request must not wait for a menu still blocked in input()
+        exit_wait = self.loop.create_task(self._exit.wait())
+        try:
+            await asyncio.wait([future, exit_wait], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            exit_wait.cancel()
+            self._start_reading()
+        return future.result() if future.done() else None
+
+    def _start_reading(self):
+        if self.script is not None:
+            return
+        if self._reader_thread is not None:
+            return
+        if sys.platform != "win32":
+            try:
+                fd = sys.stdin.fileno()
+                self.loop.add_reader(fd, self._on_readable, fd)
+                self._reader_fd = fd
+                return
+            except (OSError, ValueError, NotImplementedError, AttributeError):
+                # Regular files and closed stdin cannot be watched; fall back to a reader thread
+                pass
+        # The thread only reads when a prompt asks for a line, so menus can use input() meanwhile
+        self._want_line = threading.Event()
+        self._reader_thread = threading.Thread(target=self._read_lines, name="console-stdin", daemon=True)
+        self._reader_thread.start()
+
+    def _stop_reading(self):
+        if self._reader_fd is not None:
+            self.loop.remove_reader(self._reader_fd)
+            self._reader_fd = None
+
+    def _on_readable(self, fd):
+        try:
+            data = os.read(fd, 4096)
+        except OSError:
+            data = b""
+        if not data:
+            self._stop_reading()
+            if self._buffer:
+                self._lines.put_nowait(self._buffer)
+                self._buffer = ""
+            self._lines.put_nowait(None)
+            return
+        self._buffer += data.decode("utf-8", "replace")
+        *lines, self._buffer = self._buffer.split("\n")
+        for line in lines:
+            self._lines.put_nowait(line.rstrip("\r"))
+
+    def _read_lines(self):
+        while True:
+            self._want_line.wait()
+            self._want_line.clear()
+            line = sys.stdin.readline()
+            if self.loop.is_closed():
+                return
+            self.loop.call_soon_threadsafe(self._lines.put_nowait, line.rstrip("\r\n") if line else None)
+            if not line:
+                return
+
+
+def parse_runtime_arg(argv):
+    """Runtime from --runtime=threads|asyncio (default threads)"""
+    for arg in argv:
+        if arg.startswith("--runtime="):
+            runtime = arg.split("=", 1)[1]
+            if runtime in RUNTIMES:
+                return runtime
+            print(f"Warning: Unknown runtime '{runtime}', using threads")
+    return "threads"
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Idle-cost benchmark for the Keep Awake Utility.
+Launches each mode as a child process with the input simulation and
+shutdown left in their dry/stub forms, waits until it reports keep-awake
+active, then watches it for a fixed window and records:
+
+    startup latency (spawn to active), threads, context switches per
+    second (voluntary ones are wakeups), user+sys CPU time and peak RSS
+
+main.py --non-interactive hands off to the console engine, so it has no
+mode of its own; only `gui` measures main.py's engine, and it is skipped
+when there is no display.
+
+Results are written as JSON, one file per run, so two commits can be
+compared with --compare:
+
+    python benchmark_idle.py --duration=60 --output=bench/before.json
+    python benchmark_idle.py --duration=60 --compare=bench/before.json
+"""
+
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DURATION = 30
+SAMPLE_INTERVAL = 1.0
+STARTUP_TIMEOUT = 30
+# Printed by the console engine once it is active
+ACTIVE_MARKER = "Keep awake functionality started successfully."
+# Flags every mode shares: injection on a fixed pattern, nothing written to the user's data
+COMMON_FLAGS = ["--auto-start", "--inhibit=input", "--idle-threshold=0", "--no-journal", "--no-resume",
+                "--startup-profile"]
+
+MODES = {
+    "console": ["console_keep_awake.py", "--non-interactive"],
+    "console-timer": ["console_keep_awake.py", "--non-interactive", "--timer=10"],
+    "console-asyncio": ["console_keep_awake.py", "--non-interactive", "--runtime=asyncio"],
+    "gui": ["main.py", "--inject=null"],
+}
+
+
+def _has_display():
+    return sys.platform in ("win32", "darwin") or bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+class ProcStatProbe:
+    """Reads /proc/<pid>; Linux only, no dependencies"""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.ticks = os.sysconf("SC_CLK_TCK")
+
+    def sample(self):
+        with open(f"/proc/{self.pid}/status") as f:
+            status = dict(line.split(":", 1) for line in f if ":" in line)
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        # Context switches are counted per thread; threads that already exited are not included
+        voluntary = involuntary = 0
+        for task in os.listdir(f"/proc/{self.pid}/task"):
+            try:
+                with open(f"/proc/{self.pid}/task/{task}/status") as f:
+                    counts = dict(line.split(":", 1) for line in f if "ctxt_switches" in line)
+            except OSError:
+                continue
+            voluntary += int(counts["voluntary_ctxt_switches"])
+            involuntary += int(counts["nonvoluntary_ctxt_switches"])
+        return {
+            "threads": int(status["Threads"]),
+            "rss": int(status["VmRSS"].split()[0]) * 1024,
+            "peak_rss": int(status["VmHWM"].split()[0]) * 1024,
+            "voluntary": voluntary,
+            "involuntary": involuntary,
+            "cpu": (int(fields[11]) + int(fields[12])) / self.ticks,
+        }
+
+
+class PsutilProbe:
+    def __init__(self, pid):
+        import psutil
+
+        self.process = psutil.Process(pid)
+
+    def sample(self):
+        with self.process.oneshot():
+            switches = self.process.num_ctx_switches()
+            times = self.process.cpu_times()
+            memory = self.process.memory_info()
+            return {
+                "threads": self.process.num_threads(),
+                "rss": memory.rss,
+                # Windows reports the real peak; elsewhere the sampled maximum stands in
+                "peak_rss": getattr(memory, "peak_wset", memory.rss),
+                "voluntary": switches.voluntary,
+                "involuntary": switches.involuntary,
+                "cpu": times.user + times.system,
+            }
+
+
+def make_probe(pid):
+    if os.path.exists(f"/proc/{pid}/status"):
+        return ProcStatProbe(pid)
+    if importlib.util.find_spec("psutil") is not None:
+        return PsutilProbe(pid)
+    raise RuntimeError("Needs /proc or psutil to measure the child process")
+
+
+def _read_output(process, lines, active):
+    for line in process.stdout:
+        lines.append(line.rstrip("\n"))
+        if ACTIVE_MARKER in line or "keep-awake active" in line:
+            active.set()
+
+
+def run_mode(name, duration=DEFAULT_DURATION, python=sys.executable):
+    """Launch one mode, wait until it is active, then measure it for duration seconds"""
+    args = [python, "-u"] + [MODES[name][0]] + COMMON_FLAGS + MODES[name][1:]
+    with tempfile.TemporaryDirectory() as scratch:
+        env = dict(os.environ, XDG_DATA_HOME=scratch, XDG_RUNTIME_DIR=scratch, PYTHONDONTWRITEBYTECODE="1")
+        started = time.perf_counter()
+        process = subprocess.Popen(args, cwd=HERE, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                   stderr=subprocess.STDOUT, text=True)
+        lines = []
+        active = threading.Event()
+        reader = threading.Thread(target=_read_output, args=(process, lines, active), daemon=True)
+        reader.start()
+        try:
+            if not active.wait(STARTUP_TIMEOUT) or process.poll() is not None:
+                return {"mode": name, "error": "did not become active", "output": lines[-20:]}
+            startup = time.perf_counter() - started
+            probe = make_probe(process.pid)
+            first = probe.sample()
+            window_start = time.perf_counter()
+            peak_threads, peak_rss = first["threads"], first["peak_rss"]
+            last = first
+            while time.perf_counter() - window_start < duration:
+                time.sleep(min(SAMPLE_INTERVAL, duration))
+                if process.poll() is not None:
+                    return {"mode": name, "error": "exited during the window", "output": lines[-20:]}
+                last = probe.sample()
+                peak_threads = max(peak_threads, last["threads"])
+                peak_rss = max(peak_rss, last["peak_rss"], last["rss"])
+            window = time.perf_counter() - window_start
+        finally:
+            _stop(process)
+            reader.join(2)
+    in_process = None
+    for line in lines:
+        if line.strip().startswith("keep-awake active") and "after launch" in line:
+            in_process = float(line.split()[-4])
+    return {
+        "mode": name,
+        "window_seconds": round(window, 3),
+        "startup_ms": round(startup * 1000.0, 1),
+        "startup_in_process_ms": in_process,
+        "threads": last["threads"],
+        "peak_threads": peak_threads,
+        "wakeups_per_second": round((last["voluntary"] - first["voluntary"]) / window, 3),
+        "context_switches_per_second": round(
+            (last["voluntary"] + last["involuntary"] - first["voluntary"] - first["involuntary"]) / window, 3),
+        "cpu_seconds": round(last["cpu"] - first["cpu"], 4),
+        "cpu_percent": round((last["cpu"] - first["cpu"]) / window * 100.0, 4),
+        "peak_rss_bytes": peak_rss,
+    }
+
+
+def _stop(process):
+    if process.poll() is not None:
+        return
+    # SIGTERM lets the console engine shut down cleanly; Tk just exits
+    process.terminate()
+    try:
+        process.wait(5)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def _commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                                text=True, timeout=5)
+        return result.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_suite(modes, duration):
+    results = {
+        "commit": _commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "duration": duration,
+        "modes": {},
+    }
+    for name in modes:
+        if name == "gui" and not _has_display():
+            results["modes"][name] = {"mode": name, "skipped": "no display"}
+            continue
+        print(f"Running {name} for {duration} s...")
+        results["modes"][name] = run_mode(name, duration)
+    return results
+
+
+# Metrics compared between runs; all of them are better when lower
+COMPARED = ["startup_ms", "peak_threads", "wakeups_per_second", "context_switches_per_second",
+            "cpu_percent", "peak_rss_bytes"]
+
+
+def compare(old, new):
+    """Lines describing how each metric moved from old to new"""
+    lines = []
+    for name, result in new["modes"].items():
+        before = old.get("modes", {}).get(name)
+        if not before or "error" in before or "skipped" in before or "error" in result or "skipped" in result:
+            continue
+        lines.append(f"{name}:")
+        for metric in COMPARED:
+            a, b = before.get(metric), result.get(metric)
+            if a is None or b is None:
+                continue
+            change = f"{(b - a) / a * 100.0:+7.1f}%" if a else "    n/a"
+            lines.append(f"  {metric:30} {a:>14g} -> {b:<14g} {change}")
+    return lines
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    duration = DEFAULT_DURATION
+    modes = list(MODES)
+    output = None
+    baseline = None
+    for arg in argv:
+        if arg.startswith("--duration="):
+            duration = float(arg.split("=", 1)[1])
+        elif arg.startswith("--modes="):
+            modes = [m for m in arg.split("=", 1)[1].split(",") if m]
+            unknown = [m for m in modes if m not in MODES]
+            if unknown:
+                print(f"Error: Unknown mode(s): {', '.join(unknown)}; choose from {', '.join(MODES)}")
+                return 2
+        elif arg.startswith("--output="):
+            output = arg.split("=", 1)[1]
+        elif arg.startswith("--compare="):
+            baseline = arg.split("=", 1)[1]
+    results = run_suite(modes, duration)
+    if output is None:
+        output = os.path.join(HERE, "bench", f"idle-{results['commit'] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    for name, result in results["modes"].items():
+        if "skipped" in result or "error" in result:
+            print(f"{name}: {result.get('skipped') or result.get('error')}")
+            continue
+        print(f"{name}: active after {result['startup_ms']:.0f} ms, {result['peak_threads']} threads, "
+              f"{result['wakeups_per_second']:.2f} wakeups/s, CPU {result['cpu_percent']:.3f}%, "
+              f"peak RSS {result['peak_rss_bytes'] / 1048576:.1f} MB")
+    print(f"Results written to {output}")
+    if baseline:
+        with open(baseline) as f:
+            for line in compare(json.load(f), results):
+                print(line)
+    return 1 if any("error" in result for result in results["modes"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
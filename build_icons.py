@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Icon asset pipeline for the Keep Awake Utility.
+Renders the tray icon sources once into a small bundle of raw RGBA pixels
+at every tray size, plus pre-rendered frame strips for the animated tray
+icon (a pulse during the shutdown warning and a countdown ring while a
+timer runs). IconCache serves from the bundle, so the tray never decodes
+a multi-megabyte PNG or draws with PIL at runtime.
+
+The bundle is named after a hash of its sources and build parameters and
+is only rebuilt when that hash changes:
+
+    python build_icons.py              # no-op when up to date
+    python build_icons.py --force
+    python build_icons.py --output=DIR
+
+SVGs are rendered with cairosvg when it is installed; otherwise the PNG
+next to each SVG is decoded once and downscaled.
+"""
+
+import hashlib
+import io
+import json
+import math
+import os
+import sys
+import tempfile
+import zlib
+
+from PIL import Image, ImageDraw
+
+from icon_cache import (BASE_DIR, BUNDLE_DIR, BUNDLE_ENTRY, BUNDLE_HEADER, BUNDLE_INDEX, BUNDLE_MAGIC,
+                        BUNDLE_NAME_BYTES, BUNDLE_VERSION, TRAY_SIZES, IconCache, file_digest)
+
+# Bundle entry name -> (svg, png) sources, relative to the repo
+SOURCES = {
+    "awake_icon": ("awake_icon.svg", "awake_icon.png"),
+    "sleep_icon": ("sleep_icon.svg", "sleep_icon.png"),
+}
+# Strips only exist for the awake icon; the tray shows the plain sleep icon when inactive
+PULSE_SOURCE = "awake_icon"
+PULSE_FRAMES = 8
+# Opacity at the dimmest point of the pulse
+PULSE_MIN_ALPHA = 0.45
+# Frame i shows i/(COUNTDOWN_FRAMES - 1) of the timer remaining
+COUNTDOWN_FRAMES = 13
+COUNTDOWN_COLOR = (255, 152, 0, 255)
+COUNTDOWN_TRACK = (0, 0, 0, 90)
+# Rings are drawn this many times larger and downscaled, which anti-aliases them
+SUPERSAMPLE = 4
+
+
+def _renderer():
+    try:
+        import cairosvg
+        return "cairosvg", cairosvg
+    except (ImportError, OSError):
+        # OSError: cairosvg is installed but the cairo library is not
+        return "png", None
+
+
+def source_files(base_dir, kind):
+    """{name: file} the renderer builds each icon from: the SVG under cairosvg, else the PNG"""
+    return {name: svg if kind == "cairosvg" and os.path.exists(os.path.join(base_dir, svg)) else png
+            for name, (svg, png) in SOURCES.items()}
+
+
+def render_sources(base_dir, sizes, renderer):
+    """{name: {size: RGBA image}} for every source"""
+    kind, cairosvg = renderer
+    images = {}
+    for name, path in source_files(base_dir, kind).items():
+        if path.endswith(".svg"):
+            images[name] = {}
+            for size in sizes:
+                data = cairosvg.svg2png(url=os.path.join(base_dir, path), output_width=size, output_height=size)
+                with Image.open(io.BytesIO(data)) as img:
+                    images[name][size] = IconCache._fit(img.convert("RGBA"), size)
+            continue
+        # Decode once; smaller sizes are downscaled from the largest, as IconCache does
+        with Image.open(os.path.join(base_dir, path)) as img:
+            largest = IconCache._fit(img.convert("RGBA"), max(sizes))
+        images[name] = {size: IconCache._fit(largest, size) for size in sizes}
+    return images
+
+
+def pulse_frames(icon):
+    """The icon fading out and back in over PULSE_FRAMES frames"""
+    frames = []
+    alpha = icon.getchannel("A")
+    for i in range(PULSE_FRAMES):
+        level = PULSE_MIN_ALPHA + (1.0 - PULSE_MIN_ALPHA) * (1.0 + math.cos(2.0 * math.pi * i / PULSE_FRAMES)) / 2.0
+        frame = icon.copy()
+        frame.putalpha(alpha.point(lambda a, level=level: int(round(a * level))))
+        frames.append(frame)
+    return frames
+
+
+def countdown_frames(icon):
+    """The icon with a ring showing how much of the timer is left, from empty to full"""
+    size = icon.width
+    big = size * SUPERSAMPLE
+    width = max(SUPERSAMPLE, big // 8)
+    box = (width // 2, width // 2, big - 1 - width // 2, big - 1 - width // 2)
+    frames = []
+    for i in range(COUNTDOWN_FRAMES):
+        ring = Image.new("RGBA", (big, big), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(ring)
+        draw.ellipse(box, outline=COUNTDOWN_TRACK, width=width)
+        sweep = 360.0 * i / (COUNTDOWN_FRAMES - 1)
+        if sweep > 0:
+            # Clockwise from twelve o'clock
+            draw.arc(box, -90, -90 + sweep, fill=COUNTDOWN_COLOR, width=width)
+        ring = ring.resize((size, size), Image.LANCZOS)
+        frames.append(Image.alpha_composite(icon, ring))
+    return frames
+
+
+def content_hash(base_dir, used, sizes, renderer):
+    """Hash of everything the bundle is built from"""
+    digest = hashlib.sha256()
+    params = {
+        "version": BUNDLE_VERSION,
+        "sizes": list(sizes),
+        "renderer": renderer,
+        "pulse": [PULSE_FRAMES, PULSE_MIN_ALPHA],
+        "countdown": [COUNTDOWN_FRAMES, COUNTDOWN_COLOR, COUNTDOWN_TRACK, SUPERSAMPLE],
+    }
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    for path in used:
+        digest.update(path.encode() + b"\0")
+        with open(os.path.join(base_dir, path), "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def pack(entries):
+    """Bundle bytes for a list of (name, size, frames)"""
+    parts = [BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(entries))]
+    for name, size, frames in entries:
+        encoded = name.encode()
+        if len(encoded) > BUNDLE_NAME_BYTES:
+            raise ValueError(f"Bundle entry name too long: {name}")
+        packed = zlib.compress(b"".join(frame.tobytes() for frame in frames), 9)
+        parts.append(BUNDLE_ENTRY.pack(encoded, size, len(frames), len(packed)))
+        parts.append(packed)
+    return b"".join(parts)
+
+
+def _write_atomic(path, data):
+    fd, temp_path = tempfile.mkstemp(prefix=".icons-", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _source_stats(base_dir, used):
+    """{file: [size, sha256]}, which load_bundle compares to tell whether the bundle is stale"""
+    sources = {}
+    for path in used:
+        full_path = os.path.join(base_dir, path)
+        sources[path] = [os.path.getsize(full_path), file_digest(full_path)]
+    return sources
+
+
+def read_index(output):
+    try:
+        with open(os.path.join(output, BUNDLE_INDEX), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def build_bundle(base_dir=BASE_DIR, output=BUNDLE_DIR, sizes=TRAY_SIZES, force=False):
+    """Build the bundle unless one with the same content hash exists; returns (index, rebuilt)"""
+    sizes = tuple(sorted(sizes))
+    renderer = _renderer()
+    used = list(source_files(base_dir, renderer[0]).values())
+    digest = content_hash(base_dir, used, sizes, renderer[0])
+    index = read_index(output)
+    if (not force and index is not None and index.get("hash") == digest
+            and os.path.exists(os.path.join(output, index.get("bundle", "")))):
+        # Same content, but an index written before sources carried hashes: record them so the app trusts the bundle
+        sources = _source_stats(base_dir, used)
+        if index.get("sources") != sources:
+            index["sources"] = sources
+            _write_atomic(os.path.join(output, BUNDLE_INDEX), json.dumps(index, indent=2).encode())
+        return index, False
+
+    images = render_sources(base_dir, sizes, renderer)
+    entries = []
+    for name in SOURCES:
+        for size in sizes:
+            entries.append((name, size, [images[name][size]]))
+    for size in sizes:
+        icon = images[PULSE_SOURCE][size]
+        entries.append((f"{PULSE_SOURCE}.pulse", size, pulse_frames(icon)))
+        entries.append((f"{PULSE_SOURCE}.countdown", size, countdown_frames(icon)))
+
+    os.makedirs(output, exist_ok=True)
+    bundle = f"icons-{digest[:16]}.bin"
+    data = pack(entries)
+    _write_atomic(os.path.join(output, bundle), data)
+    index = {
+        "version": BUNDLE_VERSION,
+        "hash": digest,
+        "bundle": bundle,
+        "bytes": len(data),
+        "renderer": renderer[0],
+        "sizes": list(sizes),
+        "sources": _source_stats(base_dir, used),
+        "strips": {"pulse": PULSE_FRAMES, "countdown": COUNTDOWN_FRAMES},
+    }
+    # The index goes last, so a crash never points it at a half-written bundle
+    _write_atomic(os.path.join(output, BUNDLE_INDEX), json.dumps(index, indent=2).encode())
+    for old in os.listdir(output):
+        if old.startswith("icons-") and old.endswith(".bin") and old != bundle:
+            try:
+                os.remove(os.path.join(output, old))
+            except OSError:
+                pass
+    return index, True
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    output = BUNDLE_DIR
+    force = False
+    for arg in argv:
+        if arg == "--force":
+            force = True
+        elif arg.startswith("--output="):
+            output = os.path.abspath(arg.split("=", 1)[1])
+        elif arg in ("--help", "-h"):
+            print("Usage: build_icons.py [--force] [--output=DIR]")
+            return 0
+    try:
+        index, rebuilt = build_bundle(output=output, force=force)
+    except (OSError, ValueError) as e:
+        print(f"Error: Cannot build icon bundle: {str(e)}")
+        return 1
+    state = "Built" if rebuilt else "Up to date:"
+    print(f"{state} {os.path.join(output, index['bundle'])} ({index['bytes']} bytes, {index['renderer']} renderer, "
+          f"sizes {', '.join(str(s) for s in index['sizes'])})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+Clocks for the Keep Awake Utility.
+The scheduler reads time through a clock callable. SYSTEM_CLOCK is the
+real monotonic clock; VirtualClock only moves when advanced, so tests can
+run a 10-hour timer and its shutdown grace period in milliseconds.
+"""
+
+import threading
+import time
+
+
+class SystemClock:
+    virtual = False
+
+    def __call__(self):
+        """Monotonic seconds, used for deadlines"""
+        return time.monotonic()
+
+    def wall(self):
+        """Wall-clock seconds since the epoch, used for timestamps"""
+        return time.time()
+
+
+SYSTEM_CLOCK = SystemClock()
+
+
+class VirtualClock:
+    virtual = True
+
+    def __init__(self, start=0.0, wall_start=None):
+        """A clock that stands still until advance() is called"""
+        self.now = float(start)
+        self.wall_offset = (time.time() if wall_start is None else wall_start) - self.now
+        self._schedulers = []
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        return self.now
+
+    def wall(self):
+        return self.now + self.wall_offset
+
+    def attach(self, scheduler):
+        """Called by a Scheduler so advance() can run its due jobs"""
+        with self._lock:
+            if scheduler not in self._schedulers:
+                self._schedulers.append(scheduler)
+
+    def detach(self, scheduler):
+        with self._lock:
+            if scheduler in self._schedulers:
+                self._schedulers.remove(scheduler)
+
+    def advance(self, seconds):
+        """Move time forward, firing every job that falls due on the way, in order"""
+        if seconds < 0:
+            raise ValueError("a monotonic clock cannot go backwards")
+        target = self.now + seconds
+        while True:
+            with self._lock:
+                schedulers = list(self._schedulers)
+            due = [(s.next_deadline(), i) for i, s in enumerate(schedulers)]
+            due = [(deadline, i) for deadline, i in due if deadline is not None and deadline <= target]
+            if not due:
+                break
+            deadline, i = min(due)
+            # Jobs see the clock at their own deadline, as they would in real time
+            self.now = max(self.now, deadline)
+            schedulers[i].run_due()
+        self.now = target
+        return self.now
@@ -7,28 +7,113 @@ with an optional automatic shutdown timer.
 
 import os
 import sys
+
+from startup import enable_startup_profile, mark_startup
+
+# Start timing imports before anything else is loaded
+enable_startup_profile(sys.argv)
+
+# Must run before the app class is defined so its @span hooks see the profiler
+from profiling import enable_profiling, span
+
+enable_profiling(sys.argv)
+
+import math
+import signal
 import threading
 import time
 import random
-import subprocess
 from datetime import datetime, timedelta
 
+from activity_log import ActivityLog
+from activity_pattern import DEFAULT_INTERVAL, ActivityPattern, ActivityRunner, parse_pattern_args
+from idle_detect import DEFAULT_IDLE_THRESHOLD, IdleGate, create_idle_source, parse_idle_threshold_arg
+from inhibitor import acquire_inhibitor, parse_inhibit_arg
+from metrics import Metrics, MetricsServer, add_app_gauges, parse_metrics_port_arg
+from input_inject import MOUSE
+from clock import SYSTEM_CLOCK
+from power_analysis import PowerAnalyzer
+from power_policy import PowerMonitor, parse_power_args
+from resource_sampler import DEFAULT_SAMPLE_INTERVAL, WINDOWS, ResourceSampler, parse_sample_interval_arg
+from schedule_engine import ScheduleEngine, ScheduleError, ScheduleRunner, parse_schedule_args
+from scheduler import Scheduler
+from session_journal import (SHUTDOWN_CANCELLED, SHUTDOWN_EXECUTED, SHUTDOWN_SCHEDULED, START, STOP,
+                             TIMER, SessionJournal, parse_journal_args)
+from timer_state import TimerState, discard_interrupted, parse_resume_arg, parse_state_args, resume_delay
+from triggers import TriggerSet, parse_trigger_args
+
+# Seconds the user has to cancel once the shutdown warning is shown
+SHUTDOWN_GRACE_PERIOD = 60
+
+def simulate_shutdown_command(command):
+    """Default shutdown runner: print the command instead of running it"""
+    print(f"SIMULATED: {' '.join(command)}")
+
 class KeepAwakeConsoleApp:
-    def __init__(self):
+    def __init__(self, clock=SYSTEM_CLOCK, shutdown_runner=simulate_shutdown_command, scheduler=None):
         # Initialize state variables
         self.active = False
         self.timer_active = False
         self.shutdown_scheduled = False
         self.remaining_time = 0
-        self.activity_thread = None
-        self.timer_thread = None
-        self.shutdown_thread = None
+        self.timer_deadline = None
+        # Wall-clock deadline, which unlike the monotonic one survives a reboot
+        self.timer_wall_deadline = None
+        # Saved on every state change so a restart can resume the countdown
+        self.timer_state = None
         self.stop_threads = threading.Event()
+        # Set to end non-interactive and daemon runs; waiters wake immediately
+        self.exit_requested = threading.Event()
+        # Seconds from a stop request until no job can still be running
+        self.stop_latency = None
+
+        # Every timed action runs as a job on one deadline scheduler thread
+        # Tests pass a VirtualClock to fast-forward long timers; --runtime=asyncio passes an AsyncScheduler
+        self.scheduler = scheduler if scheduler is not None else Scheduler(clock)
+        self.scheduler.start()
+        # Receives the shutdown command as an argument list
+        self.shutdown_runner = shutdown_runner
+        # End conditions (process exit, low CPU/network, idle file), armed while active
+        self.triggers = TriggerSet(self.scheduler, self.on_trigger)
+        # Weekly/cron windows for automatic start and stop
+        self.schedule = ScheduleEngine()
+        self.schedule_runner = None
+        # Injection times and actions come precomputed from the activity pattern
+        self.activity = ActivityRunner(self.scheduler, ActivityPattern(), self.simulate_activity)
+        self.timer_job = None
+        self.shutdown_job = None
         self.timer_options = ["Never", "1 hour", "2 hours", "5 hours", "10 hours"]
         self.current_timer = self.timer_options[0]
         
-        # For demonstration purposes in Replit
-        self.simulation_log = []
+        # Keep-awake backend: a native sleep/idle lock, or input injection as fallback
+        self.inhibit_preference = "auto"
+        self.inhibitor = None
+        
+        # Input is only injected once the user has been idle for about this long
+        self.idle_threshold = DEFAULT_IDLE_THRESHOLD
+        self.idle_gate = None
+        
+        # Resource history is sampled in the background for the monitor command
+        self.sample_interval = DEFAULT_SAMPLE_INTERVAL
+        self.resource_sampler = None
+        self.power_analyzer = None
+        
+        # For demonstration purposes in Replit: simulated injections, formatted only when shown
+        self.activity_log = ActivityLog(clock=clock)
+        # Session history on disk; opened by main() unless --no-journal is given
+        self.journal = None
+        # Counters are always kept; the HTTP endpoint only runs with --metrics-port
+        self.metrics = Metrics()
+        add_app_gauges(self.metrics, self)
+        self.metrics_server = None
+        # Battery/AC policy; only watched when --on-battery or --battery-below is given
+        self.power_policy = None
+        self.power_monitor = None
+        # What the daemon answers `status` with; written under the lock on every state change,
+        # so the control thread can read it while the scheduler thread is busy
+        self.status_lock = threading.Lock()
+        self.status_snapshot = {}
+        self.publish_status()
         
         # Welcome message
         self.print_welcome()
@@ -53,6 +138,7 @@ class KeepAwakeConsoleApp:
         status = "Active" if self.active else "Inactive"
         
         if self.timer_active:
+            self.update_remaining_time()
             hours, remainder = divmod(self.remaining_time, 3600)
             minutes, seconds = divmod(remainder, 60)
             time_str = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
@@ -62,49 +148,64 @@ class KeepAwakeConsoleApp:
         
         print(f"\nCurrent state: {status}")
         print(f"Shutdown timer: {timer_status}")
+        if self.inhibitor is not None:
+            print(f"Keep-awake backend: {self.inhibitor.describe()}")
+        if self.idle_gate is not None:
+            print(f"Activity ticks: {self.idle_gate.summary()}")
+        if self.power_monitor is not None and self.power_monitor.state is not None:
+            print(f"Power: {self.power_monitor.state.describe()} ({self.power_policy.describe()})")
+        if self.triggers.triggers:
+            print(f"Triggers ({'then ' + self.triggers.action}):")
+            for description in self.triggers.describe():
+                print(f"  - {description}")
         
-        if self.active and len(self.simulation_log) > 0:
+        if self.active and len(self.activity_log) > 0:
             print("\nRecent activity simulation:")
-            for log in self.simulation_log[-5:]:  # Show last 5 log entries
+            for log in self.activity_log.formatted(5):  # Show last 5 log entries
                 print(f"  - {log}")
+
+        if self.stop_latency is not None:
+            print(f"\nLast stop took {self.stop_latency * 1000.0:.1f} ms")
+        if self.active:
+            drift = self.scheduler.drift_stats()
+            print(f"\nScheduler: {drift['fired']} tasks run, "
+                  f"drift avg {drift['mean_drift_ms']:.1f} ms / max {drift['max_drift_ms']:.1f} ms, "
+                  f"wall clock skew {drift['wall_skew_ms']:.1f} ms")
         print()
     
-    def simulate_activity(self):
-        """Thread function to simulate mouse/keyboard activity"""
-        while not self.stop_threads.is_set():
-            try:
-                # In a real environment, this would use pyautogui to move the mouse or press keys
-                # For Replit, we just simulate by logging what would happen
-                
-                # Alternate between simulated mouse movement and key press
-                current_time = datetime.now().strftime("%H:%M:%S")
-                
-                if random.choice([True, False]):
-                    # Simulate small mouse movement
-                    x_move = random.randint(-5, 5)
-                    y_move = random.randint(-5, 5)
-                    self.simulation_log.append(f"[{current_time}] Mouse moved by ({x_move}, {y_move}) pixels")
-                else:
-                    # Simulate key press
-                    self.simulation_log.append(f"[{current_time}] Pressed 'Shift' key")
-                
-                # Keep log from growing too large
-                if len(self.simulation_log) > 100:
-                    self.simulation_log = self.simulation_log[-50:]
+    @span("simulate_activity")
+    def simulate_activity(self, action=MOUSE):
+        """Scheduled by the activity pattern to simulate mouse/keyboard activity"""
+        if self.stop_threads.is_set():
+            return
+        # Skip the tick while the user is active; their own input keeps the PC awake
+        if self.idle_gate is not None and not self.idle_gate.should_inject():
+            return
+        try:
+            # In a real environment, this would use pyautogui to move the mouse or press keys
+            # For Replit, we just simulate by logging what would happen
+            
+            started = time.perf_counter()
+            if action == MOUSE:
+                # Simulate small mouse movement
+                self.activity_log.append(MOUSE, random.randint(-5, 5), random.randint(-5, 5))
+            else:
+                # Simulate key press
+                self.activity_log.append(action)
+            self.metrics.injection(action, time.perf_counter() - started)
+            if self.journal is not None:
+                self.journal.record_injection()
                 
-                # Wait before next activity simulation (6 seconds)
-                for _ in range(30):  # 30 * 0.2 = 6 seconds
-                    if self.stop_threads.is_set():
-                        break
-                    time.sleep(0.2)
-                    
-            except Exception as e:
-                print(f"Error in activity simulation: {str(e)}")
-                self.stop_keep_awake()
-                break
+        except Exception as e:
+            print(f"Error in activity simulation: {str(e)}")
+            self.stop_keep_awake()
     
-    def start_keep_awake(self):
-        """Start the keep awake functionality"""
+    def start_keep_awake(self, remaining=None):
+        """Start the keep awake functionality; remaining resumes a saved timer"""
+        if not self.scheduler.on_thread():
+            # Commands, the daemon and scheduled jobs all start and stop on the scheduler thread,
+            # since some keep-awake locks (SetThreadExecutionState) belong to the thread that took them
+            return self.scheduler.run_sync(self.start_keep_awake, remaining)
         if self.active:
             print("Already active!")
             return
@@ -113,64 +214,191 @@ class KeepAwakeConsoleApp:
         self.stop_threads.clear()
         
         print("Starting keep awake functionality...")
+        self.journal_event(START)
+        if self.power_analyzer is not None:
+            self.power_analyzer.set_session(True)
         
-        # Start activity simulation thread
-        self.activity_thread = threading.Thread(target=self.simulate_activity, daemon=True)
-        self.activity_thread.start()
+        # Prefer a native sleep/idle lock; only inject activity when none is available
+        self.inhibitor = acquire_inhibitor(self.inhibit_preference)
+        print(f"Keep-awake backend: {self.inhibitor.name}")
+        if self.inhibitor.requires_input:
+            if self.idle_gate is None:
+                self.idle_gate = IdleGate(create_idle_source(), self.idle_threshold,
+                                          margin=self.activity.pattern.max_gap())
+            # Schedule activity simulation, first tick right away
+            self.activity.start()
         
         # Check if timer is set
-        self.check_timer_selection()
+        self.check_timer_selection(remaining)
+        for trigger, error in self.triggers.arm():
+            print(f"Warning: Cannot watch trigger ({trigger.kind}): {str(error)}")
         print("Keep awake functionality started successfully.")
+        if self.power_monitor is not None and self.power_monitor.state is not None:
+            # A session started on battery gets the policy now, not at the next power change
+            self.on_power_change(self.power_monitor.state)
     
     def stop_keep_awake(self):
         """Stop the keep awake functionality"""
+        if not self.scheduler.on_thread():
+            return self.scheduler.run_sync(self.stop_keep_awake)
         if not self.active:
             print("Not currently active!")
             return
         
-        # Signal threads to stop
+        # Signal threads to stop and drop any pending work
+        started = time.perf_counter()
         self.stop_threads.set()
+        self.cancel_jobs()
+        self.triggers.disarm()
+        self.scheduler.wait_idle()
+        self.stop_latency = time.perf_counter() - started
+        if self.inhibitor is not None:
+            self.inhibitor.release()
         
         # Update state
         self.active = False
+        self.journal_event(STOP)
+        if self.power_analyzer is not None:
+            self.power_analyzer.set_session(False)
         print("Stopped keep awake functionality.")
         
+        if self.timer_state is not None:
+            self.timer_state.clear()
+        
         # Reset timer if active
         if self.timer_active:
             self.timer_active = False
             self.current_timer = self.timer_options[0]
             print("Timer reset.")
+        self.publish_status()
+    
+    def shutdown(self, timeout=1.0):
+        """Stop keep-awake and join the scheduler thread; True once no worker is left"""
+        if self.active:
+            # A deliberate exit ends the session; only a crash leaves it behind for --resume
+            self.stop_keep_awake()
+        self.exit_requested.set()
+        self.triggers.close()
+        if self.journal is not None:
+            self.journal.close()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        if self.power_monitor is not None:
+            self.power_monitor.stop()
+        return self.scheduler.stop(timeout)
+    
+    def open_journal(self, directory):
+        """Record session history in directory from a background writer thread"""
+        self.journal = SessionJournal(directory, clock=self.scheduler.clock)
+        self.journal.start()
+    
+    def start_metrics(self, port):
+        """Serve Prometheus metrics on localhost:port"""
+        try:
+            self.metrics_server = MetricsServer(self.metrics, port)
+            self.metrics_server.start()
+            print(f"Metrics available at http://{self.metrics_server.host}:{self.metrics_server.port}/metrics")
+        except OSError as e:
+            print(f"Warning: Cannot start metrics endpoint: {str(e)}")
+            self.metrics_server = None
+    
+    def journal_event(self, kind, value=0.0):
+        if self.journal is not None:
+            self.journal.record(kind, value)
+    
+    def start_power_policy(self, policy, root):
+        """Watch AC and battery state and apply policy when it changes"""
+        self.power_policy = policy
+        self.power_monitor = PowerMonitor(self.scheduler, self.on_power_change, root)
+        if not self.power_monitor.start():
+            print("Warning: Cannot read the power state here; battery policy is off")
+            self.power_monitor = None
+            return
+        print(f"Power policy: {policy.describe()} ({self.power_monitor.mode})")
+    
+    def on_power_change(self, state):
+        """Runs on the scheduler thread when AC or battery state changes"""
+        self.power_policy.apply(self, state)
+    
+    def pause_for_power(self):
+        self.stop_keep_awake()
+    
+    def resume_after_power(self, remaining):
+        """Restart after a power pause; remaining is the timer left, None for no timer"""
+        self.current_timer = self.timer_options[0]
+        self.start_keep_awake(remaining)
+    
+    def set_shutdown_in(self, seconds):
+        """Run the shutdown timer out in seconds, or clear it when seconds is None"""
+        if seconds is None:
+            self.current_timer = self.timer_options[0]
+        self.check_timer_selection(seconds)
+    
+    def on_trigger(self, trigger):
+        """Runs on the scheduler thread when an end condition is met"""
+        if not self.active:
+            return
+        print(f"\nTrigger fired: {trigger.describe()}")
+        if self.triggers.action == "stop":
+            self.stop_keep_awake()
+        elif not self.shutdown_scheduled:
+            # The trigger replaces any fixed-hour timer
+            self.scheduler.cancel(self.timer_job)
+            self.timer_job = None
+            self.timer_active = False
+            # A restart during the warning resumes straight into the shutdown flow
+            self.timer_wall_deadline = self.scheduler.wall_clock()
+            self.schedule_shutdown()
+    
+    def cancel_jobs(self):
+        """Cancel every pending activity, timer and shutdown job"""
+        self.activity.stop()
+        for job in (self.timer_job, self.shutdown_job):
+            self.scheduler.cancel(job)
+        self.timer_job = None
+        self.shutdown_job = None
     
     def show_timer_options(self):
         """Show and prompt for timer selection"""
+        self.print_timer_options()
+        try:
+            self.select_timer(input("\nSelect a timer option (1-5): "))
+        except Exception as e:
+            print(f"Error setting timer: {str(e)}")
+    
+    def print_timer_options(self):
         print("\nShutdown Timer Options:")
         for i, option in enumerate(self.timer_options):
             print(f"{i+1}. {option}")
-        
-        try:
-            choice = input("\nSelect a timer option (1-5): ")
-            if choice.isdigit() and 1 <= int(choice) <= len(self.timer_options):
-                self.current_timer = self.timer_options[int(choice)-1]
-                print(f"Timer set to: {self.current_timer}")
+    
+    def select_timer(self, choice):
+        """Apply a choice from the timer menu"""
+        if choice.isdigit() and 1 <= int(choice) <= len(self.timer_options):
+            self.current_timer = self.timer_options[int(choice)-1]
+            print(f"Timer set to: {self.current_timer}")
+            
+            if self.active:
+                self.check_timer_selection()
                 
-                if self.active:
-                    self.check_timer_selection()
-                    
-            else:
-                print("Invalid selection. Please choose a number between 1 and 5.")
-        except Exception as e:
-            print(f"Error setting timer: {str(e)}")
+        else:
+            print("Invalid selection. Please choose a number between 1 and 5.")
     
-    def check_timer_selection(self):
-        """Check and apply the selected timer setting"""
+    def check_timer_selection(self, remaining=None):
+        """Check and apply the selected timer setting; remaining overrides the full duration"""
         selection = self.current_timer
         
         # Cancel any existing timer
         self.timer_active = False
         self.shutdown_scheduled = False
+        self.scheduler.cancel(self.timer_job)
+        self.scheduler.cancel(self.shutdown_job)
+        self.timer_job = None
+        self.shutdown_job = None
+        self.timer_wall_deadline = None
         
-        if selection == "Never":
+        if selection == "Never" and remaining is None:
             print("No shutdown scheduled.")
+            self.save_timer_state()
             return
         
         # Map selection to hours
@@ -181,80 +409,141 @@ class KeepAwakeConsoleApp:
             "10 hours": 10
         }
         
-        if selection in hours_map:
-            hours = hours_map[selection]
-            self.remaining_time = hours * 3600  # Convert hours to seconds
+        if selection in hours_map or remaining is not None:
+            hours = hours_map.get(selection, 0)
+            seconds = hours * 3600 if remaining is None else remaining  # Convert hours to seconds
+            self.remaining_time = int(round(seconds))
+            self.timer_deadline = self.scheduler.clock() + seconds
+            self.timer_wall_deadline = self.scheduler.wall_clock() + seconds
             self.timer_active = True
-            print(f"Shutdown scheduled in {selection}.")
+            if remaining is None:
+                print(f"Shutdown scheduled in {selection}.")
+                self.journal_event(TIMER, hours)
+            self.save_timer_state()
             
-            # Start timer thread
-            self.timer_thread = threading.Thread(target=self.countdown_timer, daemon=True)
-            self.timer_thread.start()
+            # Nothing to display per second here, so only wake when the deadline is due
+            self.timer_job = self.scheduler.call_later(seconds, self.countdown_timer)
+    
+    def publish_status(self):
+        """Copy the state other threads may read into status_snapshot"""
+        snapshot = {
+            "active": self.active,
+            "timer": self.current_timer,
+            "deadline": self.timer_deadline if self.timer_active else None,
+            "shutdown": self.shutdown_scheduled,
+            "backend": self.inhibitor.name if self.inhibitor is not None else "none",
+        }
+        with self.status_lock:
+            self.status_snapshot = snapshot
+    
+    def save_timer_state(self):
+        """Persist the session; only called when the state changes, never per tick"""
+        self.publish_status()
+        if self.timer_state is None or not self.active:
+            return
+        try:
+            self.timer_state.save(True, self.current_timer, self.timer_wall_deadline, self.shutdown_scheduled)
+        except OSError as e:
+            print(f"Warning: Cannot save timer state: {str(e)}")
+    
+    def resume_session(self):
+        """Pick up a session saved by a run that crashed or was restarted"""
+        state = self.timer_state.load() if self.timer_state is not None else None
+        if not state or not state.get("active"):
+            return False
+        if state.get("timer") in self.timer_options:
+            self.current_timer = state["timer"]
+        remaining = resume_delay(state, self.scheduler.wall_clock())
+        if remaining is None:
+            print("Resuming the previous keep-awake session.")
+        elif remaining > 0:
+            hours, rest = divmod(int(round(remaining)), 3600)
+            print(f"Resuming the previous session: shutdown in {hours:02d}:{rest // 60:02d}:{rest % 60:02d}.")
+        else:
+            print("Resuming the previous session: its timer already ran out.")
+        self.start_keep_awake(remaining)
+        return True
     
+    def update_remaining_time(self):
+        """Recompute remaining_time from the absolute timer deadline"""
+        if self.timer_active and self.timer_deadline is not None:
+            self.remaining_time = max(0, int(round(self.timer_deadline - self.scheduler.clock())))
+        return self.remaining_time
+    
+    @span("countdown_timer")
     def countdown_timer(self):
-        """Thread function for countdown timer"""
-        while self.timer_active and not self.stop_threads.is_set() and self.remaining_time > 0:
-            # In a real application this would update UI - here we just decrement
-            time.sleep(1)
-            self.remaining_time -= 1
+        """Scheduled at the timer deadline"""
+        self.update_remaining_time()
         
         # If timer completed and wasn't cancelled, initiate shutdown
         if self.timer_active and self.remaining_time <= 0 and not self.stop_threads.is_set():
             print("Timer expired! Initiating shutdown...")
+            self.metrics.timer_expired()
             self.schedule_shutdown()
     
     def schedule_shutdown(self):
         """Schedule system shutdown"""
         self.shutdown_scheduled = True
+        self.journal_event(SHUTDOWN_SCHEDULED)
+        self.metrics.shutdown("scheduled")
+        self.save_timer_state()
         
         print("\n" + "!" * 60)
         print("! WARNING: Your PC will shut down in 1 minute due to timer expiration !")
         print("! Type 'cancel' to abort the shutdown                              !")
         print("!" * 60 + "\n")
         
-        # Start shutdown thread
-        self.shutdown_thread = threading.Thread(target=self.execute_shutdown, daemon=True)
-        self.shutdown_thread.start()
+        # Give the user SHUTDOWN_GRACE_PERIOD seconds to cancel
+        self.shutdown_job = self.scheduler.call_later(SHUTDOWN_GRACE_PERIOD, self.execute_shutdown)
     
     def execute_shutdown(self):
-        """Execute system shutdown after a short delay"""
-        # Wait 60 seconds before shutdown to give user time to cancel
-        for i in range(60):
-            if not self.shutdown_scheduled or self.stop_threads.is_set():
-                return
-            time.sleep(1)
-        
-        if self.shutdown_scheduled:
+        """Scheduled once the shutdown grace period has passed"""
+        if self.shutdown_scheduled and not self.stop_threads.is_set():
             print("Executing shutdown command...")
+            self.metrics.shutdown("executed")
+            # The shutdown happens now; it must not be resumed after the reboot
+            if self.timer_state is not None:
+                self.timer_state.clear()
+            if self.journal is not None:
+                # The machine is going down; get the record on disk first
+                self.journal.record(SHUTDOWN_EXECUTED)
+                self.journal.flush()
             try:
                 if sys.platform == 'win32':
                     # Windows shutdown command
-                    print("SIMULATED: shutdown /s /t 0")
-                    # subprocess.run(['shutdown', '/s', '/t', '0'], check=True)
+                    self.shutdown_runner(['shutdown', '/s', '/t', '0'])
                 else:
                     # Linux/macOS shutdown command
-                    print("SIMULATED: shutdown -h now")
-                    # subprocess.run(['shutdown', '-h', 'now'], check=True)
-                print("Shutdown command would be executed now in a real environment.")
+                    self.shutdown_runner(['shutdown', '-h', 'now'])
+                if self.shutdown_runner is simulate_shutdown_command:
+                    print("Shutdown command would be executed now in a real environment.")
             except Exception as e:
                 print(f"Error: Failed to shutdown: {str(e)}")
     
     def cancel_shutdown(self):
         """Cancel scheduled shutdown"""
+        self.scheduler.cancel(self.shutdown_job)
+        self.scheduler.cancel(self.timer_job)
+        self.shutdown_job = None
+        self.timer_job = None
+        
         if self.shutdown_scheduled:
             self.shutdown_scheduled = False
+            self.journal_event(SHUTDOWN_CANCELLED)
+            self.metrics.shutdown("cancelled")
             print("Shutdown cancelled.")
             try:
                 if sys.platform == 'win32':
                     # Windows abort shutdown command
-                    print("SIMULATED: shutdown /a")
-                    # subprocess.run(['shutdown', '/a'], check=True)
+                    self.shutdown_runner(['shutdown', '/a'])
             except Exception as e:
                 print(f"Error: Failed to cancel shutdown: {str(e)}")
         
         # Reset timer
         self.timer_active = False
         self.current_timer = self.timer_options[0]
+        self.timer_wall_deadline = None
+        self.save_timer_state()
 
     def advanced_features(self):
         """Show advanced features menu"""
@@ -285,94 +574,225 @@ class KeepAwakeConsoleApp:
         except Exception as e:
             print(f"Error in advanced features: {str(e)}")
     
+    def start_resource_sampler(self):
+        """Start background resource sampling; psutil loads here, off the startup path"""
+        if self.resource_sampler is not None or self.sample_interval <= 0:
+            return
+        try:
+            self.resource_sampler = ResourceSampler(self.sample_interval, clock=self.scheduler.clock)
+        except ImportError:
+            return
+        self.resource_sampler.start(self.scheduler)
+    
     def show_resource_monitor(self):
-        """Display system resource usage"""
+        """Display system resource usage from the background sampler"""
+        if self.resource_sampler is None and self.sample_interval > 0:
+            # Sampling starts the first time the monitor is opened, so sessions that never look pay nothing
+            self.scheduler.run_sync(self.start_resource_sampler)
+        sampler = self.resource_sampler
+        if sampler is None:
+            if self.sample_interval <= 0:
+                print("Resource sampling is disabled (--sample-interval=0).")
+            else:
+                print("Resource monitoring requires psutil module.")
+            return
+        if not sampler.samples:
+            print("Collecting the first resource sample, try again in a moment.")
+            return
         try:
-            import psutil
-            
-            # CPU information
-            cpu_percent = psutil.cpu_percent(interval=1)
-            cpu_freq = psutil.cpu_freq()
-            
-            # Memory information
-            memory = psutil.virtual_memory()
-            memory_percent = memory.percent
-            
-            # Disk information
-            disk = psutil.disk_usage('/')
-            disk_percent = disk.percent
-            
+            current = sampler.current()
             print("\nSystem Resource Monitor:")
-            print(f"CPU Usage: {cpu_percent}%")
-            if cpu_freq:
-                print(f"CPU Frequency: {cpu_freq.current:.2f} MHz")
-            print(f"Memory Usage: {memory_percent}%")
-            print(f"Disk Usage: {disk_percent}%")
+            print(f"CPU Usage: {current['cpu']:.1f}%")
+            if not math.isnan(current['freq']):
+                print(f"CPU Frequency: {current['freq']:.2f} MHz")
+            print(f"Memory Usage: {current['memory']:.1f}%")
+            print(f"Disk Usage: {current['disk']:.1f}%")
             
             # Battery information if available
-            if hasattr(psutil, "sensors_battery"):
-                battery = psutil.sensors_battery()
-                if battery:
-                    print(f"Battery: {battery.percent}%")
-                    if battery.power_plugged:
-                        print("Power: Plugged In")
+            battery = sampler.battery
+            if battery:
+                print(f"Battery: {battery.percent}%")
+                if battery.power_plugged:
+                    print("Power: Plugged In")
+                else:
+                    secs_left = battery.secsleft
+                    if secs_left != sampler.psutil.POWER_TIME_UNLIMITED:
+                        hours, remainder = divmod(secs_left, 3600)
+                        minutes, seconds = divmod(remainder, 60)
+                        print(f"Battery Time Left: {hours:02d}:{minutes:02d}:{seconds:02d}")
                     else:
-                        secs_left = battery.secsleft
-                        if secs_left != psutil.POWER_TIME_UNLIMITED:
-                            hours, remainder = divmod(secs_left, 3600)
-                            minutes, seconds = divmod(remainder, 60)
-                            print(f"Battery Time Left: {hours:02d}:{minutes:02d}:{seconds:02d}")
-                        else:
-                            print("Battery Time Left: Unlimited")
+                        print("Battery Time Left: Unlimited")
             
-        except ImportError:
-            print("Resource monitoring requires psutil module.")
+            labels = {"cpu": "CPU %", "freq": "CPU MHz", "memory": "Memory %", "disk": "Disk %", "battery": "Battery %"}
+            print(f"\n{'':10} {'window':>6} {'min':>8} {'avg':>8} {'max':>8} {'p50':>8} {'p95':>8}")
+            for metric, label in labels.items():
+                for seconds in WINDOWS:
+                    stats = sampler.window_stats(metric, seconds)
+                    if stats is None:
+                        continue
+                    print(f"{label:10} {seconds // 60:>4} m {stats['min']:8.1f} {stats['avg']:8.1f} "
+                          f"{stats['max']:8.1f} {stats['p50']:8.1f} {stats['p95']:8.1f}")
+            print(f"\nSampler: {sampler.samples} samples every {sampler.interval:g} s, "
+                  f"overhead {sampler.overhead_percent():.3f}% CPU")
         except Exception as e:
             print(f"Error reading system resources: {str(e)}")
     
+    def set_activity_pattern(self, pattern):
+        """Apply a new activity pattern; a running schedule switches at its next tick"""
+        self.activity.set_pattern(pattern)
+        if self.idle_gate is not None:
+            self.idle_gate.margin = pattern.max_gap()
+    
     def custom_activity_pattern(self):
         """Configure custom activity pattern"""
         print("\nCustom Activity Pattern:")
         print("Configure how the utility simulates activity")
+        current = self.activity.pattern
+        print(f"\nCurrent pattern: {current.describe()}")
         
         print("\nActivity Types:")
         print("1. Mouse movement only")
         print("2. Keyboard only")
         print("3. Both mouse and keyboard (default)")
+        kinds = {"1": "mouse", "2": "keyboard", "3": "both"}
+        kind = kinds.get(input("Select type (1-3, Enter to keep): ").strip(), current.kind)
         
         print("\nActivity Frequency:")
         print("1. Low (every 30 seconds)")
-        print("2. Medium (every 10 seconds, default)")
+        print("2. Medium (every 10 seconds)")
         print("3. High (every 3 seconds)")
+        print(f"4. Default (every {DEFAULT_INTERVAL:g} seconds)")
+        intervals = {"1": 30.0, "2": 10.0, "3": 3.0, "4": DEFAULT_INTERVAL}
+        interval = intervals.get(input("Select frequency (1-4, Enter to keep): ").strip(), current.interval)
         
-        print("\nThis would allow custom configuration of activity patterns in a real implementation.")
-        input("\nPress Enter to return to advanced features...")
+        print("\nTiming Jitter:")
+        print("1. None (fixed interval)")
+        print("2. Uniform (±20%)")
+        print("3. Gaussian (σ 20%)")
+        print("4. Random arrivals (exponential)")
+        jitters = {"1": "none", "2": "uniform", "3": "gaussian", "4": "exponential"}
+        jitter = jitters.get(input("Select jitter (1-4, Enter to keep): ").strip(), current.jitter)
+        
+        self.set_activity_pattern(ActivityPattern(kind, interval, jitter, current.spread))
+        print(f"\nActivity pattern set: {self.activity.pattern.describe()}")
+    
+    def start_schedule(self):
+        """Follow the schedule rules, sleeping on the scheduler between transitions"""
+        if not self.scheduler.on_thread():
+            # The runner re-plans from its own wakeups on the scheduler thread; starting or
+            # re-planning it anywhere else could leave a second wakeup chain behind
+            return self.scheduler.run_sync(self.start_schedule)
+        if self.schedule_runner is None:
+            self.schedule_runner = ScheduleRunner(self.schedule, self.scheduler, self.on_schedule_change)
+            self.schedule_runner.start()
+        else:
+            self.schedule_runner.replan()
+    
+    def on_schedule_change(self, active):
+        """Runs on the scheduler thread at every schedule transition"""
+        if active and not self.active:
+            print("\nSchedule: starting keep awake.")
+            self.start_keep_awake()
+        elif not active and self.active:
+            print("\nSchedule: stopping keep awake.")
+            self.stop_keep_awake()
+    
+    def clear_schedule(self):
+        """Drop every rule and stop following the schedule"""
+        if not self.scheduler.on_thread():
+            return self.scheduler.run_sync(self.clear_schedule)
+        self.schedule.rules.clear()
+        if self.schedule_runner is not None:
+            self.schedule_runner.stop()
+            self.schedule_runner = None
     
     def schedule_operation(self):
         """Schedule automatic start/stop times"""
         print("\nSchedule Operation:")
         print("Configure automatic start and stop times for the utility")
         
-        print("\nThis feature would allow scheduling when the utility")
-        print("automatically starts and stops based on time of day.")
-        print("For example, automatically running during work hours")
-        print("or stopping during specific maintenance windows.")
+        if self.schedule.rules:
+            print("\nActive windows:")
+            for i, rule in enumerate(self.schedule.rules):
+                print(f"{i+1}. {rule.text}")
+            now = self.scheduler.wall_clock()
+            state = "inside" if self.schedule.is_active(now) else "outside"
+            print(f"\nNow {state} a scheduled window. Upcoming transitions:")
+            for timestamp, active in self.schedule.next_transitions(now, 5):
+                when = datetime.fromtimestamp(timestamp).strftime("%a %Y-%m-%d %H:%M")
+                print(f"  {when}  {'start' if active else 'stop'}")
+        else:
+            print("\nNo schedule set; keep awake only runs when started manually.")
         
-        input("\nPress Enter to return to advanced features...")
+        print("\nRules look like 'mon-fri 09:00-17:30', 'daily 22:00-06:00'")
+        print("or 'cron 0 9 * * 1-5 for 8h'.")
+        print("\n1. Add a rule")
+        print("2. Clear all rules")
+        print("3. Back")
+        choice = input("\nSelect an option (1-3): ").strip()
+        if choice == "1":
+            try:
+                rule = input("Rule: ")
+                # The runner reads the rules on the scheduler thread
+                self.scheduler.run_sync(self.schedule.add, rule)
+            except ScheduleError as e:
+                print(f"Error: {str(e)}")
+                return
+            self.start_schedule()
+            print("Rule added.")
+        elif choice == "2":
+            self.clear_schedule()
+            print("Schedule cleared.")
+    
+    def start_power_analyzer(self):
+        """Start streaming battery and process samples into the power analyzer"""
+        if self.power_analyzer is not None:
+            return
+        try:
+            self.power_analyzer = PowerAnalyzer(clock=self.scheduler.clock)
+        except ImportError:
+            return
+        self.power_analyzer.set_session(self.active)
+        self.power_analyzer.start(self.scheduler)
     
     def power_usage_analysis(self):
         """Show power usage analysis"""
         print("\nPower Usage Analysis:")
-        print("Analysis of system power consumption and recommendations")
+        if self.power_analyzer is None:
+            # Like the resource monitor, the analyzer only runs once its screen has been opened
+            self.scheduler.run_sync(self.start_power_analyzer)
+            if self.power_analyzer is not None:
+                print("Started collecting power samples; the analysis fills in as the session runs.")
+        analyzer = self.power_analyzer
+        if analyzer is None:
+            print("Power analysis requires psutil module.")
+            input("\nPress Enter to return to advanced features...")
+            return
         
-        print("\nA real implementation would monitor power usage patterns")
-        print("and provide recommendations to optimize battery life")
-        print("or reduce electricity consumption.")
+        report = analyzer.report()
+        hours = report["samples"] * analyzer.interval / 3600.0
+        print(f"Based on {report['samples']} samples (~{hours:.1f} h, one every {analyzer.interval:g} s)")
         
-        print("\nPower-saving recommendations would include:")
-        print("- Screen brightness adjustments")
-        print("- Sleep settings for unused peripherals")
-        print("- Background app power consumption analysis")
+        if report["battery_percent"] is None:
+            print("\nNo battery detected; showing CPU usage only.")
+        else:
+            power = "plugged in" if report["plugged"] else "on battery"
+            print(f"\nBattery: {report['battery_percent']:.0f}% ({power})")
+            if report["discharge_rate"] is not None:
+                print(f"Current discharge rate: {report['discharge_rate']:.1f}% per hour")
+            for label, key in (("While keep-awake is on", "active_rate"), ("While keep-awake is off", "idle_rate")):
+                if report[key] is not None:
+                    print(f"{label}: {report[key]:.1f}% per hour on battery")
+            if report["session_cost"] is not None:
+                print(f"Estimated keep-awake cost: {report['session_cost']:+.1f}% battery per hour")
+        
+        print(f"\nKeep-awake sessions: {report['sessions']} ({report['active_hours']:.1f} h), "
+              f"CPU {report['active_cpu_seconds']:.0f} s active / {report['idle_cpu_seconds']:.0f} s idle")
+        
+        if report["top"]:
+            print("\nTop background consumers (CPU time since start):")
+            for name, seconds, share in report["top"]:
+                print(f"  {name:24} {seconds:8.1f} s  {share * 100.0:5.1f}%")
         
         input("\nPress Enter to return to advanced features...")
         
@@ -399,6 +819,11 @@ class KeepAwakeConsoleApp:
         print("2. Show countdown notifications")
         print("3. Silent mode (no notifications)")
         
+        try:
+            from icon_cache import describe_bundle, load_bundle
+            print(f"\nTray icon bundle: {describe_bundle(load_bundle())}")
+        except ImportError:
+            print("\nTray icon bundle: unavailable (Pillow is not installed)")
         print("\nThis would allow customization of the application's appearance in a real implementation.")
         input("\nPress Enter to return to advanced features...")
     
@@ -440,6 +865,7 @@ class KeepAwakeConsoleApp:
             except Exception as e:
                 print(f"Error: {str(e)}")
         
+        self.shutdown()
         print("Exiting Keep Awake Utility. Goodbye!")
 
 def print_help():
@@ -452,10 +878,49 @@ def print_help():
     print("  --max-timer, -m          Use maximum timer (10 hours)")
     print("  --timer=HOURS            Set specific timer hours (1, 2, 5, or 10)")
     print("  --non-interactive        Run in non-interactive mode (good for services)")
+    print("  --startup-profile        Print per-import timing once keep-awake is active")
+    print("  --profile[=MODE]         Profile the session: cprofile (default) or sample;")
+    print("                           written on exit or SIGUSR1 (see profiling.py)")
+    print("  --profile-dir=DIR        Where profiles are written (default: ./profiles/...)")
+    print("  --profile-memory=SECS    tracemalloc snapshot interval (default 60, 0 disables)")
+    print("  --daemon                 Run headless and accept commands on a local socket")
+    print("  --socket=PATH            Control socket path for --daemon")
+    print("  --runtime=RUNTIME        threads (default) or asyncio: commands, activity, countdown")
+    print("                           and shutdown grace period on one event loop")
+    print("  --inhibit=BACKEND        Keep-awake backend: auto, logind, systemd-inhibit,")
+    print("                           windows or input (default: auto)")
+    print("  --idle-threshold=SECS    Only inject activity after SECS of user idle time")
+    print(f"                           (default: {DEFAULT_IDLE_THRESHOLD}, 0 = always)")
+    print("  --activity=TYPE          Simulated activity: both (default), mouse or keyboard")
+    print("  --interval=SECS          Seconds between simulated activity (default: 6)")
+    print("  --jitter=KIND[:SPREAD]   Timing jitter: none, uniform, gaussian or exponential")
+    print("                           (SPREAD is a fraction of the interval, default 0.2)")
+    print("  --sample-interval=SECS   Resource monitor sampling rate (default 2, 0 disables)")
+    print("  --until-pid=PID[,PID]    End when these processes exit")
+    print("  --until-process=NAME     End when every process called NAME exits")
+    print("  --until-cpu-below=PCT[:MIN]   End when CPU stays below PCT% for MIN minutes")
+    print("  --until-net-below=KBPS[:MIN]  End when network stays below KBPS KB/s for MIN minutes")
+    print("  --until-file-idle=PATH[:MIN]  End when PATH stops changing for MIN minutes")
+    print("                           (MIN defaults to 10)")
+    print("  --on-trigger=ACTION      What a trigger does: shutdown (default) or stop")
+    print("  --schedule=RULE          Keep awake inside a window, e.g. 'mon-fri 09:00-17:30'")
+    print("                           or 'cron 0 9 * * 1-5 for 8h' (repeatable)")
+    print("  --schedule-tz=ZONE       Time zone for --schedule rules (default: local time)")
+    print("  --journal=DIR            Where session history is kept (see session_journal.py)")
+    print("  --no-journal             Do not record session history")
+    print("  --state-file=PATH        Where the running session is saved for resume")
+    print("  --resume                 Resume a session left behind by a crash or restart")
+    print("  --no-resume              Neither save nor resume the running session")
+    print("  --metrics-port=PORT      Serve Prometheus metrics on localhost:PORT")
+    print("  --on-battery=ACTION      When AC is unplugged: pause, shutdown or timer=MINUTES")
+    print("  --battery-below=PCT[:ACTION]  When the battery drops below PCT% (default: pause);")
+    print("                           undone when power returns (see power_policy.py)")
     print("\nExamples:")
     print("  python console_keep_awake.py")
     print("  python console_keep_awake.py --auto-start --max-timer")
     print("  python console_keep_awake.py --timer=2")
+    print("  python console_keep_awake.py --daemon --auto-start")
+    print("  python console_keep_awake.py --auto-start --until-process=blender --on-trigger=shutdown")
     print("\nWhen running in interactive mode, you'll be prompted for commands.")
     print("Use 'exit' to quit the application.\n")
     sys.exit(0)
@@ -465,17 +930,60 @@ def main():
     if len(sys.argv) > 1 and any(arg in ["--help", "-h", "/?"] for arg in sys.argv):
         print_help()
         
-    app = KeepAwakeConsoleApp()
+    # asyncio is only imported when its runtime is asked for
+    runtime = "threads"
+    if any(arg.startswith("--runtime=") for arg in sys.argv):
+        from async_runtime import parse_runtime_arg
+        runtime = parse_runtime_arg(sys.argv)
+        if runtime == "asyncio" and "--daemon" in sys.argv:
+            print("Warning: --daemon needs the threads runtime; ignoring --runtime=asyncio")
+            runtime = "threads"
+    if runtime == "asyncio":
+        from async_runtime import AsyncConsoleRuntime, AsyncScheduler
+        app = KeepAwakeConsoleApp(scheduler=AsyncScheduler())
+    else:
+        app = KeepAwakeConsoleApp()
+    app.inhibit_preference = parse_inhibit_arg(sys.argv)
+    app.idle_threshold = parse_idle_threshold_arg(sys.argv)
+    app.sample_interval = parse_sample_interval_arg(sys.argv)
+    triggers, app.triggers.action = parse_trigger_args(sys.argv)
+    for trigger in triggers:
+        app.triggers.add(trigger)
+    app.schedule = parse_schedule_args(sys.argv)
+    app.set_activity_pattern(parse_pattern_args(sys.argv))
+    journal_dir = parse_journal_args(sys.argv)
+    if journal_dir:
+        app.open_journal(journal_dir)
+    state_path = parse_state_args(sys.argv)
+    if state_path:
+        app.timer_state = TimerState(state_path)
+    metrics_port = parse_metrics_port_arg(sys.argv)
+    if metrics_port is not None:
+        app.start_metrics(metrics_port)
+    power_policy, power_root = parse_power_args(sys.argv)
+    if power_policy is not None:
+        app.start_power_policy(power_policy, power_root)
+    
+    # A session left behind by a crash or restart only resumes when asked to; it may end in a shutdown
+    if not any(arg in ["--auto-start", "-a"] for arg in sys.argv):
+        if parse_resume_arg(sys.argv):
+            app.resume_session()
+        else:
+            discard_interrupted(app.timer_state)
     
     # Check for command line arguments
     if len(sys.argv) > 1:
         auto_start = any(arg in ["--auto-start", "-a"] for arg in sys.argv)
         max_timer = any(arg in ["--max-timer", "-m"] for arg in sys.argv)
         non_interactive = any(arg in ["--non-interactive"] for arg in sys.argv)
+        daemon_mode = "--daemon" in sys.argv
+        socket_path = None
         
         # Check for timer parameter
         timer_hours = 0
         for arg in sys.argv:
+            if arg.startswith("--socket="):
+                socket_path = arg.split("=", 1)[1]
             if arg.startswith("--timer="):
                 try:
                     timer_hours = int(arg.split("=")[1])
@@ -497,21 +1005,45 @@ def main():
         if auto_start:
             app.start_keep_awake()
             print(f"\nAuto-started with timer: {app.current_timer}")
+            mark_startup("keep-awake active", report=True)
+        
+        # Scheduled windows take over starting and stopping
+        if app.schedule.rules:
+            app.start_schedule()
+        
+        # Daemon mode: no UI, commands arrive over the control socket
+        if daemon_mode:
+            from control_socket import ControlError
+            from keep_awake_daemon import KeepAwakeDaemon
+            try:
+                KeepAwakeDaemon(app, socket_path).run()
+            except (ControlError, OSError) as e:
+                print(f"Error: Cannot start daemon: {str(e)}")
+                app.shutdown()
+            return
         
         # If non-interactive mode is specified, just keep the main thread alive
+        if non_interactive and runtime == "asyncio":
+            AsyncConsoleRuntime(app).run(interactive=False)
+            return
         if non_interactive:
             print("Running in non-interactive mode. Press Ctrl+C to exit.")
+            # Block on an event instead of polling, so SIGTERM or Ctrl+C exits at once
+            if threading.current_thread() is threading.main_thread():
+                signal.signal(signal.SIGTERM, lambda signum, frame: app.exit_requested.set())
             try:
-                while True:
-                    time.sleep(1)
+                app.exit_requested.wait()
             except KeyboardInterrupt:
                 print("\nReceived interrupt signal.")
-                app.stop_keep_awake()
-                print("Exiting Keep Awake Utility. Goodbye!")
-                return
+            app.shutdown()
+            print("Exiting Keep Awake Utility. Goodbye!")
+            return
     
     # Run the interactive console interface
-    app.run_interactive()
+    if runtime == "asyncio":
+        AsyncConsoleRuntime(app).run()
+    else:
+        app.run_interactive()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,305 @@
+"""
+Local control socket for the Keep Awake Utility.
+A single-threaded, selector-driven Unix domain socket server speaking a
+compact line protocol, plus a small client:
+
+    request:   COMMAND [ARG ...]\\n
+    response:  OK [key=value ...]\\n   or   ERR message\\n
+
+Connections stay open, so a client can pipeline many requests. An
+argument list that may hold spaces travels as one token (encode_args). Where
+AF_UNIX is missing (older Windows builds) a (host, port) tuple serves the
+same protocol over loopback TCP.
+"""
+
+import json
+import os
+import selectors
+import socket
+import tempfile
+import threading
+
+MAX_LINE = 4096
+# Replies a client has not read yet; past this the server stops reading its requests
+MAX_PENDING = 64 * 1024
+
+
+class ControlError(Exception):
+    """Raised for connection failures and ERR responses"""
+
+
+def default_socket_path(name="keep-awake"):
+    """Per-user socket path, preferring XDG_RUNTIME_DIR"""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, f"{name}.sock")
+    uid = os.getuid() if hasattr(os, "getuid") else os.environ.get("USERNAME", "user")
+    return os.path.join(tempfile.gettempdir(), f"{name}-{uid}.sock")
+
+
+def format_response(ok, fields=None, message=""):
+    """Build an OK/ERR response line from a dict of fields"""
+    if not ok:
+        return f"ERR {message}\n"
+    parts = ["OK"]
+    for key, value in (fields or {}).items():
+        if isinstance(value, bool):
+            value = int(value)
+        parts.append(f"{key}={str(value).replace(' ', '_')}")
+    return " ".join(parts) + "\n"
+
+
+def parse_response(line):
+    """Split an OK response into a dict; raises ControlError for ERR"""
+    line = line.strip()
+    if line.startswith("ERR"):
+        raise ControlError(line[4:] or "error")
+    if not line.startswith("OK"):
+        raise ControlError(f"Malformed response: {line!r}")
+    fields = {}
+    for part in line.split()[1:]:
+        key, _, value = part.partition("=")
+        fields[key] = value
+    return fields
+
+
+def encode_args(values):
+    """A list of strings as one whitespace-free token: compact JSON with spaces escaped"""
+    return json.dumps([str(value) for value in values], separators=(",", ":")).replace(" ", "\\u0020")
+
+
+def decode_args(token):
+    """Inverse of encode_args; raises ControlError for anything but a list of strings"""
+    try:
+        values = json.loads(token)
+    except ValueError:
+        values = None
+    if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+        raise ControlError("arguments must be a JSON list of strings")
+    return values
+
+
+def _family(address):
+    return socket.AF_INET if isinstance(address, tuple) else socket.AF_UNIX
+
+
+class _Connection:
+    """Per-client buffers: request bytes not yet split into lines, reply bytes not yet sent"""
+
+    def __init__(self):
+        self.inbox = bytearray()
+        self.outbox = bytearray()
+
+
+class ControlServer:
+    def __init__(self, path, handler):
+        """handler(command, args) returns a response line built with format_response"""
+        # A filesystem path for a Unix socket, or (host, port) for loopback TCP
+        self.path = path
+        self.handler = handler
+        self.selector = selectors.DefaultSelector()
+        self.sock = None
+        self.thread = None
+        self.requests = 0
+        self._running = False
+        self._wake_r, self._wake_w = socket.socketpair()
+
+    def bind(self):
+        """Bind the socket, replacing a stale one left behind by a dead process"""
+        if isinstance(self.path, tuple):
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.bind(self.path)
+            # Report the port the OS picked when asked for port 0
+            self.path = self.sock.getsockname()[:2]
+        else:
+            if os.path.exists(self.path):
+                if socket_is_live(self.path):
+                    raise ControlError(f"Another instance is already listening on {self.path}")
+                os.unlink(self.path)
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            old_umask = os.umask(0o077)
+            try:
+                self.sock.bind(self.path)
+            finally:
+                os.umask(old_umask)
+        self.sock.listen(16)
+        self.sock.setblocking(False)
+        self.selector.register(self.sock, selectors.EVENT_READ, None)
+        self.selector.register(self._wake_r, selectors.EVENT_READ, "wake")
+
+    def start(self):
+        """Serve on a background thread"""
+        if self.sock is None:
+            self.bind()
+        self._running = True
+        self.thread = threading.Thread(target=self.serve_forever, name="keep-awake-control", daemon=True)
+        self.thread.start()
+
+    def serve_forever(self):
+        if self.sock is None:
+            self.bind()
+        self._running = True
+        while self._running:
+            for key, events in self.selector.select():
+                if key.data == "wake":
+                    self._wake_r.recv(64)
+                elif key.data is None:
+                    self._accept()
+                else:
+                    if events & selectors.EVENT_WRITE:
+                        self._flush(key.fileobj, key.data)
+                    if events & selectors.EVENT_READ and key.fileobj.fileno() != -1:
+                        self._service(key.fileobj, key.data)
+        self._close_all()
+
+    def stop(self):
+        """Stop serving and remove the socket file"""
+        self._running = False
+        try:
+            self._wake_w.send(b"x")
+        except OSError:
+            pass
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(2)
+        self.thread = None
+
+    def _accept(self):
+        try:
+            conn, _ = self.sock.accept()
+        except BlockingIOError:
+            return
+        conn.setblocking(False)
+        self.selector.register(conn, selectors.EVENT_READ, _Connection())
+
+    def _service(self, conn, state):
+        try:
+            data = conn.recv(MAX_LINE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._drop(conn)
+            return
+        buffer = state.inbox
+        buffer.extend(data)
+        replies = []
+        while b"\n" in buffer:
+            line, _, rest = bytes(buffer).partition(b"\n")
+            buffer[:] = rest
+            replies.append(self._dispatch(line))
+        if len(buffer) > MAX_LINE:
+            replies.append(format_response(False, message="request too long"))
+            buffer.clear()
+        if replies:
+            state.outbox.extend("".join(replies).encode("utf-8"))
+            self._flush(conn, state)
+
+    def _flush(self, conn, state):
+        """Send what the socket takes now; the rest waits for EVENT_WRITE so one slow reader never stalls the loop"""
+        if state.outbox:
+            try:
+                sent = conn.send(state.outbox)
+            except (BlockingIOError, InterruptedError):
+                sent = 0
+            except OSError:
+                self._drop(conn)
+                return
+            del state.outbox[:sent]
+        events = selectors.EVENT_WRITE if state.outbox else selectors.EVENT_READ
+        if state.outbox and len(state.outbox) < MAX_PENDING:
+            events |= selectors.EVENT_READ
+        if self.selector.get_key(conn).events != events:
+            self.selector.modify(conn, events, state)
+
+    def _dispatch(self, line):
+        self.requests += 1
+        parts = line.decode("utf-8", errors="replace").split()
+        if not parts:
+            return format_response(False, message="empty request")
+        try:
+            return self.handler(parts[0].lower(), parts[1:])
+        except Exception as e:
+            return format_response(False, message=str(e))
+
+    def _drop(self, conn):
+        try:
+            self.selector.unregister(conn)
+        except (KeyError, ValueError):
+            pass
+        conn.close()
+
+    def _close_all(self):
+        for key in list(self.selector.get_map().values()):
+            if key.data not in (None, "wake"):
+                key.fileobj.close()
+        self.selector.close()
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            if not isinstance(self.path, tuple):
+                try:
+                    os.unlink(self.path)
+                except OSError:
+                    pass
+        self._wake_r.close()
+        self._wake_w.close()
+
+
+class ControlClient:
+    def __init__(self, path=None, timeout=2.0):
+        """Persistent connection to a control server"""
+        self.path = path or default_socket_path()
+        self.sock = socket.socket(_family(self.path), socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(self.path)
+        except OSError as e:
+            self.sock.close()
+            raise ControlError(f"Cannot connect to {self.path}: {str(e)}")
+        self._buffer = bytearray()
+
+    def request(self, command, *args):
+        """Send one request; returns the raw response line"""
+        line = " ".join([command] + [str(arg) for arg in args]) + "\n"
+        self.sock.sendall(line.encode("utf-8"))
+        while b"\n" not in self._buffer:
+            chunk = self.sock.recv(MAX_LINE)
+            if not chunk:
+                raise ControlError("Server closed the connection")
+            self._buffer.extend(chunk)
+        reply, _, rest = bytes(self._buffer).partition(b"\n")
+        self._buffer[:] = rest
+        return reply.decode("utf-8")
+
+    def call(self, command, *args):
+        """Send one request and return its fields; raises ControlError on ERR"""
+        return parse_response(self.request(command, *args))
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def socket_is_live(path):
+    """True when something is accepting connections on path"""
+    probe = socket.socket(_family(path), socket.SOCK_STREAM)
+    probe.settimeout(0.5)
+    try:
+        probe.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+def send_command(command, *args, path=None):
+    """One-shot helper: connect, send a request, return the response fields"""
+    with ControlClient(path) as client:
+        return client.call(command, *args)
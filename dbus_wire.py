@@ -0,0 +1,318 @@
+"""
+Minimal D-Bus wire protocol for the Keep Awake Utility.
+Just enough of the specification (EXTERNAL auth, unix fd passing and
+basic type marshalling) to call logind's Inhibit method without pulling
+in a D-Bus binding. Also used by the tests to run a fake bus service.
+"""
+
+import array
+import os
+import socket
+import struct
+
+METHOD_CALL = 1
+METHOD_RETURN = 2
+ERROR = 3
+SIGNAL = 4
+
+NO_REPLY_EXPECTED = 0x1
+
+FIELD_PATH = 1
+FIELD_INTERFACE = 2
+FIELD_MEMBER = 3
+FIELD_ERROR_NAME = 4
+FIELD_REPLY_SERIAL = 5
+FIELD_DESTINATION = 6
+FIELD_SENDER = 7
+FIELD_SIGNATURE = 8
+FIELD_UNIX_FDS = 9
+
+_FIELD_TYPES = {
+    FIELD_PATH: "o",
+    FIELD_INTERFACE: "s",
+    FIELD_MEMBER: "s",
+    FIELD_ERROR_NAME: "s",
+    FIELD_REPLY_SERIAL: "u",
+    FIELD_DESTINATION: "s",
+    FIELD_SENDER: "s",
+    FIELD_SIGNATURE: "g",
+    FIELD_UNIX_FDS: "u",
+}
+
+_ALIGN = {"y": 1, "b": 4, "i": 4, "u": 4, "h": 4, "s": 4, "o": 4, "g": 1, "v": 1}
+_INTS = {"b": "<I", "i": "<i", "u": "<I", "h": "<I"}
+
+SYSTEM_BUS_DEFAULT = "unix:path=/run/dbus/system_bus_socket"
+MAX_FDS = 16
+
+
+class DBusError(Exception):
+    """Raised for protocol failures and D-Bus error replies"""
+
+
+class Message:
+    def __init__(self, msg_type, serial, fields, body, flags=0, fds=None):
+        self.type = msg_type
+        self.serial = serial
+        self.fields = fields
+        self.body = body
+        self.flags = flags
+        self.fds = fds or []
+
+    @property
+    def member(self):
+        return self.fields.get(FIELD_MEMBER)
+
+    @property
+    def signature(self):
+        return self.fields.get(FIELD_SIGNATURE, "")
+
+
+def _pad(buf, align):
+    buf.extend(b"\0" * (-len(buf) % align))
+
+
+def _marshal_value(buf, code, value):
+    _pad(buf, _ALIGN[code])
+    if code == "y":
+        buf.append(value)
+    elif code in _INTS:
+        buf.extend(struct.pack(_INTS[code], int(value)))
+    elif code in ("s", "o"):
+        data = value.encode("utf-8")
+        buf.extend(struct.pack("<I", len(data)))
+        buf.extend(data + b"\0")
+    elif code == "g":
+        data = value.encode("ascii")
+        buf.append(len(data))
+        buf.extend(data + b"\0")
+    elif code == "v":
+        inner_code, inner_value = value
+        _marshal_value(buf, "g", inner_code)
+        _marshal_value(buf, inner_code, inner_value)
+    else:
+        raise DBusError(f"Unsupported D-Bus type: {code}")
+
+
+def marshal(signature, values, buf=None):
+    """Append the values for a flat signature to buf"""
+    buf = bytearray() if buf is None else buf
+    if len(signature) != len(values):
+        raise DBusError("Signature does not match the number of values")
+    for code, value in zip(signature, values):
+        _marshal_value(buf, code, value)
+    return buf
+
+
+def _unmarshal_value(data, pos, code):
+    pos += -pos % _ALIGN[code]
+    if code == "y":
+        return data[pos], pos + 1
+    if code in _INTS:
+        value = struct.unpack_from(_INTS[code], data, pos)[0]
+        return (bool(value) if code == "b" else value), pos + 4
+    if code in ("s", "o"):
+        length = struct.unpack_from("<I", data, pos)[0]
+        start = pos + 4
+        return data[start:start + length].decode("utf-8"), start + length + 1
+    if code == "g":
+        length = data[pos]
+        return data[pos + 1:pos + 1 + length].decode("ascii"), pos + length + 2
+    if code == "v":
+        inner_code, pos = _unmarshal_value(data, pos, "g")
+        if len(inner_code) != 1:
+            raise DBusError(f"Unsupported variant type: {inner_code}")
+        return _unmarshal_value(data, pos, inner_code)
+    raise DBusError(f"Unsupported D-Bus type: {code}")
+
+
+def unmarshal(signature, data, pos=0):
+    """Decode a flat signature from data; returns the list of values"""
+    values = []
+    for code in signature:
+        value, pos = _unmarshal_value(data, pos, code)
+        values.append(value)
+    return values
+
+
+def build_message(msg_type, serial, fields, signature="", body=(), flags=0, fds=0):
+    """Serialize a message; fields maps header field codes to values"""
+    body_buf = marshal(signature, list(body)) if signature else bytearray()
+    fields = dict(fields)
+    if signature:
+        fields[FIELD_SIGNATURE] = signature
+    if fds:
+        fields[FIELD_UNIX_FDS] = fds
+
+    header = bytearray(b"l")
+    header.extend(struct.pack("<BBBII", msg_type, flags, 1, len(body_buf), serial))
+    header.extend(b"\0\0\0\0")
+    for code in sorted(fields):
+        # Header fields are an a(yv) array; each struct is 8-aligned in the message
+        _pad(header, 8)
+        header.append(code)
+        _marshal_value(header, "v", (_FIELD_TYPES[code], fields[code]))
+    struct.pack_into("<I", header, 12, len(header) - 16)
+    _pad(header, 8)
+    return bytes(header + body_buf)
+
+
+def parse_message(data, fds=None):
+    """Parse one message from the start of data; returns (message, size) or (None, 0)"""
+    if len(data) < 16:
+        return None, 0
+    if data[0:1] != b"l":
+        raise DBusError("Only little-endian messages are supported")
+    msg_type, flags, _, body_len, serial, fields_len = struct.unpack_from("<BBBIII", data, 1)
+    header_end = 16 + fields_len
+    body_start = header_end + (-header_end % 8)
+    total = body_start + body_len
+    if len(data) < total:
+        return None, 0
+
+    fields = {}
+    pos = 16
+    while pos < header_end:
+        pos += -pos % 8
+        code = data[pos]
+        value, pos = _unmarshal_value(data, pos + 1, "v")
+        fields[code] = value
+
+    signature = fields.get(FIELD_SIGNATURE, "")
+    body = unmarshal(signature, data[body_start:total]) if signature else []
+    count = fields.get(FIELD_UNIX_FDS, 0)
+    message_fds = []
+    if count and fds:
+        message_fds = fds[:count]
+        del fds[:count]
+    return Message(msg_type, serial, fields, body, flags, message_fds), total
+
+
+def parse_address(address):
+    """Turn a D-Bus address string into a list of connectable socket addresses"""
+    targets = []
+    for entry in address.split(";"):
+        if not entry.startswith("unix:"):
+            continue
+        params = dict(part.split("=", 1) for part in entry[5:].split(",") if "=" in part)
+        if "path" in params:
+            targets.append(params["path"])
+        elif "abstract" in params:
+            targets.append("\0" + params["abstract"])
+    return targets
+
+
+def send_with_fds(sock, data, fds=()):
+    """Send bytes, attaching file descriptors as SCM_RIGHTS ancillary data"""
+    ancillary = []
+    if fds:
+        ancillary = [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", fds).tobytes())]
+    sent = sock.sendmsg([data], ancillary)
+    if sent < len(data):
+        sock.sendall(data[sent:])
+
+
+def recv_with_fds(sock, bufsize=65536):
+    """Receive bytes plus any file descriptors passed alongside them"""
+    data, ancillary, _, _ = sock.recvmsg(bufsize, socket.CMSG_SPACE(MAX_FDS * 4))
+    fds = []
+    for level, kind, payload in ancillary:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            usable = len(payload) - (len(payload) % 4)
+            fds.extend(array.array("i", payload[:usable]))
+    return data, fds
+
+
+class DBusConnection:
+    def __init__(self, address=None, timeout=5.0):
+        """Connect and authenticate to a bus; defaults to the system bus"""
+        address = address or os.environ.get("DBUS_SYSTEM_BUS_ADDRESS", SYSTEM_BUS_DEFAULT)
+        self.sock = None
+        self.serial = 0
+        self.unique_name = None
+        self._buffer = bytearray()
+        self._fds = []
+
+        last_error = None
+        for target in parse_address(address):
+            try:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(timeout)
+                sock.connect(target)
+                self.sock = sock
+                break
+            except OSError as e:
+                last_error = e
+        if self.sock is None:
+            raise DBusError(f"Cannot connect to D-Bus at {address}: {last_error}")
+
+        try:
+            self._authenticate()
+            self.unique_name = self.call("org.freedesktop.DBus", "/org/freedesktop/DBus",
+                                         "org.freedesktop.DBus", "Hello").body[0]
+        except Exception:
+            self.close()
+            raise
+
+    def _auth_line(self, line):
+        self.sock.sendall(line.encode("ascii") + b"\r\n")
+        reply = bytearray()
+        while not reply.endswith(b"\r\n"):
+            chunk = self.sock.recv(1)
+            if not chunk:
+                raise DBusError("Bus closed the connection during authentication")
+            reply.extend(chunk)
+        return reply.decode("ascii").strip()
+
+    def _authenticate(self):
+        self.sock.sendall(b"\0")
+        uid = str(os.getuid()).encode("ascii").hex()
+        if not self._auth_line(f"AUTH EXTERNAL {uid}").startswith("OK"):
+            raise DBusError("D-Bus EXTERNAL authentication was rejected")
+        if not self._auth_line("NEGOTIATE_UNIX_FD").startswith("AGREE_UNIX_FD"):
+            raise DBusError("Bus does not support passing file descriptors")
+        self.sock.sendall(b"BEGIN\r\n")
+
+    def call(self, destination, path, interface, member, signature="", args=()):
+        """Call a method and wait for its reply; raises DBusError on error replies"""
+        self.serial += 1
+        serial = self.serial
+        fields = {
+            FIELD_PATH: path,
+            FIELD_INTERFACE: interface,
+            FIELD_MEMBER: member,
+            FIELD_DESTINATION: destination,
+        }
+        self.sock.sendall(build_message(METHOD_CALL, serial, fields, signature, args))
+        while True:
+            message = self._read_message()
+            if message.fields.get(FIELD_REPLY_SERIAL) != serial:
+                for fd in message.fds:
+                    os.close(fd)
+                continue
+            if message.type == ERROR:
+                for fd in message.fds:
+                    os.close(fd)
+                detail = message.body[0] if message.body else ""
+                raise DBusError(f"{message.fields.get(FIELD_ERROR_NAME)}: {detail}")
+            return message
+
+    def _read_message(self):
+        while True:
+            message, size = parse_message(self._buffer, self._fds)
+            if message is not None:
+                del self._buffer[:size]
+                return message
+            data, fds = recv_with_fds(self.sock)
+            if not data:
+                raise DBusError("Bus closed the connection")
+            self._buffer.extend(data)
+            self._fds.extend(fds)
+
+    def close(self):
+        for fd in self._fds:
+            os.close(fd)
+        self._fds = []
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
@@ -0,0 +1,286 @@
+"""
+Tray icon cache for the Keep Awake Utility.
+Each state's source image is decoded once and only downscaled,
+tray-sized variants are kept in memory.
+
+When build_icons.py has produced an icon bundle, icons and animation
+frame strips come from it instead: raw RGBA pixels at every tray size,
+wrapped as images without decoding or resampling anything. A bundle whose
+sources changed since it was built, or that was rendered by a different
+renderer than build_icons.py would use now, is ignored.
+"""
+
+import hashlib
+import json
+import os
+import struct
+import threading
+import zlib
+from struct import Struct
+
+from PIL import Image
+
+TRAY_SIZES = (16, 24, 32, 64)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BUNDLE_DIR = os.path.join(BASE_DIR, "icon-bundle")
+BUNDLE_INDEX = "index.json"
+BUNDLE_MAGIC = b"KAIB"
+BUNDLE_VERSION = 1
+# magic, version, entry count
+BUNDLE_HEADER = Struct("<4sHH")
+BUNDLE_NAME_BYTES = 40
+# name, size, frames, compressed length; an entry's frames follow each other, one contiguous run apiece
+BUNDLE_ENTRY = Struct(f"<{BUNDLE_NAME_BYTES}sHHI")
+
+
+class IconBundle:
+    def __init__(self, data):
+        """Parse a bundle; pixel data is only inflated when an entry is first used"""
+        magic, version, count = BUNDLE_HEADER.unpack_from(data, 0)
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+            raise ValueError("not an icon bundle of this version")
+        self.entries = {}
+        offset = BUNDLE_HEADER.size
+        for _ in range(count):
+            name, size, frames, length = BUNDLE_ENTRY.unpack_from(data, offset)
+            offset += BUNDLE_ENTRY.size
+            self.entries[(name.rstrip(b"\0").decode(), size)] = (frames, data[offset:offset + length])
+            offset += length
+        self.names = {name for name, _ in self.entries}
+
+    def has(self, name, sizes):
+        return all((name, size) in self.entries for size in sizes)
+
+    def frame_count(self, name):
+        for (entry, _), (frames, _) in self.entries.items():
+            if entry == name:
+                return frames
+        return 0
+
+    def frames(self, name, size):
+        """Every frame of name at size as RGBA images sharing one pixel buffer"""
+        frames, packed = self.entries[(name, size)]
+        view = memoryview(zlib.decompress(packed))
+        step = size * size * 4
+        return [Image.frombuffer("RGBA", (size, size), view[i * step:(i + 1) * step], "raw", "RGBA", 0, 1)
+                for i in range(frames)]
+
+
+def file_digest(path):
+    """sha256 of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def renderer_kind(recorded="png"):
+    """The renderer build_icons.py would use here: cairosvg when it can render SVGs, else png"""
+    import importlib.util
+    if importlib.util.find_spec("cairosvg") is None:
+        return "png"
+    # A recorded cairosvg is trusted while the module is installed, which keeps its import off the startup path
+    if recorded == "cairosvg":
+        return "cairosvg"
+    try:
+        import cairosvg  # noqa: F401
+    except (ImportError, OSError):
+        # OSError: cairosvg is installed but the cairo library is not
+        return "png"
+    return "cairosvg"
+
+
+def bundle_is_fresh(index, base_dir=BASE_DIR):
+    """True when the bundle came from today's renderer and every source still has the bytes it was built from"""
+    if index.get("renderer") != renderer_kind(index.get("renderer")):
+        return False
+    for path, entry in index.get("sources", {}).items():
+        full_path = os.path.join(base_dir, path)
+        try:
+            size, digest = entry
+            # The size check is free and rejects most edits before any hashing
+            if os.stat(full_path).st_size != size or file_digest(full_path) != digest:
+                return False
+        except (OSError, TypeError, ValueError):
+            return False
+    return True
+
+
+def load_bundle(directory=BUNDLE_DIR, base_dir=BASE_DIR):
+    """The built icon bundle, or None when there is none or its sources changed"""
+    try:
+        with open(os.path.join(directory, BUNDLE_INDEX), "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not bundle_is_fresh(index, base_dir):
+        print("Warning: Icon bundle is out of date; run build_icons.py to rebuild it")
+        return None
+    try:
+        with open(os.path.join(directory, index["bundle"]), "rb") as f:
+            return IconBundle(f.read())
+    except (OSError, KeyError, ValueError, struct.error) as e:
+        print(f"Warning: Cannot read icon bundle: {str(e)}")
+        return None
+
+
+def describe_bundle(bundle):
+    """One line on what a bundle holds, for status output"""
+    if bundle is None:
+        return "not built or out of date (run build_icons.py)"
+    icons = sorted(name for name in bundle.names if "." not in name)
+    strips = [f"{name} ({bundle.frame_count(name)} frames)" for name in sorted(bundle.names) if "." in name]
+    sizes = sorted({size for _, size in bundle.entries})
+    return (f"{', '.join(icons)} at {', '.join(str(size) for size in sizes)} px"
+            + (f"; animations: {', '.join(strips)}" if strips else ""))
+
+
+def bundle_name(path):
+    """Bundle entry name for a source path: its file name without extension"""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+class IconCache:
+    def __init__(self, paths, sizes=TRAY_SIZES, fallback_path="generated-icon.png", bundle=None):
+        """Create a cache for the given {state: icon path} mapping, served from bundle where it has them"""
+        self.paths = dict(paths)
+        self.sizes = tuple(sorted(sizes))
+        self.fallback_path = fallback_path
+        self.bundle = bundle
+        self._frames = {}
+        self.hits = 0
+        self.misses = 0
+        self.swaps = 0
+        self.current_state = None
+        self._variants = {}
+        self._lock = threading.Lock()
+
+    def get(self, state, size=None):
+        """Return the tray-sized image for a state, decoding it on first use"""
+        variants = self._variants.get(state)
+        if variants is None:
+            with self._lock:
+                variants = self._variants.get(state)
+                if variants is None:
+                    self.misses += 1
+                    variants = self._load(state)
+                    self._variants[state] = variants
+                else:
+                    self.hits += 1
+        else:
+            self.hits += 1
+        return variants[self._pick_size(size)]
+
+    def frame_count(self, state, strip):
+        """Frames in a state's animation strip (e.g. "pulse"), 0 without a bundle that has it"""
+        name = self._strip_name(state, strip)
+        return self.bundle.frame_count(name) if name is not None else 0
+
+    def frame(self, state, strip, index, size=None):
+        """One frame of a state's animation strip, straight from the bundle"""
+        size = self._pick_size(size)
+        key = (state, strip, size)
+        frames = self._frames.get(key)
+        if frames is None:
+            with self._lock:
+                frames = self._frames.get(key)
+                if frames is None:
+                    self.misses += 1
+                    frames = self.bundle.frames(self._strip_name(state, strip), size)
+                    self._frames[key] = frames
+                else:
+                    self.hits += 1
+        else:
+            self.hits += 1
+        return frames[index % len(frames)]
+
+    def _strip_name(self, state, strip):
+        path = self.paths.get(state)
+        if self.bundle is None or not path:
+            return None
+        name = f"{bundle_name(path)}.{strip}"
+        return name if self.bundle.has(name, self.sizes) else None
+
+    def swap(self, state):
+        """Record the active state; returns True only when it actually changed"""
+        if state == self.current_state:
+            return False
+        self.current_state = state
+        self.swaps += 1
+        return True
+
+    def stats(self):
+        """Return hit/miss counters and the memory held by cached variants"""
+        held = 0
+        images = [image for variants in list(self._variants.values()) for image in variants.values()]
+        images += [image for frames in list(self._frames.values()) for image in frames]
+        for image in images:
+            held += image.width * image.height * len(image.getbands())
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "swaps": self.swaps,
+            "states": len(self._variants),
+            "bytes": held,
+        }
+
+    def _pick_size(self, size):
+        """Smallest cached size that is at least the requested one"""
+        if size is None:
+            return self.sizes[-1]
+        for candidate in self.sizes:
+            if candidate >= size:
+                return candidate
+        return self.sizes[-1]
+
+    def _resolve(self, path):
+        if not os.path.isabs(path):
+            local = os.path.join(BASE_DIR, path)
+            if os.path.exists(local):
+                return local
+        return path
+
+    def _load(self, state):
+        """Decode the source image once and build every tray-sized variant"""
+        path = self.paths.get(state)
+        if self.bundle is not None and path and self.bundle.has(bundle_name(path), self.sizes):
+            return {size: self.bundle.frames(bundle_name(path), size)[0] for size in self.sizes}
+
+        source = None
+        for path in (self.paths.get(state), self.fallback_path):
+            if not path:
+                continue
+            path = self._resolve(path)
+            if not os.path.exists(path):
+                continue
+            try:
+                # Context manager closes the file handle as soon as pixels are read
+                with Image.open(path) as img:
+                    source = self._fit(img.convert("RGBA"), self.sizes[-1])
+                break
+            except Exception:
+                source = None
+
+        if source is None:
+            source = Image.new('RGBA', (self.sizes[-1], self.sizes[-1]), color=(128, 128, 128, 255))
+
+        # Downscale from the largest variant so the full-size image is freed right away
+        variants = {self.sizes[-1]: source}
+        for size in reversed(self.sizes[:-1]):
+            variants[size] = self._fit(source, size)
+        return variants
+
+    @staticmethod
+    def _fit(image, size):
+        """Scale an image to fit a size x size square, keeping its aspect ratio"""
+        if image.width == size and image.height == size:
+            return image
+        scale = size / max(image.width, image.height)
+        target = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        scaled = image.resize(target, Image.LANCZOS, reducing_gap=3.0)
+        if scaled.size == (size, size):
+            return scaled
+        canvas = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+        canvas.paste(scaled, ((size - scaled.width) // 2, (size - scaled.height) // 2))
+        return canvas
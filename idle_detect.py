@@ -0,0 +1,203 @@
+"""
+User idle detection for the Keep Awake Utility.
+Activity is only injected when the user has been idle long enough for the
+OS idle timers to matter; while someone is typing, ticks are skipped.
+"""
+
+import os
+import sys
+import time
+
+from startup import lazy_import
+
+# Loaded by the idle source that needs them, not at startup
+ctypes = lazy_import("ctypes")
+re = lazy_import("re")
+
+# Inject once idle time is within one activity tick of this many seconds
+DEFAULT_IDLE_THRESHOLD = 60
+# /proc/interrupts lines that belong to keyboards, mice and touchpads
+INPUT_IRQ_PATTERN = r"i8042|keyboard|mouse|touchpad|hid|i2c"
+
+
+class IdleSource:
+    name = "none"
+
+    def idle_seconds(self):
+        """Seconds since the last user input, or None when unknown"""
+        return None
+
+    def close(self):
+        pass
+
+
+class XScreenSaverIdleSource(IdleSource):
+    """X11 idle time from the MIT-SCREEN-SAVER extension"""
+    name = "xscreensaver"
+
+    def __init__(self, display_name=None):
+        import ctypes.util
+
+        class XScreenSaverInfo(ctypes.Structure):
+            _fields_ = [
+                ("window", ctypes.c_ulong),
+                ("state", ctypes.c_int),
+                ("kind", ctypes.c_int),
+                ("til_or_since", ctypes.c_ulong),
+                ("idle", ctypes.c_ulong),
+                ("eventMask", ctypes.c_ulong),
+            ]
+
+        xlib_path = ctypes.util.find_library("X11")
+        xss_path = ctypes.util.find_library("Xss")
+        if not xlib_path or not xss_path:
+            raise OSError("libX11/libXss not found")
+        self.xlib = ctypes.cdll.LoadLibrary(xlib_path)
+        self.xss = ctypes.cdll.LoadLibrary(xss_path)
+        self.xlib.XOpenDisplay.restype = ctypes.c_void_p
+        self.xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        self.xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+        self.xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        self.xlib.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        self.xlib.XFree.argtypes = [ctypes.c_void_p]
+        self.xss.XScreenSaverAllocInfo.restype = ctypes.POINTER(XScreenSaverInfo)
+        self.xss.XScreenSaverQueryInfo.argtypes = [ctypes.c_void_p, ctypes.c_ulong,
+                                                   ctypes.POINTER(XScreenSaverInfo)]
+
+        name = display_name.encode() if display_name else None
+        self.display = self.xlib.XOpenDisplay(name)
+        if not self.display:
+            raise OSError("Cannot open X display")
+        self.root = self.xlib.XDefaultRootWindow(self.display)
+        self.info = self.xss.XScreenSaverAllocInfo()
+        if not self.xss.XScreenSaverQueryInfo(self.display, self.root, self.info):
+            self.close()
+            raise OSError("MIT-SCREEN-SAVER extension unavailable")
+
+    def idle_seconds(self):
+        if not self.xss.XScreenSaverQueryInfo(self.display, self.root, self.info):
+            return None
+        return self.info.contents.idle / 1000.0
+
+    def close(self):
+        if getattr(self, "info", None):
+            self.xlib.XFree(self.info)
+            self.info = None
+        if getattr(self, "display", None):
+            self.xlib.XCloseDisplay(self.display)
+            self.display = None
+
+
+class WindowsLastInputSource(IdleSource):
+    """Idle time from GetLastInputInfo"""
+    name = "getlastinputinfo"
+
+    def __init__(self):
+        class LastInputInfo(ctypes.Structure):
+            _fields_ = [("cbSize", ctypes.c_uint), ("dwTime", ctypes.c_uint)]
+
+        self.user32 = ctypes.windll.user32
+        self.kernel32 = ctypes.windll.kernel32
+        self.info = LastInputInfo()
+        self.info.cbSize = ctypes.sizeof(self.info)
+
+    def idle_seconds(self):
+        if not self.user32.GetLastInputInfo(ctypes.byref(self.info)):
+            return None
+        elapsed = (self.kernel32.GetTickCount() - self.info.dwTime) & 0xFFFFFFFF
+        return elapsed / 1000.0
+
+
+class InterruptIdleSource(IdleSource):
+    """Fallback: time since the input-device interrupt counters last changed"""
+    name = "interrupts"
+
+    def __init__(self, path="/proc/interrupts", pattern=INPUT_IRQ_PATTERN, clock=time.monotonic):
+        self.path = path
+        self.pattern = re.compile(pattern, re.IGNORECASE)
+        self.clock = clock
+        self.last_total = self._read_total()
+        if self.last_total is None:
+            raise OSError(f"No input device interrupts found in {path}")
+        # Counters only tell us that input happened, not when; assume it just did
+        self.last_change = self.clock()
+
+    def _read_total(self):
+        total = 0
+        found = False
+        with open(self.path) as f:
+            for line in f:
+                if not self.pattern.search(line):
+                    continue
+                found = True
+                for field in line.split()[1:]:
+                    if not field.isdigit():
+                        break
+                    total += int(field)
+        return total if found else None
+
+    def idle_seconds(self):
+        try:
+            total = self._read_total()
+        except OSError:
+            return None
+        now = self.clock()
+        if total != self.last_total:
+            self.last_total = total
+            self.last_change = now
+        return now - self.last_change
+
+
+class IdleGate:
+    def __init__(self, source, threshold=DEFAULT_IDLE_THRESHOLD, margin=0):
+        """Decide per activity tick whether injecting input is needed"""
+        self.source = source
+        self.threshold = threshold
+        self.margin = margin
+        self.injected = 0
+        self.skipped = 0
+        self.last_idle = None
+
+    def should_inject(self):
+        """True when idle time is unknown or within margin of the threshold"""
+        idle = self.source.idle_seconds() if self.source is not None else None
+        self.last_idle = idle
+        if idle is None or idle + self.margin >= self.threshold:
+            self.injected += 1
+            return True
+        self.skipped += 1
+        return False
+
+    def summary(self):
+        total = self.injected + self.skipped
+        saved = (self.skipped / total * 100.0) if total else 0.0
+        source = self.source.name if self.source is not None else "none"
+        return f"{self.injected} injected / {self.skipped} skipped ({saved:.0f}% saved, idle source: {source})"
+
+
+def create_idle_source():
+    """Pick the most precise idle source available on this machine"""
+    candidates = []
+    if sys.platform == "win32":
+        candidates.append(WindowsLastInputSource)
+    elif sys.platform.startswith("linux"):
+        if os.environ.get("DISPLAY"):
+            candidates.append(XScreenSaverIdleSource)
+        candidates.append(InterruptIdleSource)
+    for source_class in candidates:
+        try:
+            return source_class()
+        except (OSError, AttributeError):
+            continue
+    return IdleSource()
+
+
+def parse_idle_threshold_arg(argv, default=DEFAULT_IDLE_THRESHOLD):
+    """Return the --idle-threshold=SECONDS value from argv"""
+    for arg in argv:
+        if arg.startswith("--idle-threshold="):
+            try:
+                return max(0, int(arg.split("=", 1)[1]))
+            except ValueError:
+                print(f"Warning: Invalid idle threshold: {arg}")
+    return default
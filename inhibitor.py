@@ -0,0 +1,211 @@
+"""
+Keep-awake backends for the Keep Awake Utility.
+Native backends ask the OS to block sleep/idle while held and cost no
+wakeups at all; the input backend keeps the old behaviour of injecting
+fake activity and is used when nothing native is available.
+"""
+
+import os
+import sys
+
+from startup import lazy_import
+
+# Only the backend that is actually tried pays for these imports
+dbus_wire = lazy_import("dbus_wire")
+shutil = lazy_import("shutil")
+subprocess = lazy_import("subprocess")
+
+APP_NAME = "Keep Awake Utility"
+INHIBIT_REASON = "Keeping the PC awake"
+INHIBIT_WHAT = "sleep:idle"
+
+LOGIND_BUS_NAME = "org.freedesktop.login1"
+LOGIND_PATH = "/org/freedesktop/login1"
+LOGIND_MANAGER = "org.freedesktop.login1.Manager"
+
+
+class InhibitorError(Exception):
+    """Raised when a backend cannot take its inhibitor lock"""
+
+
+class Inhibitor:
+    name = "none"
+    # True when the caller must keep injecting activity itself
+    requires_input = False
+
+    def __init__(self):
+        self.held = False
+
+    def acquire(self):
+        """Take the keep-awake lock"""
+        self.held = True
+
+    def release(self):
+        """Drop the keep-awake lock"""
+        self.held = False
+
+    def describe(self):
+        return f"{self.name} ({'held' if self.held else 'released'})"
+
+
+class InputInjectionInhibitor(Inhibitor):
+    """Fallback: the app keeps the machine awake by injecting input"""
+    name = "input"
+    requires_input = True
+
+
+class LogindInhibitor(Inhibitor):
+    """Hold a logind sleep+idle inhibitor file descriptor obtained over D-Bus"""
+    name = "logind"
+
+    def __init__(self, bus_address=None, what=INHIBIT_WHAT):
+        super().__init__()
+        self.bus_address = bus_address
+        self.what = what
+        self.fd = None
+
+    def acquire(self):
+        if self.held:
+            return
+        try:
+            bus = dbus_wire.DBusConnection(self.bus_address)
+        except (OSError, dbus_wire.DBusError) as e:
+            raise InhibitorError(str(e))
+        try:
+            reply = bus.call(LOGIND_BUS_NAME, LOGIND_PATH, LOGIND_MANAGER, "Inhibit", "ssss",
+                             (self.what, APP_NAME, INHIBIT_REASON, "block"))
+        except (OSError, dbus_wire.DBusError) as e:
+            raise InhibitorError(str(e))
+        finally:
+            # The lock lives in the returned fd, not in the bus connection
+            bus.close()
+        if not reply.fds:
+            raise InhibitorError("logind did not return an inhibitor file descriptor")
+        self.fd = reply.fds[0]
+        for extra in reply.fds[1:]:
+            os.close(extra)
+        self.held = True
+
+    def release(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        self.held = False
+
+
+class SystemdInhibitInhibitor(Inhibitor):
+    """Run `systemd-inhibit` around a child that blocks on stdin until released"""
+    name = "systemd-inhibit"
+
+    def __init__(self, command="systemd-inhibit", what=INHIBIT_WHAT, startup_timeout=0.2):
+        super().__init__()
+        self.command = command
+        self.what = what
+        self.startup_timeout = startup_timeout
+        self.process = None
+
+    def acquire(self):
+        if self.held:
+            return
+        args = [self.command, f"--what={self.what}", f"--who={APP_NAME}",
+                f"--why={INHIBIT_REASON}", "--mode=block", "cat"]
+        try:
+            self.process = subprocess.Popen(args, stdin=subprocess.PIPE,
+                                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except OSError as e:
+            raise InhibitorError(f"Cannot run {self.command}: {str(e)}")
+        try:
+            # A refused lock makes systemd-inhibit exit straight away
+            self.process.wait(self.startup_timeout)
+        except subprocess.TimeoutExpired:
+            self.held = True
+            return
+        error = self.process.stderr.read().decode(errors="replace").strip()
+        self.process = None
+        raise InhibitorError(error or f"{self.command} exited immediately")
+
+    def release(self):
+        if self.process is not None:
+            # Closing stdin ends `cat`, which makes systemd-inhibit drop the lock
+            try:
+                self.process.stdin.close()
+                self.process.wait(2)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process.stderr.close()
+            self.process = None
+        self.held = False
+
+
+class WindowsExecutionStateInhibitor(Inhibitor):
+    """Use SetThreadExecutionState; must be acquired and released on the same thread
+
+    Callers keep to one owner thread: the Tk thread in the GUI (ui.post) and
+    the scheduler thread in the console engine (Scheduler.run_sync).
+    """
+    name = "windows"
+
+    ES_CONTINUOUS = 0x80000000
+    ES_SYSTEM_REQUIRED = 0x00000001
+    ES_DISPLAY_REQUIRED = 0x00000002
+
+    def acquire(self):
+        import ctypes
+        flags = self.ES_CONTINUOUS | self.ES_SYSTEM_REQUIRED | self.ES_DISPLAY_REQUIRED
+        if not ctypes.windll.kernel32.SetThreadExecutionState(flags):
+            raise InhibitorError("SetThreadExecutionState failed")
+        self.held = True
+
+    def release(self):
+        import ctypes
+        ctypes.windll.kernel32.SetThreadExecutionState(self.ES_CONTINUOUS)
+        self.held = False
+
+
+BACKENDS = {
+    "windows": WindowsExecutionStateInhibitor,
+    "logind": LogindInhibitor,
+    "systemd-inhibit": SystemdInhibitInhibitor,
+    "input": InputInjectionInhibitor,
+}
+
+
+def candidate_backends(preferred="auto"):
+    """Backend names to try, most efficient first"""
+    if preferred != "auto":
+        return [preferred, "input"] if preferred != "input" else ["input"]
+    if sys.platform == "win32":
+        return ["windows", "input"]
+    if sys.platform.startswith("linux"):
+        names = ["logind"]
+        if shutil.which("systemd-inhibit"):
+            names.append("systemd-inhibit")
+        return names + ["input"]
+    return ["input"]
+
+
+def acquire_inhibitor(preferred="auto"):
+    """Acquire the first backend that works; input injection always succeeds"""
+    for name in candidate_backends(preferred):
+        backend_class = BACKENDS.get(name)
+        if backend_class is None:
+            print(f"Warning: Unknown keep-awake backend: {name}")
+            continue
+        backend = backend_class()
+        try:
+            backend.acquire()
+            return backend
+        except InhibitorError as e:
+            print(f"Keep-awake backend '{name}' unavailable: {str(e)}")
+    backend = InputInjectionInhibitor()
+    backend.acquire()
+    return backend
+
+
+def parse_inhibit_arg(argv):
+    """Return the --inhibit=NAME value from argv, or 'auto'"""
+    for arg in argv:
+        if arg.startswith("--inhibit="):
+            return arg.split("=", 1)[1] or "auto"
+    return "auto"
@@ -0,0 +1,256 @@
+"""
+Input injection backends for the Keep Awake Utility.
+Each injection is the smallest event sequence that resets the OS idle
+timer: one zero-net relative pointer nudge or one Shift press/release.
+XTest and /dev/uinput are driven directly through ctypes/ioctl, so
+pyautogui is only imported when it is explicitly chosen as the backend.
+"""
+
+import os
+import random
+import struct
+import sys
+import time
+
+from startup import lazy_import
+
+# Only the XTest backend needs ctypes
+ctypes = lazy_import("ctypes")
+
+MOUSE = "mouse"
+KEY = "key"
+
+
+class Injector:
+    name = "none"
+
+    def __init__(self):
+        self.counts = {MOUSE: 0, KEY: 0}
+        self.latency_count = 0
+        self.latency_total_ns = 0
+        self.latency_min_ns = None
+        self.latency_max_ns = 0
+        self.last_latency_ns = 0
+
+    def inject(self, action):
+        """Inject one action (MOUSE or KEY) and time how long it took"""
+        start = time.perf_counter_ns()
+        if action == MOUSE:
+            self._move()
+        else:
+            self._key()
+        elapsed = time.perf_counter_ns() - start
+
+        self.counts[action] = self.counts.get(action, 0) + 1
+        self.last_latency_ns = elapsed
+        self.latency_count += 1
+        self.latency_total_ns += elapsed
+        if self.latency_min_ns is None or elapsed < self.latency_min_ns:
+            self.latency_min_ns = elapsed
+        if elapsed > self.latency_max_ns:
+            self.latency_max_ns = elapsed
+        return elapsed
+
+    def latency_stats(self):
+        """Per-injection latency in microseconds"""
+        count = self.latency_count
+        return {
+            "backend": self.name,
+            "count": count,
+            "mean_us": (self.latency_total_ns / count / 1000.0) if count else 0.0,
+            "min_us": (self.latency_min_ns or 0) / 1000.0,
+            "max_us": self.latency_max_ns / 1000.0,
+            "last_us": self.last_latency_ns / 1000.0,
+        }
+
+    def summary(self):
+        stats = self.latency_stats()
+        return (f"{self.name}: {stats['count']} injections, latency avg {stats['mean_us']:.0f} us, "
+                f"max {stats['max_us']:.0f} us")
+
+    def _move(self):
+        pass
+
+    def _key(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class NullInjector(Injector):
+    """Records and times injections without sending any events"""
+    name = "null"
+
+
+class XTestInjector(Injector):
+    """XTest fake events sent in a single flush, no round trip"""
+    name = "xtest"
+
+    XK_SHIFT_L = 0xFFE1
+
+    def __init__(self, display_name=None):
+        super().__init__()
+        import ctypes.util
+        xlib_path = ctypes.util.find_library("X11")
+        xtst_path = ctypes.util.find_library("Xtst")
+        if not xlib_path or not xtst_path:
+            raise OSError("libX11/libXtst not found")
+        self.xlib = ctypes.cdll.LoadLibrary(xlib_path)
+        self.xtst = ctypes.cdll.LoadLibrary(xtst_path)
+        self.xlib.XOpenDisplay.restype = ctypes.c_void_p
+        self.xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        self.xlib.XFlush.argtypes = [ctypes.c_void_p]
+        self.xlib.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        self.xlib.XKeysymToKeycode.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+        self.xlib.XKeysymToKeycode.restype = ctypes.c_ubyte
+        self.xtst.XTestFakeRelativeMotionEvent.argtypes = [ctypes.c_void_p, ctypes.c_int,
+                                                           ctypes.c_int, ctypes.c_ulong]
+        self.xtst.XTestFakeKeyEvent.argtypes = [ctypes.c_void_p, ctypes.c_uint,
+                                                ctypes.c_int, ctypes.c_ulong]
+
+        self.display = self.xlib.XOpenDisplay(display_name.encode() if display_name else None)
+        if not self.display:
+            raise OSError("Cannot open X display")
+        self.shift_keycode = self.xlib.XKeysymToKeycode(self.display, self.XK_SHIFT_L)
+
+    def _move(self):
+        # One pixel out and back: resets the idle timer with zero net movement
+        self.xtst.XTestFakeRelativeMotionEvent(self.display, 1, 0, 0)
+        self.xtst.XTestFakeRelativeMotionEvent(self.display, -1, 0, 0)
+        self.xlib.XFlush(self.display)
+
+    def _key(self):
+        self.xtst.XTestFakeKeyEvent(self.display, self.shift_keycode, 1, 0)
+        self.xtst.XTestFakeKeyEvent(self.display, self.shift_keycode, 0, 0)
+        self.xlib.XFlush(self.display)
+
+    def close(self):
+        if self.display:
+            self.xlib.XCloseDisplay(self.display)
+            self.display = None
+
+
+class UInputInjector(Injector):
+    """A virtual input device on /dev/uinput; works without any display server"""
+    name = "uinput"
+
+    EV_SYN = 0x00
+    EV_KEY = 0x01
+    EV_REL = 0x02
+    SYN_REPORT = 0
+    REL_X = 0x00
+    KEY_LEFTSHIFT = 42
+    BTN_LEFT = 0x110
+    BUS_VIRTUAL = 0x06
+
+    UI_SET_EVBIT = 0x40045564
+    UI_SET_KEYBIT = 0x40045565
+    UI_SET_RELBIT = 0x40045566
+    UI_DEV_CREATE = 0x5501
+    UI_DEV_DESTROY = 0x5502
+
+    # struct input_event: struct timeval, __u16 type, __u16 code, __s32 value
+    EVENT_FORMAT = "llHHi"
+    ABS_CNT = 64
+
+    def __init__(self, path="/dev/uinput"):
+        super().__init__()
+        import fcntl
+        self.fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+        try:
+            fcntl.ioctl(self.fd, self.UI_SET_EVBIT, self.EV_KEY)
+            fcntl.ioctl(self.fd, self.UI_SET_EVBIT, self.EV_REL)
+            fcntl.ioctl(self.fd, self.UI_SET_RELBIT, self.REL_X)
+            fcntl.ioctl(self.fd, self.UI_SET_KEYBIT, self.KEY_LEFTSHIFT)
+            # A pointer button makes desktops classify the device as a mouse
+            fcntl.ioctl(self.fd, self.UI_SET_KEYBIT, self.BTN_LEFT)
+
+            # Legacy struct uinput_user_dev: name[80], input_id, ff_effects_max, abs arrays
+            name = b"keep-awake-virtual-input"
+            setup = struct.pack("80sHHHHi", name, self.BUS_VIRTUAL, 0x1, 0x1, 1, 0)
+            setup += b"\0" * (4 * self.ABS_CNT * 4)
+            os.write(self.fd, setup)
+            fcntl.ioctl(self.fd, self.UI_DEV_CREATE)
+        except OSError:
+            os.close(self.fd)
+            raise
+        self._syn = self._event(self.EV_SYN, self.SYN_REPORT, 0)
+        self._move_events = (self._event(self.EV_REL, self.REL_X, 1) + self._syn
+                             + self._event(self.EV_REL, self.REL_X, -1) + self._syn)
+        self._key_events = (self._event(self.EV_KEY, self.KEY_LEFTSHIFT, 1) + self._syn
+                            + self._event(self.EV_KEY, self.KEY_LEFTSHIFT, 0) + self._syn)
+
+    def _event(self, ev_type, code, value):
+        return struct.pack(self.EVENT_FORMAT, 0, 0, ev_type, code, value)
+
+    def _move(self):
+        os.write(self.fd, self._move_events)
+
+    def _key(self):
+        os.write(self.fd, self._key_events)
+
+    def close(self):
+        if self.fd is not None:
+            import fcntl
+            try:
+                fcntl.ioctl(self.fd, self.UI_DEV_DESTROY)
+            finally:
+                os.close(self.fd)
+                self.fd = None
+
+
+class PyAutoGUIInjector(Injector):
+    """The original pyautogui path, kept for comparison and non-Linux systems"""
+    name = "pyautogui"
+
+    def __init__(self):
+        super().__init__()
+        import pyautogui
+        self.pyautogui = pyautogui
+
+    def _move(self):
+        x, y = self.pyautogui.position()
+        self.pyautogui.moveTo(x + random.randint(-5, 5), y + random.randint(-5, 5), duration=0.1)
+
+    def _key(self):
+        self.pyautogui.press('shift')
+
+
+BACKENDS = {
+    "xtest": XTestInjector,
+    "uinput": UInputInjector,
+    "pyautogui": PyAutoGUIInjector,
+    "null": NullInjector,
+}
+
+
+def create_injector(preferred="auto"):
+    """Open the lightest injection backend that works on this machine"""
+    if preferred != "auto":
+        names = [preferred]
+    elif sys.platform.startswith("linux"):
+        names = (["xtest"] if os.environ.get("DISPLAY") else []) + ["uinput", "pyautogui"]
+    else:
+        names = ["pyautogui"]
+
+    last_error = None
+    for name in names:
+        injector_class = BACKENDS.get(name)
+        if injector_class is None:
+            last_error = f"unknown backend '{name}'"
+            continue
+        try:
+            return injector_class()
+        except Exception as e:
+            # pyautogui raises assorted errors when there is no display to talk to
+            last_error = f"{name}: {str(e)}"
+    raise RuntimeError(f"No input injection backend available ({last_error})")
+
+
+def parse_inject_arg(argv):
+    """Return the --inject=NAME value from argv, or 'auto'"""
+    for arg in argv:
+        if arg.startswith("--inject="):
+            return arg.split("=", 1)[1] or "auto"
+    return "auto"
@@ -0,0 +1,118 @@
+"""
+Single-instance lock for the Keep Awake Utility.
+The first launch holds a per-user lock file and listens on the control
+socket; later launches forward their command-line flags to it and exit
+before building a second GUI.
+"""
+
+import os
+import socket
+import sys
+import time
+
+from control_socket import (ControlClient, ControlError, ControlServer, decode_args, default_socket_path,
+                            encode_args, format_response)
+
+
+class InstanceLock:
+    def __init__(self, name="keep-awake-gui", directory=None):
+        base = default_socket_path(name)
+        if directory is not None:
+            base = os.path.join(directory, os.path.basename(base))
+        stem = base[:-len(".sock")] if base.endswith(".sock") else base
+        self.name = name
+        self.lock_path = stem + ".lock"
+        self.address_path = stem + ".addr"
+        self.socket_path = stem + ".sock"
+        self.server = None
+        self._file = None
+
+    def acquire(self):
+        """Try to become the running instance; returns False if another one holds the lock"""
+        handle = open(self.lock_path, "a+b")
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        # The OS drops the lock when the process dies, so a crash never leaves it stuck
+        self._file = handle
+        return True
+
+    def release(self):
+        if self.server is not None:
+            self.server.stop()
+            self.server = None
+        if self._file is not None:
+            try:
+                os.unlink(self.address_path)
+            except OSError:
+                pass
+            self._file.close()
+            self._file = None
+
+    def serve(self, on_forward):
+        """Accept forwarded launches; on_forward(args) runs on the server thread"""
+        def handle(command, args):
+            if command == "forward":
+                if len(args) != 1:
+                    return format_response(False, message="usage: forward JSON-ARGS")
+                on_forward(decode_args(args[0]))
+                return format_response(True, {"pid": os.getpid()})
+            if command == "ping":
+                return format_response(True, {"pid": os.getpid()})
+            return format_response(False, message=f"unknown command '{command}'")
+
+        address = self.socket_path if hasattr(socket, "AF_UNIX") else ("127.0.0.1", 0)
+        self.server = ControlServer(address, handle)
+        self.server.start()
+        self._write_address(self.server.path)
+
+    def _write_address(self, address):
+        if isinstance(address, tuple):
+            text = f"tcp:{address[0]}:{address[1]}"
+        else:
+            text = f"unix:{address}"
+        tmp_path = self.address_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, self.address_path)
+
+    def _read_address(self):
+        try:
+            with open(self.address_path) as f:
+                text = f.read().strip()
+        except OSError:
+            return None
+        kind, _, rest = text.partition(":")
+        if kind == "unix" and rest:
+            return rest
+        if kind == "tcp":
+            host, _, port = rest.rpartition(":")
+            if port.isdigit():
+                return (host, int(port))
+        return None
+
+    def forward(self, args, wait=1.0):
+        """Send args to the running instance; waits briefly if it is still starting up"""
+        deadline = time.monotonic() + wait
+        last_error = "no address published"
+        while True:
+            address = self._read_address()
+            if address is not None:
+                try:
+                    with ControlClient(address, timeout=wait) as client:
+                        client.call("forward", encode_args(args))
+                    return True
+                except (ControlError, OSError) as e:
+                    last_error = str(e)
+            if time.monotonic() >= deadline:
+                print(f"Error: Keep Awake Utility is already running but did not respond ({last_error})")
+                return False
+            time.sleep(0.05)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Headless Keep Awake daemon.
+Runs the console keep-awake engine with no UI and exposes it over a local
+Unix domain socket (protocol in control_socket.py). Start it with
+`python console_keep_awake.py --daemon`, then control it with this script:
+
+    python keep_awake_daemon.py status
+    python keep_awake_daemon.py timer 2
+"""
+
+import signal
+import sys
+import threading
+
+from control_socket import (ControlError, ControlServer, default_socket_path,
+                            format_response, send_command)
+
+# Accepted `timer` arguments mapped to the console app's timer options
+TIMER_CHOICES = {
+    "never": "Never",
+    "0": "Never",
+    "1": "1 hour",
+    "2": "2 hours",
+    "5": "5 hours",
+    "10": "10 hours",
+}
+TIMER_HOURS = {option: int(key) for key, option in TIMER_CHOICES.items() if key != "never"}
+
+COMMANDS = ["status", "start", "stop", "timer", "cancel", "ping", "quit"]
+# Answered on the control thread, so a busy scheduler never delays them
+READ_ONLY_COMMANDS = {"status", "ping", "quit"}
+
+
+class KeepAwakeDaemon:
+    def __init__(self, app, socket_path=None):
+        """Serve control requests for a KeepAwakeConsoleApp"""
+        self.app = app
+        self.socket_path = socket_path or default_socket_path()
+        self.server = ControlServer(self.socket_path, self.handle)
+        self.stopped = threading.Event()
+        self.commands = {
+            "status": self.cmd_status,
+            "start": self.cmd_start,
+            "stop": self.cmd_stop,
+            "timer": self.cmd_timer,
+            "cancel": self.cmd_cancel,
+            "ping": self.cmd_ping,
+            "quit": self.cmd_quit,
+        }
+
+    def status_fields(self):
+        """Engine state from the app's published snapshot; safe on any thread, never waits for the scheduler"""
+        app = self.app
+        with app.status_lock:
+            snapshot = app.status_snapshot
+        deadline = snapshot["deadline"]
+        remaining = max(0, int(round(deadline - app.scheduler.clock()))) if deadline is not None else 0
+        return {
+            "active": snapshot["active"],
+            "timer": TIMER_HOURS.get(snapshot["timer"], 0),
+            "remaining": remaining,
+            "shutdown": snapshot["shutdown"],
+            "backend": snapshot["backend"],
+        }
+
+    def handle(self, command, args):
+        handler = self.commands.get(command)
+        if handler is None:
+            return format_response(False, message=f"unknown command '{command}'")
+        if command in READ_ONLY_COMMANDS:
+            return handler(args)
+        # Commands that change engine state run on the app's scheduler thread rather than the control thread
+        return self.app.scheduler.run_sync(handler, args)
+
+    def cmd_status(self, args):
+        return format_response(True, self.status_fields())
+
+    def cmd_start(self, args):
+        if not self.app.active:
+            self.app.start_keep_awake()
+        return format_response(True, self.status_fields())
+
+    def cmd_stop(self, args):
+        if self.app.active:
+            self.app.stop_keep_awake()
+        return format_response(True, self.status_fields())
+
+    def cmd_timer(self, args):
+        if len(args) != 1 or args[0].lower() not in TIMER_CHOICES:
+            return format_response(False, message="usage: timer 1|2|5|10|never")
+        self.app.current_timer = TIMER_CHOICES[args[0].lower()]
+        if self.app.active:
+            self.app.check_timer_selection()
+        else:
+            self.app.publish_status()
+        return format_response(True, self.status_fields())
+
+    def cmd_cancel(self, args):
+        self.app.cancel_shutdown()
+        return format_response(True, self.status_fields())
+
+    def cmd_ping(self, args):
+        return format_response(True, {"pong": 1})
+
+    def cmd_quit(self, args):
+        self.stopped.set()
+        return format_response(True, {"quitting": 1})
+
+    def run(self):
+        """Serve until `quit`, SIGTERM or Ctrl+C, then stop keep-awake and clean up"""
+        self.server.bind()
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda signum, frame: self.stopped.set())
+        self.server.start()
+        print(f"Daemon listening on {self.socket_path}")
+        try:
+            self.stopped.wait()
+        except KeyboardInterrupt:
+            print("\nReceived interrupt signal.")
+        self.server.stop()
+        self.app.shutdown()
+        print("Daemon stopped.")
+
+
+def print_help():
+    """Print help information about the control client"""
+    print("\nKeep Awake Utility - Daemon Control")
+    print("===================================")
+    print("Usage: python keep_awake_daemon.py COMMAND [ARG] [--socket=PATH]")
+    print("\nCommands:")
+    print("  status          Show whether keep-awake is active and the timer state")
+    print("  start / stop    Start or stop keeping the PC awake")
+    print("  timer HOURS     Set the shutdown timer (1, 2, 5, 10 or never)")
+    print("  cancel          Cancel a pending shutdown")
+    print("  quit            Stop the daemon")
+    print("\nStart the daemon with: python console_keep_awake.py --daemon [--auto-start] [--timer=HOURS]\n")
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--socket=")]
+    socket_path = None
+    for arg in sys.argv[1:]:
+        if arg.startswith("--socket="):
+            socket_path = arg.split("=", 1)[1]
+
+    if not args or args[0] in ["--help", "-h", "/?"]:
+        print_help()
+        return 0
+    if args[0] not in COMMANDS:
+        print(f"Unknown command: {args[0]}")
+        print_help()
+        return 1
+
+    try:
+        fields = send_command(*args, path=socket_path)
+    except (ControlError, OSError) as e:
+        print(f"Error: {str(e)}")
+        return 1
+    for key, value in fields.items():
+        print(f"{key}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,7 @@
 import os
 import sys
-import threading
-import time
-import random
-import subprocess
+
+from startup import enable_startup_profile, lazy_import, mark_startup
 
 # Check for help flag
 if len(sys.argv) > 1 and any(arg in ["--help", "-h", "/?"] for arg in sys.argv):
@@ -14,29 +12,107 @@ if len(sys.argv) > 1 and any(arg in ["--help", "-h", "/?"] for arg in sys.argv):
     print("  --auto-start, -a         Automatically start the utility")
     print("  --max-timer, -m          Use maximum timer (10 hours)")
     print("  --timer=HOURS            Set specific timer hours (1, 2, 5, or 10)")
+    print("  --inhibit=BACKEND        Keep-awake backend: auto, logind, systemd-inhibit,")
+    print("                           windows or input (default: auto)")
+    print("  --inject=BACKEND         Input injection backend: auto, xtest, uinput,")
+    print("                           pyautogui or null (default: auto)")
+    print("  --idle-threshold=SECS    Only inject activity after SECS of user idle time")
+    print("                           (default: 60, 0 = always)")
+    print("  --activity=TYPE          Simulated activity: both (default), mouse or keyboard")
+    print("  --interval=SECS          Seconds between simulated activity (default: 6)")
+    print("  --jitter=KIND[:SPREAD]   Timing jitter: none, uniform, gaussian or exponential")
+    print("                           (a second launch with these flags changes the running pattern)")
+    print("  --until-pid=PID[,PID]    End when these processes exit")
+    print("  --until-process=NAME     End when every process called NAME exits")
+    print("  --until-cpu-below=PCT[:MIN]   End when CPU stays below PCT% for MIN minutes")
+    print("  --until-net-below=KBPS[:MIN]  End when network stays below KBPS KB/s for MIN minutes")
+    print("  --until-file-idle=PATH[:MIN]  End when PATH stops changing for MIN minutes")
+    print("  --on-trigger=ACTION      What a trigger does: shutdown (default) or stop")
+    print("  --journal=DIR            Where session history is kept (see session_journal.py)")
+    print("  --no-journal             Do not record session history")
+    print("  --state-file=PATH        Where the running session is saved for resume")
+    print("  --resume                 Resume a session left behind by a crash or restart")
+    print("  --no-resume              Neither save nor resume the running session")
+    print("  --metrics-port=PORT      Serve Prometheus metrics on localhost:PORT")
+    print("  --on-battery=ACTION      When AC is unplugged: pause, shutdown or timer=MINUTES")
+    print("  --battery-below=PCT[:ACTION]  When the battery drops below PCT% (default: pause);")
+    print("                           undone when power returns (see power_policy.py)")
+    print("  --non-interactive        Run headless with the console engine (no GUI/tray)")
+    print("  --startup-profile        Print per-import timing once keep-awake is active")
+    print("  --profile[=MODE]         Profile the session: cprofile (default) or sample;")
+    print("                           written on exit or SIGUSR1 (see profiling.py)")
+    print("  --profile-dir=DIR        Where profiles are written (default: ./profiles/...)")
+    print("  --profile-memory=SECS    tracemalloc snapshot interval (default 60, 0 disables)")
     sys.exit(0)
 
+# Start timing imports before anything heavy is loaded
+enable_startup_profile(sys.argv)
+
+# Headless launches hand off to the console engine and never load GUI or imaging libraries
+if __name__ == "__main__" and "--non-interactive" in sys.argv:
+    from console_keep_awake import main as console_main
+    console_main()
+    sys.exit(0)
+
+# A second launch forwards its flags to the running instance and exits before loading Tk
+INSTANCE_LOCK = None
+if __name__ == "__main__":
+    from instance_lock import InstanceLock
+    INSTANCE_LOCK = InstanceLock()
+    if not INSTANCE_LOCK.acquire():
+        forwarded = INSTANCE_LOCK.forward(sys.argv[1:])
+        if forwarded:
+            print("Keep Awake Utility is already running; forwarded the launch options to it.")
+        sys.exit(0 if forwarded else 1)
+
+# Must run before the app class is defined so its @span hooks see the profiler
+from profiling import enable_profiling, span
+
+enable_profiling(sys.argv)
+
+import importlib.util
+import math
+import threading
+import time
+
 # Import dependencies
 try:
     import tkinter as tk
     from tkinter import ttk, messagebox
-    import pyautogui
-    import psutil
-    from PIL import Image, ImageDraw
 except ImportError as e:
     print(f"Missing required packages: {str(e)}")
     sys.exit(1)
 
-# Check for tray support
-try:
-    import pystray
-    from pystray import MenuItem as Item
-    HAS_TRAY = True
-except ImportError:
-    HAS_TRAY = False
+# Check for tray support without importing it; pystray and Pillow load with the tray
+HAS_TRAY = all(importlib.util.find_spec(name) is not None for name in ("pystray", "PIL"))
+
+subprocess = lazy_import("subprocess")
+
+from activity_pattern import ActivityRunner, has_pattern_args, parse_pattern_args
+from idle_detect import IdleGate, create_idle_source, parse_idle_threshold_arg
+from inhibitor import acquire_inhibitor, parse_inhibit_arg
+from metrics import Metrics, MetricsServer, add_app_gauges, parse_metrics_port_arg
+from power_policy import PowerMonitor, parse_power_args
+from input_inject import MOUSE, create_injector, parse_inject_arg
+from clock import SYSTEM_CLOCK
+from scheduler import Scheduler
+from session_journal import (SHUTDOWN_CANCELLED, SHUTDOWN_EXECUTED, SHUTDOWN_SCHEDULED, START, STOP,
+                             TIMER, SessionJournal, parse_journal_args)
+from timer_state import TimerState, discard_interrupted, parse_resume_arg, parse_state_args, resume_delay
+from triggers import TriggerSet, parse_trigger_args
+from ui_refresh import RefreshLoop, UiQueue
+
+# Seconds between countdown label refreshes while the window is shown
+UI_REFRESH_INTERVAL = 1
+# Seconds between tray tooltip/icon refreshes while it is hidden
+TRAY_REFRESH_INTERVAL = 5
+# Seconds the user has to cancel once the shutdown warning is shown
+SHUTDOWN_GRACE_PERIOD = 60
+# Seconds between pulse frames of the tray icon during the shutdown warning
+TRAY_ANIMATION_INTERVAL = 0.25
 
 class KeepAwakeApp:
-    def __init__(self, root):
+    def __init__(self, root, clock=SYSTEM_CLOCK, shutdown_runner=None):
         self.root = root
         self.root.title("Keep Awake Utility")
         self.root.geometry("740x560")
@@ -48,21 +124,71 @@ class KeepAwakeApp:
         self.timer_active = False
         self.shutdown_scheduled = False
         self.remaining_time = 0
-
-        # Threads
-        self.activity_thread = None
-        self.timer_thread = None
-        self.shutdown_thread = None
+        self.timer_deadline = None
+        # Length of the running countdown, for the tray's countdown ring
+        self.timer_total = None
+        # Wall-clock deadline, which unlike the monotonic one survives a reboot
+        self.timer_wall_deadline = None
+        # Saved on every state change so a restart can resume the countdown; set up by main()
+        self.timer_state = None
+
+        # Keep-awake backend: a native sleep/idle lock, or input injection as fallback
+        self.inhibit_preference = parse_inhibit_arg(sys.argv)
+        self.inhibitor = None
+        self.idle_threshold = parse_idle_threshold_arg(sys.argv)
+        self.idle_gate = None
+        self.inject_preference = parse_inject_arg(sys.argv)
+        self.injector = None
+
+        # Threads: the tray runs its own loop, every timed action shares the scheduler
         self.tray_thread = None
         self.stop_threads = threading.Event()
+        # Seconds from a stop request until no job can still be running
+        self.stop_latency = None
+        self.scheduler = Scheduler(clock)
+        self.scheduler.start()
+        # Runs the shutdown command list; subprocess.run unless a test swaps it out
+        self.shutdown_runner = shutdown_runner
+        # Every update from another thread reaches Tk through this one queue
+        self.ui = UiQueue(lambda: self.root.after(0, self.ui.drain))
+        # End conditions fire on the scheduler thread; dialogs need the Tk thread
+        triggers, action = parse_trigger_args(sys.argv)
+        self.triggers = TriggerSet(self.scheduler, lambda trigger: self.ui.post(self.on_trigger, trigger), action)
+        for trigger in triggers:
+            self.triggers.add(trigger)
+        # Injection times and actions come precomputed from the activity pattern
+        self.activity = ActivityRunner(self.scheduler, parse_pattern_args(sys.argv), self.simulate_activity)
+        self.timer_job = None
+        self.shutdown_job = None
+        # Steps the tray pulse while the shutdown warning is up
+        self.tray_animation_job = None
+        self.tray_frame = 0
+        # Session history on disk; opened by main() unless --no-journal is given
+        self.journal = None
+        # Counters are always kept; the HTTP endpoint only runs with --metrics-port
+        self.metrics = Metrics()
+        add_app_gauges(self.metrics, self)
+        self.metrics_server = None
+        # Battery/AC policy; only watched when --on-battery or --battery-below is given
+        self.power_policy = None
+        self.power_monitor = None
 
         self.status_text = tk.StringVar(value="Inactive")
         self.timer_text = tk.StringVar(value="No shutdown scheduled")
 
         self.setup_gui()
 
+        # Display values are redrawn from the Tk thread, and only when they change
+        self.refresh = RefreshLoop(self.root.after, self.root.after_cancel, self.window_visible,
+                                   UI_REFRESH_INTERVAL, TRAY_REFRESH_INTERVAL if HAS_TRAY else None)
+        self.refresh.add("countdown", self.countdown_text, self.draw_countdown)
+        self.refresh.add("tray", self.tray_state, self.draw_tray, visible_only=False)
+        self.root.bind("<Map>", self.on_map)
+        self.root.after_idle(self.refresh.start)
+
         if HAS_TRAY:
-            self.setup_tray_icon()
+            # Built once the main loop runs so the window is not held up by pystray/Pillow
+            self.root.after_idle(self.setup_tray_icon)
 
         self.root.protocol("WM_DELETE_WINDOW", self.minimize_to_tray)
 
@@ -114,45 +240,127 @@ class KeepAwakeApp:
         footer = ttk.Label(frame, text="Simulates mouse/keyboard activity to keep your PC awake.")
         footer.pack(pady=(10, 5))
 
+    def apply_launch_args(self, argv, forwarded=False):
+        """Apply --auto-start/--timer/--max-timer from this launch or a forwarded one"""
+        auto_start = "--auto-start" in argv or "-a" in argv
+        if auto_start:
+            max_timer = "--max-timer" in argv or "-m" in argv
+            for arg in argv:
+                if arg.startswith("--timer="):
+                    try:
+                        hrs = int(arg.split("=")[1])
+                        if hrs in [1, 2, 5, 10]:
+                            self.timer_var.set(f"{hrs} hour" if hrs == 1 else f"{hrs} hours")
+                    except:
+                        pass
+            if max_timer:
+                self.timer_var.set("10 hours")
+            if self.active:
+                self.apply_timer_setting()
+            else:
+                self.start_keep_awake()
+        elif not forwarded:
+            # A session left behind by a crash or restart only resumes when asked to; it may end in a shutdown
+            if parse_resume_arg(argv):
+                self.resume_session()
+            else:
+                discard_interrupted(self.timer_state)
+        if forwarded and has_pattern_args(argv):
+            # Takes effect at the next injection; the scheduler thread keeps running
+            pattern = parse_pattern_args(argv, self.activity.pattern)
+            self.activity.set_pattern(pattern)
+            if self.idle_gate is not None:
+                self.idle_gate.margin = pattern.max_gap()
+        if forwarded:
+            self.restore_from_tray()
+
     def on_timer_change(self, event=None):
         if self.active:
             self.apply_timer_setting()
 
-    def apply_timer_setting(self):
+    def apply_timer_setting(self, remaining=None):
+        """Start the selected countdown; remaining resumes a saved one instead"""
         option = self.timer_var.get()
         hours_map = {"1 hour": 1, "2 hours": 2, "5 hours": 5, "10 hours": 10}
         self.timer_active = False
+        self.scheduler.cancel(self.timer_job)
+        self.timer_job = None
+        self.timer_wall_deadline = None
 
-        if option == "Never":
+        if option == "Never" and remaining is None:
             self.timer_text.set("No shutdown scheduled")
             self.cancel_button.config(state=tk.DISABLED)
+            self.save_timer_state()
             return
 
-        if option in hours_map:
-            self.remaining_time = hours_map[option] * 3600
+        if option in hours_map or remaining is not None:
+            seconds = hours_map[option] * 3600 if remaining is None else remaining
+            self.remaining_time = int(round(seconds))
+            self.timer_total = hours_map[option] * 3600 if option in hours_map else seconds
+            self.timer_deadline = self.scheduler.clock() + seconds
+            self.timer_wall_deadline = self.scheduler.wall_clock() + seconds
             self.timer_active = True
             self.cancel_button.config(state=tk.NORMAL)
-            self.timer_thread = threading.Thread(target=self.countdown_timer, daemon=True)
-            self.timer_thread.start()
-
-    def start_keep_awake(self):
+            if remaining is None:
+                self.journal_event(TIMER, hours_map[option])
+            self.save_timer_state()
+            # The label is redrawn by the refresh loop, so only wake when the deadline is due
+            self.timer_job = self.scheduler.call_later(seconds, self.countdown_timer)
+            self.refresh.wake()
+
+    def start_keep_awake(self, remaining=None):
         if self.active:
             return
         self.active = True
         self.status_text.set("Active")
         self.stop_threads.clear()
+        self.journal_event(START)
         self.start_button.config(state=tk.DISABLED)
         self.stop_button.config(state=tk.NORMAL)
-        self.apply_timer_setting()
-        self.activity_thread = threading.Thread(target=self.simulate_activity, daemon=True)
-        self.activity_thread.start()
+        self.apply_timer_setting(remaining)
+        self.inhibitor = acquire_inhibitor(self.inhibit_preference)
+        if self.inhibitor.requires_input:
+            if self.injector is None:
+                try:
+                    self.injector = create_injector(self.inject_preference)
+                except RuntimeError as e:
+                    messagebox.showerror("Simulation Error", str(e))
+                    self.stop_keep_awake()
+                    return
+            if self.idle_gate is None:
+                self.idle_gate = IdleGate(create_idle_source(), self.idle_threshold,
+                                          margin=self.activity.pattern.max_gap())
+            self.activity.start()
+        failed = self.triggers.arm()
+        if failed:
+            messagebox.showwarning("Triggers", "\n".join(f"Cannot watch {trigger.kind}: {str(error)}"
+                                                         for trigger, error in failed))
         self.update_tray_icon()
+        mark_startup("keep-awake active", report=True)
+        if self.power_monitor is not None and self.power_monitor.state is not None:
+            # A session started on battery gets the policy now, not at the next power change
+            self.on_power_change(self.power_monitor.state)
 
     def stop_keep_awake(self):
+        if self.active:
+            self.journal_event(STOP)
+        if self.timer_state is not None:
+            self.timer_state.clear()
         self.active = False
         self.status_text.set("Inactive")
         self.timer_text.set("No shutdown scheduled")
+        started = time.perf_counter()
         self.stop_threads.set()
+        self.activity.stop()
+        for job in (self.timer_job, self.shutdown_job, self.tray_animation_job):
+            self.scheduler.cancel(job)
+        self.timer_job = self.shutdown_job = self.tray_animation_job = None
+        self.triggers.disarm()
+        # Stop is only done once an in-flight injection has finished
+        self.scheduler.wait_idle()
+        self.stop_latency = time.perf_counter() - started
+        if self.inhibitor is not None:
+            self.inhibitor.release()
         self.start_button.config(state=tk.NORMAL)
         self.stop_button.config(state=tk.DISABLED)
         self.cancel_button.config(state=tk.DISABLED)
@@ -160,62 +368,200 @@ class KeepAwakeApp:
         self.shutdown_scheduled = False
         self.update_tray_icon()
 
-    def simulate_activity(self):
-        while not self.stop_threads.is_set():
-            try:
-                if random.choice([True, False]):
-                    x, y = pyautogui.position()
-                    pyautogui.moveTo(x + random.randint(-5, 5), y + random.randint(-5, 5), duration=0.1)
-                else:
-                    pyautogui.press('shift')
-                time.sleep(6)
-            except Exception as e:
-                messagebox.showerror("Simulation Error", str(e))
-                self.stop_keep_awake()
-                break
+    @span("simulate_activity")
+    def simulate_activity(self, action=MOUSE):
+        if self.stop_threads.is_set():
+            return
+        # Skip the tick while the user is active; their own input keeps the PC awake
+        if self.idle_gate is not None and not self.idle_gate.should_inject():
+            return
+        try:
+            elapsed = self.injector.inject(action)
+            self.metrics.injection(action, elapsed / 1e9)
+            if self.journal is not None:
+                self.journal.record_injection()
+        except Exception as e:
+            self.ui.post(messagebox.showerror, "Simulation Error", str(e))
+            self.ui.post(self.stop_keep_awake)
 
+    @span("countdown_timer")
     def countdown_timer(self):
-        while self.timer_active and self.remaining_time > 0 and not self.stop_threads.is_set():
-            mins, secs = divmod(self.remaining_time, 60)
-            hrs, mins = divmod(mins, 60)
-            formatted = f"{hrs:02}:{mins:02}:{secs:02}"
-            self.root.after(0, self.timer_text.set, f"Shutdown in {formatted}")
-            time.sleep(1)
-            self.remaining_time -= 1
+        """Scheduled at the timer deadline"""
+        if not self.timer_active or self.stop_threads.is_set():
+            return
+        self.timer_job = None
+        self.metrics.timer_expired()
+        self.ui.post(self.schedule_shutdown)
+
+    @span("countdown_text")
+    def countdown_text(self):
+        if not self.timer_active or self.timer_deadline is None:
+            return None
+        # Derived from the deadline each tick, so a late wakeup never adds drift
+        self.remaining_time = max(0, int(round(self.timer_deadline - self.scheduler.clock())))
+        mins, secs = divmod(self.remaining_time, 60)
+        hrs, mins = divmod(mins, 60)
+        return f"Shutdown in {hrs:02}:{mins:02}:{secs:02}"
+
+    def draw_countdown(self, text):
+        # Other timer messages ("Shutdown cancelled", ...) are set where they happen
+        if text is not None:
+            self.timer_text.set(text)
+
+    def tray_state(self):
+        if not HAS_TRAY or not hasattr(self, "icon"):
+            return None
+        # The label may be stale while hidden, so the tooltip computes its own countdown
+        timer = self.countdown_text() or self.timer_text.get()
+        return self.tray_icon_key(), f"Status: {self.status_text.get()} | {timer}"
+
+    @span("draw_tray")
+    def draw_tray(self, state):
+        if state is not None:
+            self.icon.title = state[1]
+            self.update_tray_icon()
+
+    def window_visible(self):
+        return self.root.state() == "normal"
 
-        if self.timer_active and not self.stop_threads.is_set():
-            self.root.after(0, self.schedule_shutdown)
+    def on_map(self, event):
+        if event.widget is self.root:
+            self.refresh.wake()
+
+    def on_trigger(self, trigger):
+        if not self.active:
+            return
+        if self.triggers.action == "stop":
+            self.stop_keep_awake()
+            self.timer_text.set("Stopped: trigger fired")
+        elif not self.shutdown_scheduled:
+            # The trigger replaces any fixed-hour countdown
+            self.scheduler.cancel(self.timer_job)
+            self.timer_job = None
+            self.timer_active = False
+            # A restart during the warning resumes straight into the shutdown flow
+            self.timer_wall_deadline = self.scheduler.wall_clock()
+            self.timer_text.set(f"Trigger fired {trigger.describe()}")
+            self.schedule_shutdown()
 
     def schedule_shutdown(self):
         self.shutdown_scheduled = True
+        self.journal_event(SHUTDOWN_SCHEDULED)
+        self.metrics.shutdown("scheduled")
+        self.save_timer_state()
+        self.shutdown_job = self.scheduler.call_later(SHUTDOWN_GRACE_PERIOD, self.execute_shutdown)
+        if HAS_TRAY and hasattr(self, "icon") and self.icon_cache.frame_count(True, "pulse"):
+            self.tray_frame = 0
+            self.tray_animation_job = self.scheduler.call_every(TRAY_ANIMATION_INTERVAL, self.ui.post,
+                                                                self.animate_tray)
         messagebox.showwarning("Shutdown", "Your PC will shut down in 1 minute.")
-        self.shutdown_thread = threading.Thread(target=self.execute_shutdown, daemon=True)
-        self.shutdown_thread.start()
 
     def execute_shutdown(self):
-        for _ in range(60):
-            if not self.shutdown_scheduled or self.stop_threads.is_set():
-                return
-            time.sleep(1)
+        if not self.shutdown_scheduled or self.stop_threads.is_set():
+            return
+        runner = self.shutdown_runner or subprocess.run
+        # The shutdown happens now; it must not be resumed after the reboot
+        if self.timer_state is not None:
+            self.timer_state.clear()
+        self.metrics.shutdown("executed")
+        if self.journal is not None:
+            # The machine is going down; get the record on disk first
+            self.journal.record(SHUTDOWN_EXECUTED)
+            self.journal.flush()
         try:
             if sys.platform == 'win32':
-                subprocess.run(['shutdown', '/s', '/t', '0'])
+                runner(['shutdown', '/s', '/t', '0'])
             else:
-                subprocess.run(['shutdown', '-h', 'now'])
+                runner(['shutdown', '-h', 'now'])
         except Exception as e:
             messagebox.showerror("Shutdown Error", str(e))
 
     def cancel_shutdown(self):
+        self.scheduler.cancel(self.shutdown_job)
+        self.scheduler.cancel(self.timer_job)
+        self.scheduler.cancel(self.tray_animation_job)
+        self.shutdown_job = self.timer_job = self.tray_animation_job = None
+        if self.shutdown_scheduled:
+            self.journal_event(SHUTDOWN_CANCELLED)
+            self.metrics.shutdown("cancelled")
         self.shutdown_scheduled = False
         self.timer_active = False
+        self.timer_wall_deadline = None
         self.timer_text.set("Shutdown cancelled")
         self.cancel_button.config(state=tk.DISABLED)
+        self.save_timer_state()
         try:
             if sys.platform == 'win32':
-                subprocess.run(['shutdown', '/a'])
+                (self.shutdown_runner or subprocess.run)(['shutdown', '/a'])
         except Exception as e:
             messagebox.showerror("Cancel Error", str(e))
 
+    def save_timer_state(self):
+        """Persist the session; only called when the state changes, never per tick"""
+        if self.timer_state is None or not self.active:
+            return
+        try:
+            self.timer_state.save(True, self.timer_var.get(), self.timer_wall_deadline, self.shutdown_scheduled)
+        except OSError as e:
+            print(f"Warning: Cannot save timer state: {str(e)}")
+
+    def resume_session(self):
+        """Pick up a session saved by a run that crashed or was restarted"""
+        state = self.timer_state.load() if self.timer_state is not None else None
+        if not state or not state.get("active"):
+            return False
+        if state.get("timer") in self.timer_options:
+            self.timer_var.set(state["timer"])
+        self.start_keep_awake(resume_delay(state, self.scheduler.wall_clock()))
+        return True
+
+    def open_journal(self, directory):
+        """Record session history in directory from a background writer thread"""
+        self.journal = SessionJournal(directory, clock=self.scheduler.clock)
+        self.journal.start()
+
+    def start_metrics(self, port):
+        """Serve Prometheus metrics on localhost:port"""
+        try:
+            self.metrics_server = MetricsServer(self.metrics, port)
+            self.metrics_server.start()
+        except OSError as e:
+            messagebox.showwarning("Metrics", f"Cannot start metrics endpoint: {str(e)}")
+            self.metrics_server = None
+
+    def journal_event(self, kind, value=0.0):
+        if self.journal is not None:
+            self.journal.record(kind, value)
+
+    def start_power_policy(self, policy, root):
+        """Watch AC and battery state and apply policy when it changes"""
+        self.power_policy = policy
+        # Changes arrive on the scheduler thread; the policy drives Tk widgets
+        self.power_monitor = PowerMonitor(self.scheduler, lambda state: self.ui.post(self.on_power_change, state),
+                                          root)
+        if not self.power_monitor.start():
+            messagebox.showwarning("Power policy", "Cannot read the power state here; battery policy is off.")
+            self.power_monitor = None
+
+    def on_power_change(self, state):
+        if self.power_policy.apply(self, state) == "paused":
+            self.timer_text.set(f"Paused: {state.describe()}")
+
+    def pause_for_power(self):
+        self.stop_keep_awake()
+
+    def resume_after_power(self, remaining):
+        """Restart after a power pause; remaining is the timer left, None for no timer"""
+        if remaining is None:
+            self.timer_var.set("Never")
+        self.start_keep_awake(remaining)
+
+    def set_shutdown_in(self, seconds):
+        """Run the shutdown timer out in seconds, or clear it when seconds is None"""
+        if seconds is None:
+            self.timer_var.set("Never")
+        self.apply_timer_setting(seconds)
+
     def update_status(self):
         self.status_text.set("Active" if self.active else "Inactive")
         if self.timer_active:
@@ -233,26 +579,27 @@ class KeepAwakeApp:
     def restore_from_tray(self):
         self.root.deiconify()
         self.root.lift()
+        self.refresh.wake()
 
     def setup_tray_icon(self):
+        import pystray
+        from pystray import MenuItem as Item
+        from icon_cache import IconCache, load_bundle
+
+        # Pre-rendered by build_icons.py; without a bundle the PNGs are decoded once instead
+        self.icon_cache = IconCache({True: "awake_icon.png", False: "sleep_icon.png"}, bundle=load_bundle())
+        self.icon_cache.swap(self.tray_icon_key())
         self.icon = pystray.Icon("keepawake", self.get_icon_image(), "Keep Awake Utility", menu=pystray.Menu(
-            Item("Show", self.restore_from_tray),
-            Item("Start", self.start_keep_awake),
-            Item("Stop", self.stop_keep_awake),
-            Item("Exit", self.exit_app)
+            # Run on the Tk thread, which also owns the inhibitor lock
+            Item("Show", lambda: self.ui.post(self.restore_from_tray)),
+            Item("Start", lambda: self.ui.post(self.start_keep_awake)),
+            Item("Stop", lambda: self.ui.post(self.stop_keep_awake)),
+            Item("Exit", lambda: self.ui.post(self.exit_app))
         ))
 
         self.tray_thread = threading.Thread(target=self.icon.run, daemon=True)
         self.tray_thread.start()
-
-        self.tooltip_updater = threading.Thread(target=self.tray_tooltip_loop, daemon=True)
-        self.tooltip_updater.start()
-
-    def tray_tooltip_loop(self):
-        while True:
-            time.sleep(5)
-            self.update_tray_tooltip()
-            self.update_tray_icon()
+        self.refresh.wake()
 
     def update_tray_tooltip(self):
         if HAS_TRAY and hasattr(self, "icon"):
@@ -262,45 +609,99 @@ class KeepAwakeApp:
     def update_tray_icon(self):
         if not HAS_TRAY or not hasattr(self, "icon"):
             return
-        self.icon.icon = self.get_icon_image()
+        # Only hand pystray a new image when the state or animation frame actually changes
+        key = self.tray_icon_key()
+        if self.icon_cache.swap(key):
+            self.icon.icon = self.get_icon_image(key)
+
+    def tray_icon_key(self):
+        """(state, frame strip or None, frame index) the tray icon should show"""
+        if not self.active or not hasattr(self, "icon_cache"):
+            return self.active, None, 0
+        if self.shutdown_scheduled and self.tray_animation_job is not None:
+            return True, "pulse", self.tray_frame
+        frames = self.icon_cache.frame_count(True, "countdown")
+        if self.timer_active and self.timer_total and frames:
+            # The ring empties in steps; it only drops to zero once the timer has run out
+            left = max(0.0, self.timer_deadline - self.scheduler.clock()) / self.timer_total
+            return True, "countdown", min(frames - 1, math.ceil(left * (frames - 1)))
+        return True, None, 0
+
+    def animate_tray(self):
+        if self.tray_animation_job is None:
+            return
+        self.tray_frame += 1
+        self.update_tray_icon()
 
-    def get_icon_image(self):
-        try:
-            icon_path = "awake_icon.png" if self.active else "sleep_icon.png"
-            if not os.path.exists(icon_path):
-                icon_path = "generated-icon.png"
-            return Image.open(icon_path)
-        except Exception:
-            return Image.new('RGB', (64, 64), color=(128, 128, 128))
+    @span("get_icon_image")
+    def get_icon_image(self, key=None):
+        state, strip, index = key or self.tray_icon_key()
+        if strip is not None:
+            # Frames come straight from the bundle's pixels; nothing is decoded or drawn here
+            return self.icon_cache.frame(state, strip, index)
+        return self.icon_cache.get(state)
 
     def exit_app(self):
         self.stop_keep_awake()
         if HAS_TRAY and hasattr(self, "icon"):
             self.icon.stop()
+            stats = self.icon_cache.stats()
+            print(f"Icon cache: {stats['hits']} hits, {stats['misses']} misses, {stats['swaps']} swaps")
+        if self.idle_gate is not None:
+            print(f"Activity ticks: {self.idle_gate.summary()}")
+        if self.injector is not None:
+            print(f"Injection: {self.injector.summary()}")
+            self.injector.close()
+        drift = self.scheduler.drift_stats()
+        print(f"Scheduler: {drift['fired']} tasks run, drift avg {drift['mean_drift_ms']:.1f} ms, "
+              f"max {drift['max_drift_ms']:.1f} ms, wall clock skew {drift['wall_skew_ms']:.1f} ms")
+        if self.stop_latency is not None:
+            print(f"Last stop took {self.stop_latency * 1000.0:.1f} ms")
+        self.refresh.stop()
+        refresh = self.refresh.stats()
+        print(f"UI refresh: {refresh['ticks']} ticks, {refresh['redraws']} redraws, "
+              f"{self.ui.posted} updates in {self.ui.wakeups} wakeups")
+        self.triggers.close()
+        if self.journal is not None:
+            self.journal.close()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        if self.power_monitor is not None:
+            self.power_monitor.stop()
+        if not self.scheduler.stop():
+            print("Warning: scheduler thread did not exit in time")
         self.root.quit()
         self.root.destroy()
 
 def main():
     root = tk.Tk()
     app = KeepAwakeApp(root)
-
-    auto_start = "--auto-start" in sys.argv or "-a" in sys.argv
-    if auto_start:
-        max_timer = "--max-timer" in sys.argv or "-m" in sys.argv
-        for arg in sys.argv:
-            if arg.startswith("--timer="):
-                try:
-                    hrs = int(arg.split("=")[1])
-                    if hrs in [1, 2, 5, 10]:
-                        app.timer_var.set(f"{hrs} hour" if hrs == 1 else f"{hrs} hours")
-                except:
-                    pass
-        if max_timer:
-            app.timer_var.set("10 hours")
-        root.after(1000, app.start_keep_awake)
+    mark_startup("window created")
+    journal_dir = parse_journal_args(sys.argv)
+    if journal_dir:
+        app.open_journal(journal_dir)
+    state_path = parse_state_args(sys.argv)
+    if state_path:
+        app.timer_state = TimerState(state_path)
+    metrics_port = parse_metrics_port_arg(sys.argv)
+    if metrics_port is not None:
+        app.start_metrics(metrics_port)
+    power_policy, power_root = parse_power_args(sys.argv)
+    if power_policy is not None:
+        app.start_power_policy(power_policy, power_root)
+
+    if INSTANCE_LOCK is not None:
+        # Forwarded launches arrive on the control thread; hand them to the Tk thread
+        INSTANCE_LOCK.serve(lambda args: app.ui.post(app.apply_launch_args, args, True))
+
+    root.after_idle(app.apply_launch_args, sys.argv[1:])
 
     root.after(500, root.iconify)
-    root.mainloop()
+    try:
+        root.mainloop()
+    finally:
+        if INSTANCE_LOCK is not None:
+            INSTANCE_LOCK.release()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,186 @@
+"""
+Metrics endpoint for the Keep Awake Utility.
+Serves the Prometheus text format on a local HTTP port, so a fleet of
+machines can be scraped for whether keep-awake is active, when a
+shutdown is due and what the injector is doing.
+
+Counters and histogram buckets live in arrays allocated up front. Each
+is written by a single thread (the scheduler thread runs injections and
+timers), so updates are plain increments with no lock; a scrape may read
+a value one increment old, which Prometheus tolerates. Gauges such as
+remaining timer seconds, threads and RSS are computed only when scraped.
+The HTTP server is only imported and started with --metrics-port.
+"""
+
+import bisect
+import os
+import sys
+import threading
+from array import array
+
+from input_inject import KEY, MOUSE
+
+# Injection latency histogram bucket bounds, in seconds
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1)
+INJECTION_TYPES = (MOUSE, KEY)
+SHUTDOWN_EVENTS = ("scheduled", "cancelled", "executed")
+DEFAULT_METRICS_HOST = "127.0.0.1"
+
+
+def _rss_bytes():
+    """Resident set size of this process, or None where it cannot be read cheaply"""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if "psutil" in sys.modules:
+        return sys.modules["psutil"].Process().memory_info().rss
+    return None
+
+
+class Metrics:
+    def __init__(self):
+        """Preallocated counters; gauges are registered with add_gauge"""
+        self.injections = array("Q", [0] * len(INJECTION_TYPES))
+        self.latency_buckets = array("Q", [0] * (len(LATENCY_BUCKETS) + 1))
+        self.latency_sum = array("d", [0.0])
+        self.shutdowns = array("Q", [0] * len(SHUTDOWN_EVENTS))
+        self.timer_expirations = array("Q", [0])
+        self.gauges = []
+        self.add_gauge("keep_awake_threads", "Live Python threads", threading.active_count)
+        self.add_gauge("keep_awake_resident_memory_bytes", "Resident set size", _rss_bytes)
+
+    def add_gauge(self, name, help_text, read, kind="gauge"):
+        """read() is called at scrape time; returning None omits the sample"""
+        self.gauges.append((name, help_text, read, kind))
+
+    def injection(self, action, seconds):
+        """Count one injection and its latency; called on the injecting thread only"""
+        self.injections[0 if action == MOUSE else 1] += 1
+        self.latency_buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.latency_sum[0] += seconds
+
+    def shutdown(self, event):
+        self.shutdowns[SHUTDOWN_EVENTS.index(event)] += 1
+
+    def timer_expired(self):
+        self.timer_expirations[0] += 1
+
+    def render(self):
+        """Current values in the Prometheus text exposition format"""
+        lines = []
+        for name, help_text, read, kind in self.gauges:
+            value = read()
+            if value is None:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {float(value):g}")
+
+        lines.append("# HELP keep_awake_injections_total Simulated input events by type")
+        lines.append("# TYPE keep_awake_injections_total counter")
+        for action, count in zip(INJECTION_TYPES, self.injections):
+            lines.append(f'keep_awake_injections_total{{type="{action}"}} {count}')
+
+        lines.append("# HELP keep_awake_injection_latency_seconds Time to inject one input event")
+        lines.append("# TYPE keep_awake_injection_latency_seconds histogram")
+        buckets = list(self.latency_buckets)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, buckets):
+            cumulative += count
+            lines.append(f'keep_awake_injection_latency_seconds_bucket{{le="{bound:g}"}} {cumulative}')
+        cumulative += buckets[-1]
+        lines.append(f'keep_awake_injection_latency_seconds_bucket{{le="+Inf"}} {cumulative}')
+        lines.append(f"keep_awake_injection_latency_seconds_sum {self.latency_sum[0]:g}")
+        lines.append(f"keep_awake_injection_latency_seconds_count {cumulative}")
+
+        lines.append("# HELP keep_awake_shutdowns_total Shutdown warnings, cancellations and executions")
+        lines.append("# TYPE keep_awake_shutdowns_total counter")
+        for event, count in zip(SHUTDOWN_EVENTS, self.shutdowns):
+            lines.append(f'keep_awake_shutdowns_total{{event="{event}"}} {count}')
+        lines.append("# HELP keep_awake_timer_expirations_total Shutdown timers that ran out")
+        lines.append("# TYPE keep_awake_timer_expirations_total counter")
+        lines.append(f"keep_awake_timer_expirations_total {self.timer_expirations[0]}")
+        return "\n".join(lines) + "\n"
+
+
+def add_app_gauges(metrics, app):
+    """Gauges read from a console or GUI app at scrape time"""
+
+    def remaining():
+        if not app.timer_active or app.timer_deadline is None:
+            return 0
+        return max(0.0, app.timer_deadline - app.scheduler.clock())
+
+    def shutdown_due():
+        # Unix time the timer runs out, 0 when none is running
+        if not app.timer_active or app.timer_deadline is None:
+            return 0
+        return app.scheduler.wall_clock() + remaining()
+
+    metrics.add_gauge("keep_awake_active", "1 while keep-awake is active", lambda: int(app.active))
+    metrics.add_gauge("keep_awake_timer_remaining_seconds", "Seconds until the shutdown timer runs out", remaining)
+    metrics.add_gauge("keep_awake_shutdown_due_timestamp_seconds", "When the shutdown timer runs out", shutdown_due)
+    metrics.add_gauge("keep_awake_shutdown_pending", "1 during the shutdown grace period",
+                      lambda: int(app.shutdown_scheduled))
+    metrics.add_gauge("keep_awake_scheduler_wakeups_total", "Times the scheduler thread woke up",
+                      lambda: app.scheduler.wakeups, "counter")
+
+
+class MetricsServer:
+    def __init__(self, metrics, port, host=DEFAULT_METRICS_HOST):
+        """Serve metrics.render() at /metrics; port 0 picks a free port"""
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.scrapes = 0
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = owner.metrics.render().encode("utf-8")
+                owner.scrapes += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def parse_metrics_port_arg(argv):
+    """Port from --metrics-port=PORT, or None when the endpoint is off"""
+    for arg in argv:
+        if arg.startswith("--metrics-port="):
+            try:
+                port = int(arg.split("=", 1)[1])
+                if not 0 <= port <= 65535:
+                    raise ValueError(port)
+                return port
+            except ValueError:
+                print(f"Warning: Invalid metrics port: {arg}")
+    return None
@@ -0,0 +1,186 @@
+"""
+Incremental power-usage analysis for the Keep Awake Utility.
+Battery, CPU and per-process CPU samples are folded into running
+aggregates as they arrive; nothing is re-scanned, and per-process state is
+capped, so a 10-hour session runs in constant memory.
+"""
+
+import time
+
+# Seconds between analyzer samples; process scans are the expensive part
+DEFAULT_POWER_INTERVAL = 30.0
+# Upper bound on per-name consumer totals kept after processes exit
+MAX_TRACKED_NAMES = 200
+
+
+class DischargeFit:
+    def __init__(self):
+        """Least-squares slope of battery percent over time, updated per sample"""
+        self.reset()
+
+    def reset(self):
+        self.n = 0
+        self.sum_t = self.sum_p = self.sum_tt = self.sum_tp = 0.0
+        self.t0 = None
+
+    def add(self, t, percent):
+        if self.t0 is None:
+            self.t0 = t
+        # Offsetting by the first timestamp keeps the sums well conditioned
+        t -= self.t0
+        self.n += 1
+        self.sum_t += t
+        self.sum_p += percent
+        self.sum_tt += t * t
+        self.sum_tp += t * percent
+
+    def rate_per_hour(self):
+        """Discharge in percent per hour (positive while draining), or None"""
+        if self.n < 2:
+            return None
+        denominator = self.n * self.sum_tt - self.sum_t * self.sum_t
+        if denominator <= 0:
+            return None
+        slope = (self.n * self.sum_tp - self.sum_t * self.sum_p) / denominator
+        return -slope * 3600.0
+
+
+class SessionBucket:
+    def __init__(self):
+        """Battery and CPU totals while keep-awake is on, or while it is off"""
+        self.seconds = 0.0
+        self.unplugged_seconds = 0.0
+        self.percent_drop = 0.0
+        self.cpu_seconds = 0.0
+
+    def rate_per_hour(self):
+        if self.unplugged_seconds < 60:
+            return None
+        return self.percent_drop / self.unplugged_seconds * 3600.0
+
+
+class PowerAnalyzer:
+    def __init__(self, interval=DEFAULT_POWER_INTERVAL, psutil_module=None, clock=time.monotonic,
+                 max_names=MAX_TRACKED_NAMES):
+        """Stream power samples into running aggregates"""
+        if psutil_module is None:
+            import psutil as psutil_module
+        self.psutil = psutil_module
+        self.interval = interval
+        self.clock = clock
+        self.max_names = max_names
+        self.job = None
+        self.session_active = False
+
+        self.samples = 0
+        self.fit = DischargeFit()
+        self.sessions = {True: SessionBucket(), False: SessionBucket()}
+        self.session_count = 0
+        self.last_time = None
+        self.last_battery = None
+        self.last_cpu_total = None
+
+        # pid -> (name, cpu seconds at last sample) for live processes only
+        self.processes = {}
+        # name -> cpu seconds accumulated since the analyzer started
+        self.consumers = {}
+
+    def start(self, scheduler):
+        self.job = scheduler.call_every(self.interval, self.sample, first_delay=0)
+
+    def stop(self):
+        if self.job is not None:
+            self.job.cancel()
+            self.job = None
+
+    def set_session(self, active):
+        """Attribute the following samples to a keep-awake session (or to idle time)"""
+        if active and not self.session_active:
+            self.session_count += 1
+        self.session_active = active
+
+    def sample(self):
+        """Read battery, total CPU and per-process CPU once"""
+        psutil = self.psutil
+        battery = psutil.sensors_battery() if hasattr(psutil, "sensors_battery") else None
+        cpu = psutil.cpu_times()
+        # Busy time; guest time is already counted in user time on Linux
+        cpu_total = sum(cpu) - sum(getattr(cpu, field, 0.0) for field in ("idle", "iowait", "guest", "guest_nice"))
+        processes = []
+        for proc in psutil.process_iter(["name", "cpu_times"]):
+            info = proc.info
+            times = info.get("cpu_times")
+            if times is not None:
+                processes.append((proc.pid, info.get("name") or "?", times.user + times.system))
+        self.add_sample(self.clock(), battery, cpu_total, processes)
+
+    def add_sample(self, now, battery, cpu_total, processes):
+        """Fold one sample into the aggregates; processes is [(pid, name, cpu_seconds)]"""
+        self.samples += 1
+        bucket = self.sessions[self.session_active]
+
+        if self.last_time is not None:
+            elapsed = now - self.last_time
+            bucket.seconds += elapsed
+            if self.last_cpu_total is not None:
+                bucket.cpu_seconds += max(0.0, cpu_total - self.last_cpu_total)
+            if battery is not None and self.last_battery is not None and not battery.power_plugged:
+                bucket.unplugged_seconds += elapsed
+                bucket.percent_drop += max(0.0, self.last_battery.percent - battery.percent)
+
+        if battery is not None:
+            charging = self.last_battery is not None and battery.percent > self.last_battery.percent
+            if battery.power_plugged or charging:
+                # A charge ends the discharge segment; the next one starts fresh
+                self.fit.reset()
+            else:
+                self.fit.add(now, battery.percent)
+
+        self._update_processes(processes)
+        self.last_time = now
+        self.last_battery = battery
+        self.last_cpu_total = cpu_total
+
+    def _update_processes(self, processes):
+        seen = {}
+        for pid, name, cpu_seconds in processes:
+            previous = self.processes.get(pid)
+            if previous is not None and previous[0] == name:
+                delta = cpu_seconds - previous[1]
+                if delta > 0:
+                    self.consumers[name] = self.consumers.get(name, 0.0) + delta
+            seen[pid] = (name, cpu_seconds)
+        # Exited pids drop out here, so this dict never outgrows the process table
+        self.processes = seen
+        if len(self.consumers) > self.max_names:
+            keep = sorted(self.consumers.items(), key=lambda item: item[1], reverse=True)[:self.max_names // 2]
+            self.consumers = dict(keep)
+
+    def top_consumers(self, count=5):
+        """[(name, cpu seconds, share of all tracked process CPU)] ranked by CPU time"""
+        total = sum(self.consumers.values())
+        ranked = sorted(self.consumers.items(), key=lambda item: item[1], reverse=True)[:count]
+        return [(name, seconds, seconds / total if total else 0.0) for name, seconds in ranked]
+
+    def report(self):
+        """Current estimates as a dict"""
+        active, idle = self.sessions[True], self.sessions[False]
+        active_rate, idle_rate = active.rate_per_hour(), idle.rate_per_hour()
+        cost = None
+        if active_rate is not None and idle_rate is not None:
+            cost = active_rate - idle_rate
+        battery = self.last_battery
+        return {
+            "samples": self.samples,
+            "battery_percent": battery.percent if battery else None,
+            "plugged": battery.power_plugged if battery else None,
+            "discharge_rate": self.fit.rate_per_hour(),
+            "active_rate": active_rate,
+            "idle_rate": idle_rate,
+            "session_cost": cost,
+            "sessions": self.session_count,
+            "active_hours": active.seconds / 3600.0,
+            "active_cpu_seconds": active.cpu_seconds,
+            "idle_cpu_seconds": idle.cpu_seconds,
+            "top": self.top_consumers(),
+        }
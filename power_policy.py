@@ -0,0 +1,423 @@
+"""
+Battery and AC power policy for the Keep Awake Utility.
+Keeping a laptop awake on battery can drain it to zero, so the policy can
+pause keep-awake, or bring the shutdown timer forward, when AC is
+unplugged or the battery drops below a threshold, and undo that when
+power returns:
+
+    --on-battery=pause               pause while running on battery
+    --battery-below=20:timer=15      shut down within 15 minutes below 20%
+    --battery-below=5:shutdown       start the shutdown warning below 5%
+
+On Linux the state is read from /sys/class/power_supply. The kernel
+announces plugging, unplugging and battery status changes as
+power_supply uevents on a netlink socket, which is watched on the
+trigger epoll thread, so a change is seen within a second; a slow poll
+only catches gradual capacity drops that raise no event. Without netlink
+the same sysfs tree is polled, and without sysfs psutil is polled.
+Policy actions run on the scheduler thread.
+"""
+
+import os
+import socket
+
+from startup import lazy_import
+from triggers import EventWatcher
+
+select = lazy_import("select")
+
+SYSFS_POWER_SUPPLY = "/sys/class/power_supply"
+NETLINK_KOBJECT_UEVENT = 15
+# Multicast group of kernel uevents (udev rebroadcasts on group 2)
+UEVENT_KERNEL_GROUP = 1
+# Seconds between sysfs reads with uevents (capacity drift) and without them
+UEVENT_POLL_INTERVAL = 60
+POLL_INTERVAL = 5
+# Percentage points the battery must recover before a low-battery action is undone
+BATTERY_HYSTERESIS = 3
+PAUSE = "pause"
+SHUTDOWN = "shutdown"
+
+
+class PowerState:
+    def __init__(self, on_ac, percent=None, batteries=0, source="sysfs"):
+        """on_ac is None when it cannot be told; percent is None without a battery"""
+        self.on_ac = on_ac
+        self.percent = percent
+        self.batteries = batteries
+        self.source = source
+
+    def __eq__(self, other):
+        # Whole percent steps are enough to cross a threshold
+        return isinstance(other, PowerState) and self._key() == other._key()
+
+    def _key(self):
+        return self.on_ac, None if self.percent is None else round(self.percent), self.batteries
+
+    def describe(self):
+        power = {True: "on AC", False: "on battery", None: "power source unknown"}[self.on_ac]
+        if self.percent is None:
+            return power
+        return f"{power}, battery {self.percent:.0f}%"
+
+
+def _read_attr(directory, name):
+    try:
+        with open(os.path.join(directory, name)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _read_int(directory, name):
+    value = _read_attr(directory, name)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def read_power_state(root=SYSFS_POWER_SUPPLY):
+    """PowerState from a power_supply tree, or None when root does not exist"""
+    try:
+        names = sorted(os.listdir(root))
+    except OSError:
+        return None
+    external = None
+    statuses = []
+    now_total = full_total = 0
+    capacities = []
+    for name in names:
+        path = os.path.join(root, name)
+        # Mice, keyboards and headsets report their own batteries with scope Device
+        if _read_attr(path, "scope") == "Device":
+            continue
+        kind = _read_attr(path, "type")
+        if kind == "Battery":
+            if _read_attr(path, "present") == "0":
+                continue
+            statuses.append(_read_attr(path, "status"))
+            now = _read_int(path, "energy_now")
+            full = _read_int(path, "energy_full")
+            if now is None or full is None:
+                now, full = _read_int(path, "charge_now"), _read_int(path, "charge_full")
+            capacity = _read_int(path, "capacity")
+            if now is not None and full:
+                now_total += now
+                full_total += full
+            elif capacity is not None:
+                capacities.append(capacity)
+        elif kind is not None:
+            # Mains adapters and USB/USB-C ports
+            online = _read_attr(path, "online")
+            if online is not None:
+                external = bool(external) or online == "1"
+    if external is None:
+        # No adapter listed: fall back to what the batteries say
+        external = None if not statuses else "Discharging" not in statuses
+    percent = None
+    if full_total:
+        percent = now_total * 100.0 / full_total
+    elif capacities:
+        percent = float(sum(capacities)) / len(capacities)
+    return PowerState(external, percent, len(statuses))
+
+
+def read_psutil_state(psutil_module=None):
+    """PowerState from psutil, for platforms without sysfs"""
+    if psutil_module is None:
+        import psutil as psutil_module
+    battery = psutil_module.sensors_battery()
+    if battery is None:
+        return PowerState(None, None, 0, "psutil")
+    return PowerState(battery.power_plugged, float(battery.percent), 1, "psutil")
+
+
+def parse_uevent(data):
+    """Fields of a kernel uevent message ({} for anything else)"""
+    parts = data.split(b"\0")
+    if not parts or b"@" not in parts[0]:
+        return {}
+    fields = {}
+    for part in parts[1:]:
+        key, sep, value = part.partition(b"=")
+        if sep:
+            fields[key.decode(errors="replace")] = value.decode(errors="replace")
+    return fields
+
+
+def open_uevent_socket():
+    """Non-blocking netlink socket receiving kernel uevents"""
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM | getattr(socket, "SOCK_CLOEXEC", 0),
+                         NETLINK_KOBJECT_UEVENT)
+    try:
+        sock.bind((0, UEVENT_KERNEL_GROUP))
+        sock.setblocking(False)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+class PowerMonitor:
+    def __init__(self, scheduler, on_change, root=SYSFS_POWER_SUPPLY, uevents=True, reader=None, uevent_socket=None):
+        """Call on_change(state) on the scheduler thread whenever the power state changes"""
+        self.scheduler = scheduler
+        self.on_change = on_change
+        self.root = root
+        self.uevents = uevents
+        self.reader = reader
+        self.uevent_socket = uevent_socket
+        self.state = None
+        self.events = 0
+        self.reads = 0
+        self.mode = None
+        self.sock = None
+        self.watcher = None
+        self.job = None
+        self._refresh_job = None
+
+    def start(self):
+        """Read the first state and start watching; False when power cannot be read here"""
+        if self.reader is None:
+            if read_power_state(self.root) is not None:
+                self.reader = lambda: read_power_state(self.root)
+            else:
+                try:
+                    import psutil
+                except ImportError:
+                    return False
+                self.reader = lambda: read_psutil_state(psutil)
+        self.state = self._read()
+        interval = POLL_INTERVAL
+        self.mode = f"polling every {POLL_INTERVAL} s"
+        if self.uevents and self.state is not None and self.state.source == "sysfs":
+            interval = self._watch_uevents()
+        self.job = self.scheduler.call_every(interval, self.refresh)
+        if self.state is not None:
+            # The first reading counts as a change: a session already on battery must not wait for the next one
+            self.scheduler.call_later(0, self.on_change, self.state)
+        return True
+
+    def _watch_uevents(self):
+        if not hasattr(select, "epoll"):
+            return POLL_INTERVAL
+        try:
+            self.sock = self.uevent_socket or open_uevent_socket()
+            self.watcher = EventWatcher()
+            self.watcher.register(self.sock.fileno(), self._on_uevent)
+        except OSError as e:
+            print(f"Warning: Cannot watch power_supply uevents, polling instead: {str(e)}")
+            self.stop()
+            return POLL_INTERVAL
+        self.mode = "uevents"
+        return UEVENT_POLL_INTERVAL
+
+    def _on_uevent(self):
+        """Runs on the watcher thread; coalesces a burst of uevents into one read"""
+        relevant = False
+        while True:
+            try:
+                data = self.sock.recv(8192)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                # ENOBUFS: events were dropped, so re-read to be safe
+                relevant = True
+                break
+            if not data:
+                break
+            if parse_uevent(data).get("SUBSYSTEM") == "power_supply":
+                relevant = True
+        if relevant:
+            self.events += 1
+            job = self._refresh_job
+            if job is None or not job.active:
+                self._refresh_job = self.scheduler.call_later(0, self.refresh)
+
+    def _read(self):
+        self.reads += 1
+        try:
+            return self.reader()
+        except Exception as e:
+            print(f"Warning: Cannot read power state: {str(e)}")
+            return None
+
+    def refresh(self):
+        """Re-read the power state and report it when it changed"""
+        state = self._read()
+        if state is None or state == self.state:
+            return
+        self.state = state
+        self.on_change(state)
+
+    def stop(self):
+        self.scheduler.cancel(self.job)
+        self.scheduler.cancel(self._refresh_job)
+        self.job = self._refresh_job = None
+        if self.watcher is not None:
+            if self.sock is not None:
+                self.watcher.unregister(self.sock.fileno())
+            self.watcher.close()
+            self.watcher = None
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+def parse_power_action(text):
+    """'pause', 'shutdown' or 'timer=MINUTES' -> PAUSE, SHUTDOWN or minutes as a float"""
+    if text in (PAUSE, SHUTDOWN):
+        return text
+    if text.startswith("timer="):
+        minutes = float(text.split("=", 1)[1])
+        if minutes < 0:
+            raise ValueError(text)
+        return minutes if minutes > 0 else SHUTDOWN
+    raise ValueError(text)
+
+
+def _severity(action):
+    # Shutdown beats pausing, which beats the shortest timer
+    if action == SHUTDOWN:
+        return 2, 0.0
+    if action == PAUSE:
+        return 1, 0.0
+    return 0, -action
+
+
+def describe_action(action):
+    if action in (PAUSE, SHUTDOWN):
+        return action
+    return f"shutdown within {action:g} min"
+
+
+class PowerPolicy:
+    def __init__(self, on_battery=None, threshold=None, low_action=PAUSE):
+        """on_battery/low_action: PAUSE, SHUTDOWN or minutes until shutdown"""
+        self.on_battery = on_battery
+        self.threshold = threshold
+        self.low_action = low_action
+        # What the policy currently asks for, and the session it changed (wall-clock deadline)
+        self.current = None
+        self.saved = None
+        self.low = False
+
+    def describe(self):
+        rules = []
+        if self.on_battery is not None:
+            rules.append(f"on battery: {describe_action(self.on_battery)}")
+        if self.threshold is not None:
+            rules.append(f"below {self.threshold:g}%: {describe_action(self.low_action)}")
+        return ", ".join(rules)
+
+    def desired(self, state):
+        """The action this state calls for, or None when power is fine"""
+        actions = []
+        on_battery = state is not None and state.on_ac is False
+        if on_battery and self.on_battery is not None:
+            actions.append(self.on_battery)
+        if on_battery and self.threshold is not None and state.percent is not None:
+            # Stay low until the battery has clearly recovered, so a reading hovering at the line does not flap
+            limit = self.threshold + (BATTERY_HYSTERESIS if self.low else 0)
+            self.low = state.percent < limit
+            if self.low:
+                actions.append(self.low_action)
+        else:
+            self.low = False
+        return max(actions, key=_severity) if actions else None
+
+    def apply(self, app, state):
+        """Act on a new power state; returns a description of what was done, or None"""
+        action = self.desired(state)
+        if action == self.current:
+            return None
+        if action is None:
+            self.current = None
+            return self._restore(app) if self.saved is not None else None
+        if self.saved is None:
+            # Only a running session is changed, and only once until power returns
+            if not app.active:
+                # Not recorded as applied, so a session started later on battery still gets it
+                return None
+            self.saved = {"deadline": app.timer_wall_deadline if app.timer_active else None,
+                          "paused": False}
+        self.current = action
+        return self._engage(app, action, state)
+
+    def _saved_remaining(self, app):
+        deadline = self.saved["deadline"]
+        if deadline is None:
+            return None
+        return max(0.0, deadline - app.scheduler.wall_clock())
+
+    def _engage(self, app, action, state):
+        if action == PAUSE:
+            if app.active:
+                print(f"\nPower: {state.describe()}, pausing keep awake.")
+                self.saved["paused"] = True
+                app.pause_for_power()
+            return "paused"
+        limit = 0.0 if action == SHUTDOWN else action * 60.0
+        remaining = self._saved_remaining(app)
+        if remaining is None or remaining > limit:
+            remaining = limit
+        if not app.active:
+            if not self.saved["paused"]:
+                # Stopped by the user meanwhile; leave it stopped
+                return None
+            self.saved["paused"] = False
+            print(f"\nPower: {state.describe()}, resuming with {describe_action(action)}.")
+            app.resume_after_power(remaining)
+            return "resumed"
+        if app.shutdown_scheduled:
+            return None
+        current = app.timer_deadline - app.scheduler.clock() if app.timer_active else None
+        if current is None or current > remaining + 1:
+            print(f"\nPower: {state.describe()}, {describe_action(action)}.")
+            app.set_shutdown_in(remaining)
+        return "timer"
+
+    def _restore(self, app):
+        remaining = self._saved_remaining(app)
+        paused = self.saved["paused"]
+        self.saved = None
+        if paused:
+            if app.active:
+                return None
+            print("\nPower: restored, resuming keep awake.")
+            app.resume_after_power(remaining)
+            return "resumed"
+        if not app.active:
+            return None
+        print("\nPower: restored, restoring the shutdown timer.")
+        if app.shutdown_scheduled:
+            app.cancel_shutdown()
+        app.set_shutdown_in(remaining)
+        return "restored"
+
+
+def parse_power_args(argv):
+    """(PowerPolicy or None, power_supply directory) from --on-battery/--battery-below flags"""
+    on_battery = None
+    threshold = None
+    low_action = PAUSE
+    root = SYSFS_POWER_SUPPLY
+    for arg in argv:
+        flag, _, value = arg.partition("=")
+        try:
+            if flag == "--on-battery":
+                on_battery = parse_power_action(value)
+            elif flag == "--battery-below":
+                percent, _, action = value.partition(":")
+                threshold = float(percent)
+                if not 0 < threshold <= 100:
+                    raise ValueError(value)
+                low_action = parse_power_action(action) if action else PAUSE
+            elif flag == "--power-supply-dir":
+                root = value
+        except ValueError:
+            print(f"Warning: Invalid power policy parameter: {arg}")
+    if on_battery is None and threshold is None:
+        return None, root
+    return PowerPolicy(on_battery, threshold, low_action), root
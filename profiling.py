@@ -0,0 +1,296 @@
+"""
+Runtime profiling for the Keep Awake Utility.
+--profile[=cprofile|sample] profiles the whole session: cProfile in
+every thread (one profiler per thread before 3.12, one for the process
+after), or a sampling profiler that records thread stacks every few
+milliseconds (folded stacks, ready for a flame graph). tracemalloc
+snapshots are taken every --profile-memory=SECS (default 60), and hot
+paths decorated with @span record per-call timings. Everything is
+written to --profile-dir on exit, and on SIGUSR1 without exiting.
+
+Like --startup-profile, this is switched on from argv before the app
+classes are defined: with profiling off, span() hands back the function
+itself, so the hooks cost nothing at all.
+"""
+
+import atexit
+import os
+import signal
+import sys
+import threading
+import time
+
+from resource_sampler import RingBuffer, percentile
+
+PROFILE_MODES = ["cprofile", "sample"]
+DEFAULT_MEMORY_INTERVAL = 60.0
+SAMPLE_INTERVAL = 0.005
+# Recent durations kept per span for percentiles
+SPAN_HISTORY = 1024
+# From 3.12 cProfile runs on sys.monitoring: one profiler sees every thread, and a second one cannot start
+PROCESS_WIDE_CPROFILE = sys.version_info >= (3, 12)
+
+
+class SpanStats:
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.recent = RingBuffer(SPAN_HISTORY)
+
+    def add(self, elapsed_ns):
+        self.count += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        self.recent.append(elapsed_ns)
+
+    def summary(self):
+        recent = sorted(self.recent.recent(SPAN_HISTORY))
+        return {
+            "count": self.count,
+            "total_ms": self.total_ns / 1e6,
+            "mean_us": self.total_ns / self.count / 1e3 if self.count else 0.0,
+            "p50_us": percentile(recent, 0.5) / 1e3 if recent else 0.0,
+            "p95_us": percentile(recent, 0.95) / 1e3 if recent else 0.0,
+            "max_us": self.max_ns / 1e3,
+        }
+
+
+class SessionProfiler:
+    def __init__(self, mode="cprofile", directory=None, memory_interval=DEFAULT_MEMORY_INTERVAL):
+        """Profile the session in mode and write the results to directory"""
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{mode}'")
+        self.mode = mode
+        self.directory = directory or os.path.join(os.getcwd(), "profiles",
+                                                   time.strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}")
+        self.memory_interval = memory_interval
+        self.spans = {}
+        self.samples = {}
+        self.sample_count = 0
+        self.snapshots = 0
+        self.dumps = 0
+        self._profiles = []
+        self._stop = threading.Event()
+        self._threads = []
+        self._dump_lock = threading.Lock()
+        self._previous_handler = None
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if self.mode == "cprofile":
+            if not PROCESS_WIDE_CPROFILE:
+                # cProfile only sees the thread that enabled it, so every new thread gets its own
+                threading.setprofile(self._profile_thread)
+            self._profile_thread()
+        else:
+            self._spawn(self._sample_loop, "profile-sampler")
+        if self.memory_interval:
+            import tracemalloc
+
+            tracemalloc.start(16)
+            self._spawn(self._memory_loop, "profile-memory")
+        atexit.register(self.stop)
+        if hasattr(signal, "SIGUSR1") and threading.current_thread() is threading.main_thread():
+            # Dump off the signal handler, which may have interrupted a dump or a span
+            self._previous_handler = signal.signal(
+                signal.SIGUSR1, lambda signum, frame: threading.Thread(target=self.dump, daemon=True).start())
+        return self
+
+    def stop(self):
+        """Stop collecting and write the final results"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        current = threading.current_thread().name
+        if not PROCESS_WIDE_CPROFILE:
+            threading.setprofile(None)
+        for name, profile in self._profiles:
+            if name == current or PROCESS_WIDE_CPROFILE:
+                profile.disable()
+        atexit.unregister(self.stop)
+        if self._previous_handler is not None and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGUSR1, self._previous_handler)
+        for thread in self._threads:
+            thread.join(1)
+        self.dump()
+        if self.memory_interval:
+            import tracemalloc
+
+            tracemalloc.stop()
+
+    def _spawn(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def _profile_thread(self, *args):
+        import cProfile
+
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        self._profiles.append((threading.current_thread().name, profile))
+        profile.enable()
+
+    def _sample_loop(self):
+        own = {threading.get_ident()}
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            for ident, frame in sys._current_frames().items():
+                if ident in own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                key = ";".join(reversed(stack))
+                self.samples[key] = self.samples.get(key, 0) + 1
+            self.sample_count += 1
+
+    def _memory_loop(self):
+        while not self._stop.wait(self.memory_interval):
+            self.snapshot_memory()
+
+    def snapshot_memory(self):
+        import tracemalloc
+
+        if not tracemalloc.is_tracing():
+            return
+        snapshot = tracemalloc.take_snapshot()
+        self.snapshots += 1
+        stem = os.path.join(self.directory, f"memory-{self.snapshots:04d}")
+        snapshot.dump(stem + ".snapshot")
+        current, peak = tracemalloc.get_traced_memory()
+        with open(stem + ".txt", "w") as f:
+            f.write(f"traced {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB\n")
+            for stat in snapshot.statistics("lineno")[:25]:
+                f.write(f"{stat}\n")
+
+    def record(self, name, elapsed_ns):
+        stats = self.spans.get(name)
+        if stats is None:
+            stats = self.spans.setdefault(name, SpanStats())
+        stats.add(elapsed_ns)
+
+    def dump(self):
+        """Write profiles, spans and a memory snapshot; safe to call repeatedly"""
+        import json
+
+        with self._dump_lock:
+            self.dumps += 1
+            if self.mode == "cprofile":
+                self._dump_cprofile()
+            else:
+                self._dump_samples()
+            with open(os.path.join(self.directory, "spans.json"), "w") as f:
+                json.dump({name: stats.summary() for name, stats in sorted(self.spans.items())}, f, indent=2)
+            self.snapshot_memory()
+        print(f"Profile written to {self.directory}")
+
+    def _dump_cprofile(self):
+        import pstats
+
+        merged = {}
+        for name, profile in list(self._profiles):
+            # snapshot_stats reads the counters without disabling the profiler,
+            # which would act on the dumping thread rather than the profiled one
+            profile.snapshot_stats()
+            for func, stat in profile.stats.items():
+                # Merged here rather than with Stats.add, which not every version takes a snapshot in
+                merged[func] = stat if func not in merged else pstats.add_func_stats(merged[func], stat)
+        if not merged:
+            return
+        stats = pstats.Stats(_StatsSnapshot(merged))
+        stats.dump_stats(os.path.join(self.directory, "cprofile.pstats"))
+        with open(os.path.join(self.directory, "cprofile.txt"), "w") as f:
+            stats.stream = f
+            stats.sort_stats("cumulative").print_stats(40)
+
+    def _dump_samples(self):
+        samples = dict(self.samples)
+        with open(os.path.join(self.directory, "samples.folded"), "w") as f:
+            for stack, count in sorted(samples.items()):
+                f.write(f"{stack} {count}\n")
+        # Leaf functions by share of samples
+        leaves = {}
+        for stack, count in samples.items():
+            leaf = stack.rsplit(";", 1)[-1]
+            leaves[leaf] = leaves.get(leaf, 0) + count
+        total = sum(leaves.values()) or 1
+        with open(os.path.join(self.directory, "samples.txt"), "w") as f:
+            f.write(f"{self.sample_count} sampling rounds, {total} stacks\n")
+            for leaf, count in sorted(leaves.items(), key=lambda item: -item[1])[:40]:
+                f.write(f"{count / total * 100.0:6.2f}%  {leaf}\n")
+
+
+class _StatsSnapshot:
+    """What pstats.Stats loads from: a profile whose stats are already collected"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+PROFILER = None
+
+
+def parse_profile_args(argv):
+    """(mode, directory, memory_interval) from --profile[=MODE], or None when profiling is off"""
+    mode = None
+    directory = None
+    memory_interval = DEFAULT_MEMORY_INTERVAL
+    for arg in argv:
+        if arg == "--profile":
+            mode = "cprofile"
+        elif arg.startswith("--profile="):
+            mode = arg.split("=", 1)[1]
+        elif arg.startswith("--profile-dir="):
+            directory = arg.split("=", 1)[1]
+        elif arg.startswith("--profile-memory="):
+            try:
+                memory_interval = max(0.0, float(arg.split("=", 1)[1]))
+            except ValueError:
+                print(f"Warning: Invalid profile memory interval: {arg}")
+    if mode is None:
+        return None
+    if mode not in PROFILE_MODES:
+        print(f"Warning: Unknown profile mode '{mode}', using cprofile")
+        mode = "cprofile"
+    return mode, directory, memory_interval
+
+
+def enable_profiling(argv):
+    """Start the session profiler when --profile is on the command line"""
+    global PROFILER
+    if PROFILER is None:
+        options = parse_profile_args(argv)
+        if options is not None:
+            PROFILER = SessionProfiler(*options).start()
+    return PROFILER
+
+
+def span(name):
+    """Time every call of the decorated function; with profiling off it is returned unchanged"""
+
+    def decorate(fn):
+        profiler = PROFILER
+        if profiler is None:
+            return fn
+        clock = time.perf_counter_ns
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profiler.record(name, clock() - start)
+
+        timed.__name__ = fn.__name__
+        timed.__doc__ = fn.__doc__
+        timed.__wrapped__ = fn
+        return timed
+
+    return decorate
@@ -0,0 +1,159 @@
+"""
+Background resource sampler for the Keep Awake Utility.
+CPU, frequency, memory, disk and battery readings are taken by a
+scheduler job at a fixed rate and kept in array-backed ring buffers, so
+the resource monitor reads history instead of blocking on psutil.
+"""
+
+import math
+import threading
+import time
+from array import array
+
+# Windows reported by the resource monitor, in seconds
+WINDOWS = (60, 300, 900)
+DEFAULT_SAMPLE_INTERVAL = 2.0
+METRICS = ("cpu", "freq", "memory", "disk", "battery")
+
+
+class RingBuffer:
+    def __init__(self, capacity, typecode="d"):
+        """Fixed-size ring of numbers; missing readings are stored as NaN"""
+        self.capacity = capacity
+        self.data = array(typecode, [math.nan]) * capacity
+        self.index = 0
+        self.count = 0
+
+    def append(self, value):
+        self.data[self.index] = value
+        self.index = (self.index + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def latest(self):
+        if not self.count:
+            return math.nan
+        return self.data[self.index - 1]
+
+    def recent(self, n):
+        """The last n values, oldest first"""
+        n = min(n, self.count)
+        start = (self.index - n) % self.capacity
+        if start + n <= self.capacity:
+            return self.data[start:start + n]
+        return self.data[start:] + self.data[:self.index]
+
+    def __len__(self):
+        return self.count
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return math.nan
+    rank = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+class ResourceSampler:
+    def __init__(self, interval=DEFAULT_SAMPLE_INTERVAL, history=max(WINDOWS), psutil_module=None,
+                 disk_path=None, clock=time.monotonic):
+        """Keep `history` seconds of samples taken every `interval` seconds"""
+        if psutil_module is None:
+            import psutil as psutil_module
+        self.psutil = psutil_module
+        self.interval = interval
+        self.clock = clock
+        self.disk_path = disk_path or ("C:\\" if getattr(self.psutil, "WINDOWS", False) else "/")
+        capacity = int(math.ceil(history / interval)) + 1
+        self.times = RingBuffer(capacity)
+        self.series = {name: RingBuffer(capacity) for name in METRICS}
+        self.battery = None
+        self.job = None
+        self._lock = threading.Lock()
+
+        # Overhead accounting: CPU time spent inside sample() vs wall time sampled
+        self.samples = 0
+        self.cpu_time = 0.0
+        self.started = None
+
+        # Prime the counter so the first real sample covers one full interval
+        self.psutil.cpu_percent(interval=None)
+
+    def start(self, scheduler):
+        """Sample on the scheduler thread every interval"""
+        self.started = self.clock()
+        self.job = scheduler.call_every(self.interval, self.sample, first_delay=0)
+
+    def stop(self):
+        if self.job is not None:
+            self.job.cancel()
+            self.job = None
+
+    def sample(self):
+        """Take one reading of every metric"""
+        cpu_start = time.thread_time()
+        psutil = self.psutil
+        cpu = psutil.cpu_percent(interval=None)
+        freq = psutil.cpu_freq()
+        memory = psutil.virtual_memory().percent
+        try:
+            disk = psutil.disk_usage(self.disk_path).percent
+        except OSError:
+            disk = math.nan
+        battery = psutil.sensors_battery() if hasattr(psutil, "sensors_battery") else None
+        with self._lock:
+            self.series["cpu"].append(cpu)
+            self.series["freq"].append(freq.current if freq else math.nan)
+            self.series["memory"].append(memory)
+            self.series["disk"].append(disk)
+            self.series["battery"].append(battery.percent if battery else math.nan)
+            self.battery = battery
+            self.times.append(self.clock())
+            self.samples += 1
+        self.cpu_time += time.thread_time() - cpu_start
+
+    def current(self):
+        """Latest value of every metric (NaN when unavailable)"""
+        with self._lock:
+            return {name: ring.latest() for name, ring in self.series.items()}
+
+    def window_stats(self, metric, seconds):
+        """min/avg/max/p50/p95 of metric over the last `seconds`, or None without samples"""
+        with self._lock:
+            times = self.times.recent(len(self.times))
+            values = self.series[metric].recent(len(self.times))
+        if not times:
+            return None
+        cutoff = times[-1] - seconds
+        selected = sorted(v for t, v in zip(times, values) if t > cutoff and not math.isnan(v))
+        if not selected:
+            return None
+        return {
+            "min": selected[0],
+            "avg": sum(selected) / len(selected),
+            "max": selected[-1],
+            "p50": percentile(selected, 0.50),
+            "p95": percentile(selected, 0.95),
+            "samples": len(selected),
+        }
+
+    def overhead_percent(self):
+        """CPU time spent sampling as a percentage of the time sampled"""
+        if self.started is None:
+            return 0.0
+        elapsed = self.clock() - self.started
+        if elapsed <= 0:
+            return 0.0
+        return self.cpu_time / elapsed * 100.0
+
+
+def parse_sample_interval_arg(argv, default=DEFAULT_SAMPLE_INTERVAL):
+    """Return the --sample-interval=SECONDS value from argv (0 disables sampling)"""
+    for arg in argv:
+        if arg.startswith("--sample-interval="):
+            try:
+                return max(0.0, float(arg.split("=", 1)[1]))
+            except ValueError:
+                print(f"Warning: Invalid sample interval: {arg}")
+    return default
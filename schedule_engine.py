@@ -0,0 +1,316 @@
+"""
+Schedule engine for the Keep Awake Utility.
+Rules describe when keep-awake should be active, either as weekly time
+windows or as cron expressions with a duration:
+
+    mon-fri 09:00-17:30
+    daily 22:00-06:00
+    cron 0 9 * * 1-5 for 8h
+
+Each rule yields its windows lazily in start order; the engine merges them
+with a heap and computes the next start/stop transition directly. Windows
+are laid out in local wall time and converted to timestamps one by one,
+so DST shifts land on the right instant. The runner sleeps on the
+scheduler until the next transition and re-plans from the wall clock, so
+suspend/resume and clock changes cannot make it miss one.
+"""
+
+import heapq
+import itertools
+from datetime import datetime, time as dtime, timedelta
+
+# Longest the runner sleeps before re-reading the wall clock
+GUARD_INTERVAL = 60
+# Wall vs monotonic disagreement that counts as a clock jump (suspend, clock set)
+JUMP_TOLERANCE = 2.0
+# Days searched ahead before a cron rule counts as never matching, or a window as never ending
+CRON_HORIZON_DAYS = 5 * 366
+
+DAY_NAMES = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+
+class ScheduleError(ValueError):
+    """Raised for rules that cannot be parsed"""
+
+
+def _parse_clock(text):
+    try:
+        hours, minutes = text.split(":")
+        hours, minutes = int(hours), int(minutes)
+    except ValueError:
+        raise ScheduleError(f"Invalid time '{text}', expected HH:MM")
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or (hours == 24 and minutes):
+        raise ScheduleError(f"Invalid time '{text}'")
+    return hours * 60 + minutes
+
+
+def _parse_days(text):
+    if text in ("daily", "*"):
+        return set(range(7))
+    if text == "weekdays":
+        return set(range(5))
+    if text == "weekends":
+        return {5, 6}
+    days = set()
+    for part in text.split(","):
+        first, _, last = part.partition("-")
+        if first not in DAY_NAMES or (last and last not in DAY_NAMES):
+            raise ScheduleError(f"Invalid day '{part}'")
+        start = DAY_NAMES.index(first)
+        end = DAY_NAMES.index(last) if last else start
+        day = start
+        while True:
+            days.add(day)
+            if day == end:
+                break
+            day = (day + 1) % 7
+    return days
+
+
+def _parse_cron_field(text, low, high):
+    """Expand one cron field (*, a-b, */n, a-b/n, lists) into a sorted list"""
+    values = set()
+    for part in text.split(","):
+        base, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if base == "*":
+            start, end = low, high
+        elif "-" in base:
+            start, end = (int(v) for v in base.split("-"))
+        else:
+            start = end = int(base)
+        if start < low or end > high or start > end or step < 1:
+            raise ScheduleError(f"Cron field '{text}' out of range {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return sorted(values)
+
+
+def _parse_duration(text):
+    units = {"m": 60, "h": 3600, "d": 86400}
+    try:
+        seconds = float(text[:-1]) * units[text[-1]]
+    except (KeyError, ValueError, IndexError):
+        raise ScheduleError(f"Invalid duration '{text}', expected e.g. 90m or 8h")
+    if seconds <= 0:
+        raise ScheduleError("Duration must be positive")
+    return timedelta(seconds=seconds)
+
+
+class WeeklyWindow:
+    def __init__(self, days, start_minute, end_minute, text=""):
+        """Active from start to end on each listed weekday; end <= start runs past midnight"""
+        self.days = set(days)
+        self.start = timedelta(minutes=start_minute)
+        end = timedelta(minutes=end_minute)
+        self.end = end if end > self.start else end + timedelta(days=1)
+        self.text = text
+        self.lookback = self.end
+
+    def windows(self, first_day):
+        """(start, end) local wall times in start order, from first_day onward"""
+        day = datetime.combine(first_day, dtime())
+        if not self.days:
+            return
+        while True:
+            if day.weekday() in self.days:
+                yield day + self.start, day + self.end
+            day += timedelta(days=1)
+
+
+class CronWindow:
+    def __init__(self, expression, duration, text=""):
+        """Active for duration after every time the 5-field cron expression matches"""
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ScheduleError(f"Cron expression needs 5 fields: '{expression}'")
+        self.minutes = _parse_cron_field(fields[0], 0, 59)
+        self.hours = _parse_cron_field(fields[1], 0, 23)
+        self.doms = set(_parse_cron_field(fields[2], 1, 31))
+        self.months = set(_parse_cron_field(fields[3], 1, 12))
+        # Cron counts Sunday as 0 (and 7); weekday() counts Monday as 0
+        self.dows = {(d - 1) % 7 for d in _parse_cron_field(fields[4], 0, 7)}
+        self.dom_any = fields[2] == "*"
+        self.dow_any = fields[4] == "*"
+        self.duration = duration
+        self.text = text
+        self.lookback = duration
+        self.times = [timedelta(hours=h, minutes=m) for h in self.hours for m in self.minutes]
+
+    def _day_matches(self, day):
+        if day.month not in self.months:
+            return False
+        dom = day.day in self.doms
+        dow = day.weekday() in self.dows
+        # Standard cron: when both fields are restricted, either may match
+        if self.dom_any:
+            return dow
+        if self.dow_any:
+            return dom
+        return dom or dow
+
+    def windows(self, first_day):
+        day = datetime.combine(first_day, dtime())
+        for _ in range(CRON_HORIZON_DAYS):
+            if self._day_matches(day):
+                for offset in self.times:
+                    yield day + offset, day + offset + self.duration
+            day += timedelta(days=1)
+
+
+def parse_rule(text):
+    """Parse a weekly ('mon-fri 09:00-17:30') or cron ('cron 0 9 * * 1-5 for 8h') rule"""
+    text = " ".join(text.strip().lower().split())
+    if text.startswith("cron "):
+        expression, sep, duration = text[5:].rpartition(" for ")
+        if not sep:
+            raise ScheduleError("Cron rules need a duration, e.g. 'cron 0 9 * * 1-5 for 8h'")
+        return CronWindow(expression, _parse_duration(duration), text)
+    parts = text.split(" ")
+    if len(parts) != 2 or "-" not in parts[1]:
+        raise ScheduleError(f"Invalid rule '{text}', expected e.g. 'mon-fri 09:00-17:30'")
+    start, _, end = parts[1].partition("-")
+    return WeeklyWindow(_parse_days(parts[0]), _parse_clock(start), _parse_clock(end), text)
+
+
+class ScheduleEngine:
+    def __init__(self, rules=(), tz=None):
+        """Active windows from rules; tz is a tzinfo (e.g. ZoneInfo) or None for local time"""
+        self.rules = list(rules)
+        self.tz = tz
+
+    def add(self, rule):
+        self.rules.append(parse_rule(rule) if isinstance(rule, str) else rule)
+
+    def _timestamp(self, local):
+        # fold=0: a time repeated by a DST fall-back means its first occurrence,
+        # and a time skipped by spring-forward is read with the pre-gap offset
+        if self.tz is not None:
+            return local.replace(tzinfo=self.tz).timestamp()
+        return local.timestamp()
+
+    def _local(self, timestamp):
+        if self.tz is not None:
+            return datetime.fromtimestamp(timestamp, self.tz).replace(tzinfo=None)
+        return datetime.fromtimestamp(timestamp)
+
+    def _rule_windows(self, rule, after):
+        """A rule's windows as timestamps, skipping those over before `after`"""
+        first_day = (self._local(after) - rule.lookback).date() - timedelta(days=1)
+        for start, end in rule.windows(first_day):
+            start_ts, end_ts = self._timestamp(start), self._timestamp(end)
+            if end_ts > after and end_ts > start_ts:
+                yield start_ts, end_ts
+
+    def _merged(self, after):
+        """Union of every rule's windows that end after `after`, in start order"""
+        # A union still growing past the horizon (rules covering the whole week) gets end None
+        streams = [self._rule_windows(rule, after) for rule in self.rules]
+        limit = after + CRON_HORIZON_DAYS * 86400
+        current = None
+        for start, end in heapq.merge(*streams):
+            if current is None:
+                current = [start, end]
+            elif start <= current[1]:
+                current[1] = max(current[1], end)
+                if start > limit:
+                    yield current[0], None
+                    return
+            else:
+                yield tuple(current)
+                current = [start, end]
+        if current is not None:
+            yield tuple(current)
+
+    def is_active(self, at):
+        for start, end in self._merged(at):
+            return start <= at and (end is None or at < end)
+        return False
+
+    def transitions(self, after):
+        """Yield (timestamp, active) for every state change strictly after `after`"""
+        for start, end in self._merged(after):
+            if start > after:
+                yield start, True
+            if end is None:
+                return
+            yield end, False
+
+    def next_transition(self, after):
+        return next(self.transitions(after), None)
+
+    def next_transitions(self, after, count):
+        return list(itertools.islice(self.transitions(after), count))
+
+
+class ScheduleRunner:
+    def __init__(self, engine, scheduler, on_change):
+        """Drive on_change(active) from the engine, sleeping on the scheduler between transitions"""
+        self.engine = engine
+        self.scheduler = scheduler
+        self.on_change = on_change
+        self.active = None
+        self.next = None
+        self.job = None
+        self.wakeups = 0
+        self.jumps = 0
+        self._offset = None
+
+    def start(self):
+        self.active = None
+        self._plan()
+
+    def stop(self):
+        if self.job is not None:
+            self.job.cancel()
+            self.job = None
+
+    def replan(self):
+        """Re-read the rules, e.g. after one was added"""
+        self.stop()
+        self._plan()
+
+    def _plan(self):
+        now = self.scheduler.wall_clock()
+        offset = now - self.scheduler.clock()
+        if self._offset is not None and abs(offset - self._offset) > JUMP_TOLERANCE:
+            self.jumps += 1
+        self._offset = offset
+        state = self.engine.is_active(now)
+        if state != self.active:
+            self.active = state
+            self.on_change(state)
+        self.next = self.engine.next_transition(now)
+        delay = GUARD_INTERVAL if self.next is None else min(self.next[0] - now, GUARD_INTERVAL)
+        self.job = self.scheduler.call_later(max(0.0, delay), self._wake)
+
+    def _wake(self):
+        self.wakeups += 1
+        # Always re-plan from the wall clock: the transition may be due, or a
+        # suspend or clock change may have moved wall time under the monotonic sleep
+        self._plan()
+
+
+def load_timezone(name):
+    """ZoneInfo for name, or None for the system local time"""
+    if not name:
+        return None
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ScheduleError(f"Unknown time zone '{name}'")
+
+
+def parse_schedule_args(argv):
+    """Build a ScheduleEngine from --schedule=RULE (repeatable) and --schedule-tz=ZONE"""
+    rules = []
+    tz = None
+    for arg in argv:
+        try:
+            if arg.startswith("--schedule="):
+                rules.append(parse_rule(arg.split("=", 1)[1]))
+            elif arg.startswith("--schedule-tz="):
+                tz = load_timezone(arg.split("=", 1)[1])
+        except ScheduleError as e:
+            print(f"Warning: {str(e)}")
+    return ScheduleEngine(rules, tz)
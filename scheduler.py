@@ -0,0 +1,264 @@
+"""
+Deadline scheduler for the Keep Awake Utility.
+A single thread keeps a heap of monotonic-clock deadlines and sleeps
+until the earliest one is due, so every timed action (activity ticks,
+countdown, tray refresh, shutdown grace period) shares one wakeup source.
+With a VirtualClock (clock.py) there is no thread: jobs run on the caller
+of clock.advance(), in deadline order.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+from clock import SYSTEM_CLOCK
+
+
+class Job:
+    def __init__(self, scheduler, deadline, interval, fn, args):
+        self.scheduler = scheduler
+        self.deadline = deadline
+        self.interval = interval
+        self.fn = fn
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        """Cancel the job; a repeating job will not fire again"""
+        self.scheduler.cancel(self)
+
+    @property
+    def active(self):
+        """True while the job is still scheduled to fire"""
+        return not self.cancelled
+
+
+class Scheduler:
+    def __init__(self, clock=SYSTEM_CLOCK, name="keep-awake-scheduler"):
+        self.clock = clock
+        self.wall_clock = getattr(clock, "wall", time.time)
+        self.virtual = getattr(clock, "virtual", False)
+        self.name = name
+        self._heap = []
+        self._seq = itertools.count()
+        lock = threading.RLock()
+        self._cond = threading.Condition(lock)
+        # Separate condition on the same lock so idle waiters never wake the scheduler thread
+        self._idle = threading.Condition(lock)
+        self._current = None
+        self._calling = None
+        self._thread = None
+        self._running = False
+
+        # Drift accounting
+        self.wakeups = 0
+        self.fired = 0
+        self.total_drift = 0.0
+        self.max_drift = 0.0
+        self._started_mono = None
+        self._started_wall = None
+
+    def start(self):
+        """Start the scheduler thread if it is not already running"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._started_mono = self.clock()
+            self._started_wall = self.wall_clock()
+        if self.virtual:
+            self.clock.attach(self)
+            return
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """Stop the scheduler thread and drop every pending job; True once the thread has exited"""
+        with self._cond:
+            self._running = False
+            for _, _, job in self._heap:
+                job.cancelled = True
+            self._heap.clear()
+            self._cond.notify_all()
+        if self.virtual:
+            self.clock.detach(self)
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                return False
+        self._thread = None
+        return True
+
+    def call_later(self, delay, fn, *args):
+        """Run fn(*args) once after delay seconds"""
+        return self._push(self.clock() + max(0.0, delay), None, fn, args)
+
+    def call_at(self, deadline, fn, *args):
+        """Run fn(*args) once when the clock reaches deadline"""
+        return self._push(deadline, None, fn, args)
+
+    def call_every(self, interval, fn, *args, first_delay=None):
+        """Run fn(*args) every interval seconds, anchored to the first deadline"""
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        delay = interval if first_delay is None else max(0.0, first_delay)
+        return self._push(self.clock() + delay, interval, fn, args)
+
+    def cancel(self, job):
+        """Cancel a pending job; it is dropped when its deadline comes up"""
+        if job is None:
+            return
+        with self._cond:
+            job.cancelled = True
+
+    def wait_idle(self, timeout=1.0):
+        """Wait until no callback is running; True when idle within timeout"""
+        # A callback cannot wait for itself to finish
+        if self._calling is threading.current_thread():
+            return True
+        with self._idle:
+            return self._idle.wait_for(lambda: self._current is None, timeout)
+
+    def on_thread(self):
+        """True when the caller may act as the scheduler thread: it is that thread, or there is none"""
+        thread = self._thread
+        return self.virtual or thread is None or thread is threading.current_thread()
+
+    def run_sync(self, fn, *args):
+        """Run fn(*args) on the scheduler thread and return its result; called directly when already there"""
+        if self.on_thread():
+            return fn(*args)
+        done = threading.Event()
+        outcome = []
+
+        def call():
+            try:
+                outcome.append((True, fn(*args)))
+            except BaseException as e:
+                outcome.append((False, e))
+            finally:
+                done.set()
+
+        job = self.call_later(0, call)
+        while not done.wait(0.5):
+            if not self.is_alive() and job.cancelled and not done.is_set():
+                # Stopped before the job ran; there is no other thread left to run it on
+                return fn(*args)
+        ok, value = outcome[0]
+        if not ok:
+            raise value
+        return value
+
+    def is_alive(self):
+        """True while the scheduler thread is running"""
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def pending(self):
+        """Number of jobs still waiting to fire"""
+        with self._cond:
+            return sum(1 for _, _, job in self._heap if not job.cancelled)
+
+    def drift_stats(self):
+        """Report lateness of fired jobs and monotonic vs wall clock skew"""
+        wall_skew = 0.0
+        if self._started_mono is not None:
+            mono_elapsed = self.clock() - self._started_mono
+            wall_elapsed = self.wall_clock() - self._started_wall
+            wall_skew = wall_elapsed - mono_elapsed
+        return {
+            "wakeups": self.wakeups,
+            "fired": self.fired,
+            "mean_drift_ms": (self.total_drift / self.fired * 1000.0) if self.fired else 0.0,
+            "max_drift_ms": self.max_drift * 1000.0,
+            "wall_skew_ms": wall_skew * 1000.0,
+        }
+
+    def _push(self, deadline, interval, fn, args):
+        job = Job(self, deadline, interval, fn, args)
+        with self._cond:
+            heapq.heappush(self._heap, (deadline, next(self._seq), job))
+            # Only wake the thread when the new job is the earliest deadline
+            if self._heap[0][2] is job:
+                self._cond.notify_all()
+        return job
+
+    def next_deadline(self):
+        """Deadline of the earliest pending job, or None"""
+        with self._cond:
+            self._drop_cancelled()
+            return self._heap[0][0] if self._heap else None
+
+    def run_due(self):
+        """Run every job that is due now on the calling thread; used with a VirtualClock"""
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                self._drop_cancelled()
+                if not self._heap or self._heap[0][0] > self.clock():
+                    return
+                job, drift = self._pop_due(self.clock())
+            self._fire(job, drift)
+
+    def _drop_cancelled(self):
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+
+    def _pop_due(self, now):
+        """Pop the earliest job (which must be due) and reschedule it if it repeats"""
+        deadline, _, job = heapq.heappop(self._heap)
+        if job.interval is not None:
+            # Next deadline follows the schedule, not the time we woke up,
+            # so sleep overhead never accumulates into the period
+            job.deadline += job.interval
+            if job.deadline <= now:
+                missed = int((now - job.deadline) // job.interval) + 1
+                job.deadline += missed * job.interval
+            heapq.heappush(self._heap, (job.deadline, next(self._seq), job))
+        else:
+            job.cancelled = True
+        self._current = job
+        self._calling = threading.current_thread()
+        return job, now - deadline
+
+    def _next_due(self):
+        """Pop the next due job, waiting on the condition until it is due"""
+        with self._cond:
+            while self._running:
+                self._drop_cancelled()
+                if not self._heap:
+                    self._cond.wait()
+                    self.wakeups += 1
+                    continue
+                deadline = self._heap[0][0]
+                now = self.clock()
+                if deadline > now:
+                    self._cond.wait(deadline - now)
+                    self.wakeups += 1
+                    continue
+                return self._pop_due(now)
+        return None, 0.0
+
+    def _fire(self, job, drift):
+        self.fired += 1
+        self.total_drift += drift
+        if drift > self.max_drift:
+            self.max_drift = drift
+        try:
+            job.fn(*job.args)
+        except Exception as e:
+            print(f"Error in scheduled task {getattr(job.fn, '__name__', job.fn)}: {str(e)}")
+        finally:
+            with self._idle:
+                self._current = None
+                self._calling = None
+                self._idle.notify_all()
+
+    def _run(self):
+        while True:
+            job, drift = self._next_due()
+            if job is None:
+                return
+            self._fire(job, drift)
@@ -0,0 +1,453 @@
+"""
+Session journal for the Keep Awake Utility.
+Every session event (start, stop, timer choice, injections, shutdowns)
+is appended to an on-disk journal of fixed-size binary records:
+
+    <timestamp: f64> <kind: u32> <value: f64> <crc32: u32>
+
+Records go to numbered segment files that rotate once they reach
+max_bytes. A small index file holds one fixed record per day and segment
+(day, segment, record number), so a range query seeks straight to its
+first day instead of scanning history. Events are queued in memory and
+written in batches by a background thread, so callers never touch the
+disk. Injections are coalesced into one counted record per few minutes.
+A torn record left by a crash fails its CRC and is cut off on the next
+open.
+
+    python session_journal.py --from=2026-01-01 --to=2026-12-31
+"""
+
+import bisect
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import date, datetime, timedelta
+
+from clock import SYSTEM_CLOCK
+
+RECORD = struct.Struct("<dIdI")
+INDEX = struct.Struct("<III")
+
+START = 1
+STOP = 2
+TIMER = 3
+INJECT = 4
+SHUTDOWN_SCHEDULED = 5
+SHUTDOWN_CANCELLED = 6
+SHUTDOWN_EXECUTED = 7
+
+KIND_NAMES = {
+    START: "start", STOP: "stop", TIMER: "timer", INJECT: "inject",
+    SHUTDOWN_SCHEDULED: "shutdown-scheduled", SHUTDOWN_CANCELLED: "shutdown-cancelled",
+    SHUTDOWN_EXECUTED: "shutdown-executed",
+}
+
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+DEFAULT_FLUSH_INTERVAL = 5.0
+# Injections are summed into one record per bucket
+INJECT_BUCKET = 300
+INDEX_NAME = "journal.idx"
+
+
+def default_data_dir():
+    """Per-user directory for files that outlive a run"""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        return os.path.join(base, "KeepAwake")
+    base = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, "keep-awake")
+
+
+def default_journal_dir():
+    return os.path.join(default_data_dir(), "journal")
+
+
+def _pack(timestamp, kind, value):
+    body = RECORD.pack(timestamp, kind, value, 0)[:-4]
+    return body + struct.pack("<I", zlib.crc32(body))
+
+
+def _valid(data, offset):
+    end = offset + RECORD.size - 4
+    return zlib.crc32(data[offset:end]) == struct.unpack_from("<I", data, end)[0]
+
+
+class _DayCache:
+    """Local date ordinal of a timestamp, recomputed only when a day boundary is crossed"""
+
+    def __init__(self):
+        self.day = None
+        self.start = self.end = 0.0
+
+    def __call__(self, timestamp):
+        if not (self.start <= timestamp < self.end):
+            day = datetime.fromtimestamp(timestamp).date()
+            self.day = day.toordinal()
+            self.start = datetime.combine(day, datetime.min.time()).timestamp()
+            self.end = datetime.combine(day + timedelta(days=1), datetime.min.time()).timestamp()
+        return self.day
+
+
+class SessionJournal:
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, clock=SYSTEM_CLOCK):
+        """Append-only journal in directory; events are written by a background thread"""
+        self.directory = directory or default_journal_dir()
+        self.max_bytes = max(RECORD.size, max_bytes)
+        self.flush_interval = flush_interval
+        self.wall_clock = getattr(clock, "wall", time.time)
+        self.records_written = 0
+        self.batches_written = 0
+        self.truncated = 0
+        self._queue = deque()
+        self._wake = threading.Event()
+        self._closing = False
+        self._thread = None
+        self._write_lock = threading.Lock()
+        self._segment = None
+        self._file = None
+        self._records = 0
+        self._index = []
+        self._day = _DayCache()
+        self._inject = None
+
+    # ---- writing ----
+
+    def record(self, kind, value=0.0):
+        """Queue an event; never blocks on disk"""
+        self._queue.append((self.wall_clock(), kind, float(value)))
+
+    def record_injection(self):
+        self._queue.append((self.wall_clock(), INJECT, 1.0))
+
+    def start(self):
+        """Start the writer thread; it opens (and if needed repairs) the journal first"""
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name="session-journal", daemon=True)
+        self._thread.start()
+
+    def flush(self):
+        """Write everything queued so far, including the open injection bucket"""
+        with self._write_lock:
+            if self._file is None:
+                self._open()
+            self._write_batch(final=True)
+
+    def close(self, timeout=2.0):
+        self._closing = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _run(self):
+        while not self._closing:
+            try:
+                with self._write_lock:
+                    if self._file is None:
+                        self._open()
+                    self._write_batch()
+            except OSError as e:
+                print(f"Error: Cannot write session journal: {str(e)}")
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+
+    def _coalesce(self, final):
+        """Drain the queue into records, summing injections per INJECT_BUCKET"""
+        records = []
+        while self._queue:
+            timestamp, kind, value = self._queue.popleft()
+            if kind == INJECT:
+                bucket = int(timestamp // INJECT_BUCKET)
+                if self._inject is not None and self._inject[0] != bucket:
+                    records.append(self._inject[1:])
+                    self._inject = None
+                if self._inject is None:
+                    self._inject = [bucket, timestamp, INJECT, 0.0]
+                self._inject[1] = timestamp
+                self._inject[3] += value
+                continue
+            # Keep injections ahead of the event that followed them
+            if self._inject is not None:
+                records.append(self._inject[1:])
+                self._inject = None
+            records.append((timestamp, kind, value))
+        if final and self._inject is not None:
+            records.append(self._inject[1:])
+            self._inject = None
+        return records
+
+    def _write_batch(self, final=False):
+        records = self._coalesce(final)
+        if not records:
+            return
+        chunk = []
+        index = []
+        for timestamp, kind, value in records:
+            if (self._records + len(chunk) + 1) * RECORD.size > self.max_bytes and self._records + len(chunk):
+                self._append(chunk, index)
+                chunk, index = [], []
+                self._rotate()
+            day = self._day(timestamp)
+            # Days only move forward in the index; a clock set back stays in the current day
+            if not self._index or day > self._index[-1][0] or self._index[-1][1] != self._segment:
+                entry = (max(day, self._index[-1][0]) if self._index else day,
+                         self._segment, self._records + len(chunk))
+                self._index.append(entry)
+                index.append(entry)
+            chunk.append(_pack(timestamp, kind, value))
+        self._append(chunk, index)
+        self.batches_written += 1
+
+    def _append(self, chunk, index):
+        if not chunk:
+            return
+        self._file.write(b"".join(chunk))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._records += len(chunk)
+        self.records_written += len(chunk)
+        # The index is written after the data it points at, so it never points past it
+        if index:
+            with open(os.path.join(self.directory, INDEX_NAME), "ab") as f:
+                f.write(b"".join(INDEX.pack(*entry) for entry in index))
+
+    def _rotate(self):
+        self._file.close()
+        self._segment += 1
+        self._file = open(self._segment_path(self._segment), "ab")
+        self._records = 0
+
+    def _segment_path(self, number):
+        return os.path.join(self.directory, f"journal-{number:06d}.bin")
+
+    def _open(self):
+        """Open the newest segment, cutting off a torn tail and repairing the index"""
+        os.makedirs(self.directory, exist_ok=True)
+        segments = _list_segments(self.directory)
+        self._segment = segments[-1] if segments else 1
+        path = self._segment_path(self._segment)
+        data = b""
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+        # Only the last batch can be torn; walk back to the newest intact record
+        good = len(data) - len(data) % RECORD.size
+        while good and not _valid(data, good - RECORD.size):
+            good -= RECORD.size
+        if good != len(data):
+            self.truncated += -(-(len(data) - good) // RECORD.size)
+            with open(path, "r+b") as f:
+                f.truncate(good)
+        self._records = good // RECORD.size
+        self._file = open(path, "ab")
+
+        if os.path.exists(os.path.join(self.directory, INDEX_NAME)):
+            self._index = [entry for entry in _read_index(self.directory) if entry[1] < self._segment]
+        else:
+            self._index = []
+            for number in segments[:-1]:
+                with open(self._segment_path(number), "rb") as f:
+                    older = f.read()
+                older = older[:len(older) - len(older) % RECORD.size]
+                self._index.extend(_scan_days(older, number, self._index[-1] if self._index else None))
+        # The newest segment is always re-indexed: a crash may have kept days out of the index
+        self._index.extend(_scan_days(data[:good], self._segment, self._index[-1] if self._index else None))
+        # Replaced atomically: a crash here must not leave a truncated index that day queries trust
+        _write_atomic(os.path.join(self.directory, INDEX_NAME), b"".join(INDEX.pack(*entry) for entry in self._index))
+
+    # ---- reading ----
+
+    def read(self, start, end):
+        """Yield (timestamp, kind, value) for records with start <= timestamp < end"""
+        return read_range(self.directory, start, end)
+
+    def summarize(self, start, end):
+        return summarize(self.read(start, end), start, end)
+
+
+def _write_atomic(path, data):
+    fd, temp_path = tempfile.mkstemp(prefix=".journal-idx-", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _list_segments(directory):
+    numbers = []
+    for name in os.listdir(directory) if os.path.isdir(directory) else ():
+        if name.startswith("journal-") and name.endswith(".bin"):
+            try:
+                numbers.append(int(name[8:-4]))
+            except ValueError:
+                pass
+    return sorted(numbers)
+
+
+def _read_index(directory):
+    try:
+        with open(os.path.join(directory, INDEX_NAME), "rb") as f:
+            data = f.read()
+    except OSError:
+        return []
+    usable = len(data) - len(data) % INDEX.size
+    return [tuple(entry) for entry in INDEX.iter_unpack(data[:usable])]
+
+
+def _scan_days(data, number, previous):
+    """Index entries for a segment's records, following the previous segment's last entry"""
+    entries = []
+    days = _DayCache()
+    for position, (timestamp, _, _, _) in enumerate(RECORD.iter_unpack(data)):
+        day = days(timestamp)
+        if previous is None or previous[1] != number or day > previous[0]:
+            previous = (max(day, previous[0]) if previous else day, number, position)
+            entries.append(previous)
+    return entries
+
+
+def read_range(directory, start, end):
+    """Yield valid records with start <= timestamp < end, seeking via the day index"""
+    index = _read_index(directory)
+    if not index:
+        return
+    days = [entry[0] for entry in index]
+    first_day = datetime.fromtimestamp(start).date().toordinal()
+    last_day = datetime.fromtimestamp(end).date().toordinal()
+    first = bisect.bisect_left(days, first_day)
+    stop = bisect.bisect_right(days, last_day)
+    if first >= stop:
+        return
+    segment, position = index[first][1], index[first][2]
+    stop_at = (index[stop][1], index[stop][2]) if stop < len(index) else None
+    segments = _list_segments(directory)
+    while segments and segment <= segments[-1]:
+        path = os.path.join(directory, f"journal-{segment:06d}.bin")
+        try:
+            with open(path, "rb") as f:
+                f.seek(position * RECORD.size)
+                count = -1
+                if stop_at is not None and stop_at[0] == segment:
+                    count = (stop_at[1] - position) * RECORD.size
+                data = f.read(count)
+        except OSError:
+            data = b""
+        data = data[:len(data) - len(data) % RECORD.size]
+        for offset in range(0, len(data), RECORD.size):
+            timestamp, kind, value, _ = RECORD.unpack_from(data, offset)
+            if start <= timestamp < end and _valid(data, offset):
+                yield timestamp, kind, value
+        if stop_at is not None and stop_at[0] == segment:
+            return
+        segment += 1
+        position = 0
+
+
+def summarize(records, start, end):
+    """Totals for a range: sessions, active time, injections, timers and shutdowns"""
+    summary = {
+        "sessions": 0, "unclean": 0, "active_seconds": 0.0, "injections": 0, "timers": 0,
+        "shutdowns_scheduled": 0, "shutdowns_cancelled": 0, "shutdowns_executed": 0,
+        "first": None, "last": None,
+    }
+    counters = {TIMER: "timers", SHUTDOWN_SCHEDULED: "shutdowns_scheduled",
+                SHUTDOWN_CANCELLED: "shutdowns_cancelled", SHUTDOWN_EXECUTED: "shutdowns_executed"}
+    session_start = None
+    seen = None
+    for timestamp, kind, value in records:
+        if summary["first"] is None:
+            summary["first"] = timestamp
+            # A session that began before the range is counted from the range start
+            if kind != START:
+                session_start = start
+        summary["last"] = timestamp
+        if kind == START:
+            if session_start is not None:
+                # No stop was recorded (crash or power loss): count up to the last sign of life
+                summary["unclean"] += 1
+                summary["active_seconds"] += seen - session_start
+            summary["sessions"] += 1
+            session_start = timestamp
+        elif kind == STOP:
+            if session_start is not None:
+                summary["active_seconds"] += timestamp - session_start
+            session_start = None
+        elif kind == INJECT:
+            summary["injections"] += int(value)
+        elif kind in counters:
+            summary[counters[kind]] += 1
+        seen = timestamp
+    if session_start is not None and seen is not None:
+        summary["active_seconds"] += seen - session_start
+    return summary
+
+
+def format_summary(summary, start, end):
+    hours = summary["active_seconds"] / 3600.0
+    lines = [
+        f"Sessions {date.fromtimestamp(start)} to {date.fromtimestamp(end - 1)}:",
+        f"  Sessions:        {summary['sessions']} ({summary['unclean']} without a clean stop)",
+        f"  Active time:     {hours:.1f} h",
+        f"  Injections:      {summary['injections']}",
+        f"  Timers set:      {summary['timers']}",
+        f"  Shutdowns:       {summary['shutdowns_scheduled']} scheduled, "
+        f"{summary['shutdowns_cancelled']} cancelled, {summary['shutdowns_executed']} executed",
+    ]
+    return "\n".join(lines)
+
+
+def parse_journal_args(argv):
+    """Journal directory from --journal=DIR; None when --no-journal is given"""
+    if "--no-journal" in argv:
+        return None
+    for arg in argv:
+        if arg.startswith("--journal="):
+            return arg.split("=", 1)[1] or default_journal_dir()
+    return default_journal_dir()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    today = date.today()
+    first, last = today - timedelta(days=6), today
+    try:
+        for arg in argv:
+            if arg.startswith("--from="):
+                first = date.fromisoformat(arg.split("=", 1)[1])
+            elif arg.startswith("--to="):
+                last = date.fromisoformat(arg.split("=", 1)[1])
+    except ValueError as e:
+        print(f"Error: {str(e)}")
+        return 1
+    directory = parse_journal_args(argv) or default_journal_dir()
+    start = datetime.combine(first, datetime.min.time()).timestamp()
+    end = datetime.combine(last + timedelta(days=1), datetime.min.time()).timestamp()
+    began = time.perf_counter()
+    summary = summarize(read_range(directory, start, end), start, end)
+    elapsed = time.perf_counter() - began
+    print(format_summary(summary, start, end))
+    print(f"  (queried in {elapsed * 1000.0:.1f} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Startup helpers for the Keep Awake Utility.
+Heavy dependencies are bound with lazy_import and only loaded when a
+feature first touches them; --startup-profile times every first-time
+import from launch until keep-awake is active.
+"""
+
+import builtins
+import importlib
+import sys
+import time
+
+
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+
+def lazy_import(name):
+    """Return the module if it is already loaded, otherwise a proxy that imports on first use"""
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
+
+
+class StartupProfiler:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.records = []
+        self.marks = []
+        self._depth = 0
+        self._original_import = None
+
+    def install(self):
+        """Start timing first-time imports"""
+        if self._original_import is None:
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._import
+
+    def uninstall(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            self._depth -= 1
+            self.records.append((self._depth, name, time.perf_counter() - start))
+
+    def mark(self, label):
+        """Record a milestone relative to process launch"""
+        self.marks.append((label, time.perf_counter() - self.started))
+
+    def report(self, max_depth=1):
+        """Print per-import timings (inclusive of nested imports) and milestones"""
+        print("\nStartup profile")
+        print("=" * 40)
+        for depth, name, elapsed in self.records:
+            if depth <= max_depth:
+                print(f"  {'  ' * depth}{name:<{30 - 2 * depth}} {elapsed * 1000:8.2f} ms")
+        total = sum(elapsed for depth, _, elapsed in self.records if depth == 0)
+        print(f"  {'all imports':<30} {total * 1000:8.2f} ms")
+        for label, elapsed in self.marks:
+            print(f"  {label:<30} {elapsed * 1000:8.2f} ms after launch")
+        print()
+
+
+PROFILER = None
+
+
+def enable_startup_profile(argv):
+    """Install the import profiler when --startup-profile is on the command line"""
+    global PROFILER
+    if PROFILER is None and "--startup-profile" in argv:
+        PROFILER = StartupProfiler()
+        PROFILER.install()
+    return PROFILER
+
+
+def mark_startup(label, report=False):
+    """Record a startup milestone; optionally print the report and stop profiling"""
+    global PROFILER
+    if PROFILER is None:
+        return
+    PROFILER.mark(label)
+    if report:
+        PROFILER.uninstall()
+        PROFILER.report()
+        PROFILER = None
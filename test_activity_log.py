@@ -0,0 +1,67 @@
+import threading
+import unittest
+
+from activity_log import ActivityLog
+from clock import VirtualClock
+from input_inject import KEY, MOUSE
+
+
+class TestActivityLog(unittest.TestCase):
+    def test_ring_keeps_the_latest_records(self):
+        """Old records are overwritten in place once the ring is full"""
+        log = ActivityLog(capacity=4, clock=VirtualClock())
+        for i in range(10):
+            log.append(MOUSE, i, -i, at=float(i))
+        self.assertEqual(len(log), 4)
+        self.assertEqual(log.recent(2), [(8.0, MOUSE, 8, -8), (9.0, MOUSE, 9, -9)])
+        self.assertEqual([record[0] for record in log.recent(10)], [6.0, 7.0, 8.0, 9.0])
+
+    def test_slot_being_rewritten_is_skipped(self):
+        """Reading the whole ring mid-append never returns the oldest slot the writer is rewriting"""
+        log = ActivityLog(capacity=4, clock=VirtualClock())
+        for i in range(4):
+            log.append(MOUSE, i, -i, at=float(i))
+        seen = []
+        log.clock = lambda: seen.append(log.recent(4)) or 4.0
+        log.append(KEY)
+        self.assertEqual([record[0] for record in seen[0]], [1.0, 2.0, 3.0])
+        self.assertEqual([record[0] for record in log.recent(4)], [1.0, 2.0, 3.0, 4.0])
+
+    def test_formatting_happens_on_read(self):
+        clock = VirtualClock(start=100.0, wall_start=0.0)
+        log = ActivityLog(clock=clock)
+        log.append(MOUSE, 3, -2)
+        log.append(KEY)
+        lines = log.formatted()
+        self.assertTrue(lines[0].endswith("Mouse moved by (3, -2) pixels"))
+        self.assertTrue(lines[1].endswith("Pressed 'Shift' key"))
+        self.assertTrue(lines[0].startswith("["))
+
+    def test_reads_while_writing(self):
+        """Readers see whole records in order while the writer laps the ring"""
+        print("\n📝 Reading the activity log during writes...")
+        log = ActivityLog(capacity=16, clock=VirtualClock())
+        done = threading.Event()
+
+        def writer():
+            for i in range(20000):
+                log.append(MOUSE if i % 2 else KEY, i % 100, i % 100, at=float(i))
+            done.set()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        while not done.is_set():
+            for n in (8, 16):
+                records = log.recent(n)
+                times = [record[0] for record in records]
+                self.assertEqual(times, sorted(times))
+                for at, action, dx, dy in records:
+                    self.assertEqual(action, MOUSE if int(at) % 2 else KEY)
+                    self.assertEqual((dx, dy), (int(at) % 100, int(at) % 100))
+        thread.join()
+        self.assertEqual(log.recent(1)[0][0], 19999.0)
+        print("✅ No torn records seen.")
+
+
+if __name__ == "__main__":
+    unittest.main()
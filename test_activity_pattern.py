@@ -0,0 +1,96 @@
+import random
+import unittest
+
+from activity_pattern import ActivityPattern, ActivityRunner, parse_pattern_args
+from clock import VirtualClock
+from input_inject import KEY, MOUSE
+from scheduler import Scheduler
+
+
+class TestActivityPattern(unittest.TestCase):
+    def test_batches_respect_type_and_jitter_bounds(self):
+        rng = random.Random(1)
+        gaps, actions = ActivityPattern("keyboard", 10, "uniform", 0.2).batch(rng)
+        self.assertEqual(set(actions), {KEY})
+        self.assertTrue(all(8.0 <= gap <= 12.0 for gap in gaps))
+        self.assertGreater(len(set(gaps)), 1)
+        gaps, _ = ActivityPattern("mouse", 10, "exponential").batch(rng, 500)
+        self.assertLessEqual(max(gaps), ActivityPattern("mouse", 10, "exponential").max_gap())
+        self.assertGreaterEqual(min(gaps), 0.5)
+
+    def test_parse_pattern_args(self):
+        pattern = parse_pattern_args(["--activity=mouse", "--interval=3", "--jitter=gaussian:0.1"])
+        self.assertEqual((pattern.kind, pattern.interval, pattern.jitter, pattern.spread),
+                         ("mouse", 3.0, "gaussian", 0.1))
+        self.assertEqual(parse_pattern_args(["--activity=telepathy"]).kind, "both")
+
+
+class TestActivityRunner(unittest.TestCase):
+    def setUp(self):
+        self.clock = VirtualClock()
+        self.scheduler = Scheduler(self.clock)
+        self.scheduler.start()
+        self.injected = []
+
+    def tearDown(self):
+        self.scheduler.stop()
+
+    def inject(self, action):
+        self.injected.append((self.clock(), action))
+
+    def test_injections_land_on_precomputed_deadlines(self):
+        """Each injection fires at the sum of the precomputed gaps, without drift"""
+        runner = ActivityRunner(self.scheduler, ActivityPattern("both", 6, "uniform"), self.inject, seed=7)
+        runner.start()
+        gaps = list(runner._gaps)
+        actions = list(runner._actions)
+        self.clock.advance(sum(gaps[1:10]))
+        expected = [sum(gaps[1:i + 1]) for i in range(10)]
+        self.assertEqual([round(t, 6) for t, _ in self.injected], [round(t, 6) for t in expected])
+        self.assertEqual([action for _, action in self.injected], actions[:10])
+        # One pending job at a time, however many injections are planned
+        self.assertEqual(self.scheduler.pending(), 1)
+
+    def test_pattern_switch_applies_at_runtime(self):
+        """A new pattern takes over at the next injection without restarting anything"""
+        print("\n🎛️ Switching activity pattern while running...")
+        runner = ActivityRunner(self.scheduler, ActivityPattern("mouse", 6), self.inject)
+        runner.start()
+        self.clock.advance(12)
+        self.assertEqual(len(self.injected), 3)
+        runner.set_pattern(ActivityPattern("keyboard", 30))
+        self.clock.advance(60)
+        self.assertEqual(self.injected[3:], [(42.0, KEY), (72.0, KEY)])
+        self.assertEqual({action for _, action in self.injected[:3]}, {MOUSE})
+        self.assertEqual(self.scheduler.pending(), 1)
+        runner.stop()
+        self.clock.advance(600)
+        self.assertEqual(len(self.injected), 5)
+        print("✅ Pattern switched in place.")
+
+    def test_stale_tick_does_not_fork_the_chain(self):
+        """A tick that lost the race with set_pattern or stop/start is dropped, not armed again"""
+        runner = ActivityRunner(self.scheduler, ActivityPattern("mouse", 6), self.inject)
+        runner.start()
+        stale = runner._generation
+        runner.set_pattern(ActivityPattern("mouse", 10))
+        # As if the old job had been popped before the switch and only now got the lock
+        runner._tick(stale)
+        runner.stop()
+        runner.start(first_delay=10)
+        runner._tick(stale)
+        self.assertEqual(self.injected, [])
+        self.clock.advance(30)
+        self.assertEqual(len(self.injected), 3)
+        self.assertEqual(self.scheduler.pending(), 1)
+
+    def test_batches_are_refilled(self):
+        runner = ActivityRunner(self.scheduler, ActivityPattern("both", 1), self.inject)
+        runner.start()
+        self.clock.advance(200)
+        self.assertEqual(len(self.injected), 201)
+        self.assertGreaterEqual(runner.batches, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest import mock
+
+import console_keep_awake
+from async_runtime import AsyncConsoleRuntime, AsyncScheduler, parse_runtime_arg
+from clock import VirtualClock
+from console_keep_awake import KeepAwakeConsoleApp
+
+
+class TestAsyncScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = AsyncScheduler()
+        self.scheduler.start()
+        self.loop = self.scheduler.loop
+
+    def tearDown(self):
+        self.scheduler.stop()
+        self.loop.close()
+
+    def run_for(self, seconds):
+        self.loop.run_until_complete(asyncio.sleep(seconds))
+
+    def test_jobs_fire_in_deadline_order(self):
+        """One-shot and repeating jobs run on the loop thread in deadline order"""
+        fired = []
+        self.scheduler.call_later(0.03, fired.append, "late")
+        self.scheduler.call_later(0.01, fired.append, "early")
+        job = self.scheduler.call_every(0.02, fired.append, "tick", first_delay=0)
+        self.run_for(0.065)
+        job.cancel()
+        self.assertEqual(fired[:3], ["tick", "early", "tick"])
+        self.assertIn("late", fired)
+        self.assertEqual(fired.count("tick"), 4)
+        self.assertEqual(self.scheduler.pending(), 0)
+
+    def test_cancel_drops_the_handle(self):
+        fired = []
+        job = self.scheduler.call_later(0.01, fired.append, 1)
+        job.cancel()
+        self.assertTrue(job.handle.cancelled())
+        self.run_for(0.03)
+        self.assertEqual(fired, [])
+
+    def test_push_from_another_thread(self):
+        """Jobs added by helper threads are handed to the loop"""
+        fired = []
+        pusher = threading.Thread(target=self.scheduler.call_later, args=(0, fired.append, threading.get_ident()))
+        pusher.start()
+        pusher.join()
+        self.run_for(0.02)
+        self.assertEqual(fired, [threading.get_ident()])
+
+    def test_rejects_virtual_clock(self):
+        with self.assertRaises(ValueError):
+            AsyncScheduler(clock=VirtualClock())
+
+    def test_parse_runtime(self):
+        self.assertEqual(parse_runtime_arg([]), "threads")
+        self.assertEqual(parse_runtime_arg(["--runtime=asyncio"]), "asyncio")
+        self.assertEqual(parse_runtime_arg(["--runtime=trio"]), "threads")
+
+
+class TestAsyncConsoleRuntime(unittest.TestCase):
+    def make_app(self):
+        self.shutdowns = []
+        app = KeepAwakeConsoleApp(shutdown_runner=self.shutdowns.append, scheduler=AsyncScheduler())
+        app.inhibit_preference = "input"
+        app.idle_threshold = 0
+        return app
+
+    def test_commands_run_on_one_thread(self):
+        """Commands and scheduled activity share the main thread"""
+        print("\n🔁 Running console commands on the asyncio loop...")
+        app = self.make_app()
+        threads = set()
+        original = app.simulate_activity
+
+        def simulate(*args):
+            threads.add(threading.get_ident())
+            original(*args)
+
+        app.activity.inject = simulate
+        runtime = AsyncConsoleRuntime(app, ["start", "timer", "2", "status", "stop", "exit"])
+        runtime.run()
+        self.assertEqual(runtime.commands, 5)
+        self.assertEqual(threads, {threading.get_ident()})
+        self.assertFalse(app.active)
+        self.assertFalse(app.timer_active)
+        self.assertEqual(app.scheduler.pending(), 0)
+        self.assertTrue(runtime.loop.is_closed())
+        print("✅ Commands handled on the loop.")
+
+    def test_cancel_during_grace_period(self):
+        """cancel drops the pending shutdown before the grace period runs out"""
+        app = self.make_app()
+        with mock.patch.object(console_keep_awake, "SHUTDOWN_GRACE_PERIOD", 0.05):
+            app.start_keep_awake()
+            app.schedule_shutdown()
+            job = app.shutdown_job
+            runtime = AsyncConsoleRuntime(app, ["cancel"])
+            started = time.monotonic()
+            runtime.run()
+        self.assertTrue(job.handle.cancelled())
+        self.assertLess(time.monotonic() - started, 0.05)
+        self.assertFalse(app.shutdown_scheduled)
+        self.assertEqual(self.shutdowns, [])
+
+    def test_grace_period_runs_out(self):
+        app = self.make_app()
+        with mock.patch.object(console_keep_awake, "SHUTDOWN_GRACE_PERIOD", 0.02):
+            app.start_keep_awake()
+            app.schedule_shutdown()
+            runtime = AsyncConsoleRuntime(app, [])
+            app.scheduler.call_later(0.05, runtime.request_exit)
+            runtime.run(interactive=False)
+        self.assertEqual(len(self.shutdowns), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import json
+import os
+import tempfile
+import unittest
+
+import benchmark_idle
+
+
+class TestBenchmarkIdle(unittest.TestCase):
+    @unittest.skipUnless(os.path.exists("/proc/self/status") or benchmark_idle.importlib.util.find_spec("psutil"),
+                         "no way to measure a child process")
+    def test_console_mode_is_measured(self):
+        """A short run reports every metric for the console engine"""
+        print("\n⏱️ Benchmarking the console engine for one second...")
+        result = benchmark_idle.run_mode("console", duration=1)
+        self.assertNotIn("error", result, result.get("output"))
+        for key in benchmark_idle.COMPARED + ["cpu_seconds", "threads"]:
+            self.assertIn(key, result)
+        self.assertGreater(result["peak_rss_bytes"], 0)
+        self.assertGreaterEqual(result["peak_threads"], 1)
+        print(f"✅ Active after {result['startup_ms']:.0f} ms, CPU {result['cpu_percent']:.2f}%.")
+
+    def test_results_file_and_compare(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "after.json")
+            baseline = os.path.join(tmp, "before.json")
+            with open(baseline, "w") as f:
+                json.dump({"modes": {"console": {"startup_ms": 100.0, "cpu_percent": 0.0}}}, f)
+            old_run_mode = benchmark_idle.run_mode
+            fake = {"mode": "console", "startup_ms": 80.0, "peak_threads": 2, "wakeups_per_second": 0.5,
+                    "context_switches_per_second": 1.0, "cpu_percent": 0.5, "peak_rss_bytes": 16 << 20}
+            benchmark_idle.run_mode = lambda name, duration: fake
+            try:
+                code = benchmark_idle.main(["--modes=console", "--duration=1", f"--output={output}",
+                                            f"--compare={baseline}"])
+            finally:
+                benchmark_idle.run_mode = old_run_mode
+            self.assertEqual(code, 0)
+            with open(output) as f:
+                results = json.load(f)
+            self.assertEqual(results["modes"]["console"]["startup_ms"], 80.0)
+            lines = benchmark_idle.compare({"modes": {"console": {"startup_ms": 100.0}}}, results)
+            self.assertIn("-20.0%", lines[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
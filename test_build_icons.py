@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+import build_icons
+import icon_cache
+from build_icons import COUNTDOWN_FRAMES, PULSE_FRAMES, build_bundle
+from icon_cache import IconCache, load_bundle
+
+
+class TestBuildIcons(unittest.TestCase):
+    def setUp(self):
+        self.base = tempfile.mkdtemp()
+        self.output = os.path.join(self.base, "icon-bundle")
+        self.write_source("awake_icon.png", (30, 120, 220, 255))
+        self.write_source("sleep_icon.png", (90, 90, 90, 255))
+        # Loading checks the renderer too; pin it to match the builds below
+        patcher = mock.patch.object(icon_cache, "renderer_kind", lambda recorded="png": "png")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.base, ignore_errors=True)
+
+    def write_source(self, name, color, size=256):
+        Image.new("RGBA", (size, size), color).save(os.path.join(self.base, name))
+
+    def build(self, **kwargs):
+        # Pin the PNG renderer so results do not depend on cairosvg being installed
+        original = build_icons._renderer
+        build_icons._renderer = lambda: ("png", None)
+        try:
+            return build_bundle(self.base, self.output, **kwargs)
+        finally:
+            build_icons._renderer = original
+
+    def test_rebuilds_only_when_sources_change(self):
+        """A second build is a no-op; editing a source produces a new bundle and retires the old one"""
+        print("\n🎨 Building an icon bundle from synthetic sources...")
+        index, rebuilt = self.build()
+        self.assertTrue(rebuilt)
+        self.assertIsNotNone(load_bundle(self.output, self.base))
+        again, rebuilt = self.build()
+        self.assertFalse(rebuilt)
+        self.assertEqual(again["bundle"], index["bundle"])
+
+        self.write_source("awake_icon.png", (200, 40, 40, 255))
+        self.assertIsNone(load_bundle(self.output, self.base))
+        changed, rebuilt = self.build()
+        self.assertTrue(rebuilt)
+        self.assertNotEqual(changed["bundle"], index["bundle"])
+        self.assertEqual([name for name in os.listdir(self.output) if name.endswith(".bin")], [changed["bundle"]])
+        print("✅ Bundle rebuilt only on change.")
+
+    def test_touched_source_keeps_the_bundle(self):
+        """Same bytes under a new mtime (a fresh checkout, say) keep the bundle"""
+        self.build()
+        path = os.path.join(self.base, "sleep_icon.png")
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertIsNotNone(load_bundle(self.output, self.base))
+        _, rebuilt = self.build()
+        self.assertFalse(rebuilt)
+
+    def test_same_size_edit_under_the_old_mtime_is_stale(self):
+        """Freshness compares source hashes, so size and mtime alone cannot vouch for a bundle"""
+        self.build()
+        path = os.path.join(self.base, "sleep_icon.png")
+        stat = os.stat(path)
+        with open(path, "r+b") as f:
+            f.seek(-1, os.SEEK_END)
+            last = f.read(1)
+            f.seek(-1, os.SEEK_END)
+            f.write(bytes([last[0] ^ 0xFF]))
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(os.path.getsize(path), stat.st_size)
+        self.assertIsNone(load_bundle(self.output, self.base))
+
+    def test_renderer_change_makes_the_bundle_stale(self):
+        """A PNG-rendered bundle is stale once cairosvg could render the SVGs instead"""
+        self.build()
+        with mock.patch.object(icon_cache, "renderer_kind", lambda recorded="png": "cairosvg"):
+            self.assertIsNone(load_bundle(self.output, self.base))
+        self.assertIsNotNone(load_bundle(self.output, self.base))
+
+    def test_cache_serves_from_bundle(self):
+        """Icons and frames come from the bundle even when the PNGs are gone"""
+        self.build()
+        bundle = load_bundle(self.output, self.base)
+        cache = IconCache({True: "awake_icon.png", False: "sleep_icon.png"}, fallback_path=None, bundle=bundle)
+        for name in ("awake_icon.png", "sleep_icon.png"):
+            os.remove(os.path.join(self.base, name))
+        self.assertEqual(cache.get(True).getpixel((32, 32)), (30, 120, 220, 255))
+        self.assertEqual(cache.get(False, 16).size, (16, 16))
+        self.assertEqual(cache.frame_count(True, "pulse"), PULSE_FRAMES)
+        self.assertEqual(cache.frame_count(True, "countdown"), COUNTDOWN_FRAMES)
+        self.assertEqual(cache.frame_count(False, "pulse"), 0)
+
+        # The pulse dims and comes back; frame indexes wrap around the strip
+        dim = cache.frame(True, "pulse", PULSE_FRAMES // 2)
+        self.assertLess(dim.getpixel((32, 32))[3], 255)
+        self.assertIs(cache.frame(True, "pulse", PULSE_FRAMES), cache.frame(True, "pulse", 0))
+        # A full countdown ring covers the top edge, an empty one only its faint track
+        full = cache.frame(True, "countdown", COUNTDOWN_FRAMES - 1, 24)
+        empty = cache.frame(True, "countdown", 0, 24)
+        self.assertEqual(full.size, (24, 24))
+        self.assertGreater(full.getpixel((12, 1))[0], empty.getpixel((12, 1))[0])
+        self.assertGreater(cache.stats()["bytes"], 0)
+
+    def test_corrupt_bundle_is_ignored(self):
+        index, _ = self.build()
+        with open(os.path.join(self.output, index["bundle"]), "wb") as f:
+            f.write(b"not a bundle")
+        self.assertIsNone(load_bundle(self.output, self.base))
+
+
+if __name__ == "__main__":
+    unittest.main()
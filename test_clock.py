@@ -0,0 +1,81 @@
+import time
+import unittest
+
+from clock import VirtualClock
+from idle_detect import IdleGate, IdleSource
+from scheduler import Scheduler
+
+
+class TestVirtualClock(unittest.TestCase):
+    def test_advance_fires_jobs_in_deadline_order(self):
+        """Jobs run at their own deadlines while the clock is advanced"""
+        clock = VirtualClock()
+        scheduler = Scheduler(clock)
+        scheduler.start()
+        seen = []
+        scheduler.call_every(10, lambda: seen.append(("tick", clock())))
+        scheduler.call_later(25, lambda: seen.append(("once", clock())))
+        clock.advance(30)
+        self.assertEqual(seen, [("tick", 10.0), ("tick", 20.0), ("once", 25.0), ("tick", 30.0)])
+        self.assertEqual(clock(), 30.0)
+        self.assertEqual(scheduler.drift_stats()["max_drift_ms"], 0.0)
+        scheduler.stop()
+        clock.advance(100)
+        self.assertEqual(len(seen), 4)
+
+    def test_clock_cannot_go_backwards(self):
+        with self.assertRaises(ValueError):
+            VirtualClock().advance(-1)
+
+
+class TestFastForwardShutdown(unittest.TestCase):
+    def setUp(self):
+        from console_keep_awake import KeepAwakeConsoleApp
+
+        self.clock = VirtualClock(wall_start=0.0)
+        self.commands = []
+        self.app = KeepAwakeConsoleApp(clock=self.clock, shutdown_runner=self.commands.append)
+        self.app.inhibit_preference = "input"
+        # Unknown idle time: every activity tick injects
+        self.app.idle_gate = IdleGate(IdleSource(), margin=6)
+
+    def tearDown(self):
+        self.app.shutdown()
+
+    def test_ten_hour_timer_warning_cancel_and_expiry(self):
+        """A full 10-hour countdown, warning, cancel and expiry run in milliseconds"""
+        print("\n⏩ Fast-forwarding a 10 hour timer...")
+        started = time.perf_counter()
+        app = self.app
+        app.current_timer = "10 hours"
+        app.start_keep_awake()
+
+        self.clock.advance(10 * 3600 - 1)
+        self.assertTrue(app.timer_active)
+        self.assertFalse(app.shutdown_scheduled)
+        self.assertEqual(app.update_remaining_time(), 1)
+
+        # Expiry shows the warning and starts the grace period
+        self.clock.advance(1)
+        self.assertTrue(app.shutdown_scheduled)
+        self.clock.advance(30)
+        app.cancel_shutdown()
+        self.clock.advance(120)
+        self.assertFalse(app.shutdown_scheduled)
+        # Only the Windows abort command may have run
+        self.assertEqual([c for c in self.commands if c != ["shutdown", "/a"]], [])
+        self.commands.clear()
+        self.assertGreater(app.idle_gate.injected, 6000)
+
+        # Second run is left to expire
+        app.current_timer = "1 hour"
+        app.check_timer_selection()
+        self.clock.advance(3600 + 60)
+        self.assertEqual(len(self.commands), 1)
+        self.assertIn(self.commands[0], (["shutdown", "-h", "now"], ["shutdown", "/s", "/t", "0"]))
+        self.assertLess(time.perf_counter() - started, 2.0)
+        print(f"✅ Simulated 11 hours in {(time.perf_counter() - started) * 1000.0:.0f} ms.")
+
+
+if __name__ == "__main__":
+    unittest.main()
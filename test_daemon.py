@@ -0,0 +1,161 @@
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+
+from control_socket import ControlClient, ControlError, ControlServer, format_response
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "unix domain sockets are required")
+class TestKeepAwakeDaemon(unittest.TestCase):
+    def setUp(self):
+        from console_keep_awake import KeepAwakeConsoleApp
+        from keep_awake_daemon import KeepAwakeDaemon
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "keep-awake.sock")
+        self.app = KeepAwakeConsoleApp()
+        self.app.inhibit_preference = "input"
+        self.daemon = KeepAwakeDaemon(self.app, self.path)
+        self.daemon.server.start()
+
+    def tearDown(self):
+        self.daemon.server.stop()
+        if self.app.active:
+            self.app.stop_keep_awake()
+        self.app.scheduler.stop()
+        self.tmp.cleanup()
+
+    def test_start_timer_status_cancel(self):
+        """The control commands drive the engine"""
+        print("\n🔌 Driving the daemon over its control socket...")
+        with ControlClient(self.path) as client:
+            self.assertEqual(client.call("status")["active"], "0")
+            self.assertEqual(client.call("start")["active"], "1")
+            fields = client.call("timer", 2)
+            self.assertEqual(fields["timer"], "2")
+            self.assertEqual(fields["remaining"], "7200")
+            self.assertEqual(client.call("cancel")["timer"], "0")
+            self.assertEqual(client.call("stop")["active"], "0")
+            with self.assertRaises(ControlError):
+                client.call("timer", 3)
+            with self.assertRaises(ControlError):
+                client.call("bogus")
+        print("✅ Daemon commands work.")
+
+    def test_concurrent_clients_are_fast(self):
+        """Many clients can query status at once with sub-millisecond latency"""
+        self.assertLess(self.status_latencies(), 0.001)
+
+    def test_status_does_not_wait_for_a_busy_scheduler(self):
+        """status and ping are answered while a long job holds the scheduler thread"""
+        running = threading.Event()
+        release = threading.Event()
+        self.app.scheduler.call_later(0, lambda: running.set() or release.wait(5))
+        self.assertTrue(running.wait(2))
+        try:
+            with ControlClient(self.path) as client:
+                start = time.perf_counter()
+                client.call("ping")
+                self.assertLess(time.perf_counter() - start, 0.05)
+            self.assertLess(self.status_latencies(), 0.001)
+        finally:
+            release.set()
+
+    def status_latencies(self):
+        """Median status latency over 8 clients x 50 requests"""
+        latencies = []
+        errors = []
+
+        def worker():
+            try:
+                with ControlClient(self.path) as client:
+                    for _ in range(50):
+                        start = time.perf_counter()
+                        client.call("status")
+                        latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        self.assertEqual(errors, [])
+        self.assertEqual(len(latencies), 400)
+        latencies.sort()
+        return latencies[len(latencies) // 2]
+
+    def test_pipelined_requests(self):
+        """Several requests in one write get one response line each"""
+        with ControlClient(self.path) as client:
+            client.sock.sendall(b"ping\nstatus\nping\n")
+            data = b""
+            while data.count(b"\n") < 3:
+                data += client.sock.recv(4096)
+        lines = data.decode().splitlines()
+        self.assertEqual(lines[0], "OK pong=1")
+        self.assertTrue(lines[1].startswith("OK active=0"))
+        self.assertEqual(lines[2], "OK pong=1")
+
+    def test_handlers_run_on_the_scheduler_thread(self):
+        """Commands change engine state on the app's scheduler thread, not the control thread"""
+        ran_on = []
+        self.daemon.commands["where"] = lambda args: ran_on.append(threading.current_thread()) or format_response(True)
+        with ControlClient(self.path) as client:
+            client.call("where")
+        self.assertEqual(ran_on, [self.app.scheduler._thread])
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX"), "unix domain sockets are required")
+class TestControlServer(unittest.TestCase):
+    def test_stale_socket_is_replaced(self):
+        """A socket file left by a dead process does not block startup"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "stale.sock")
+            dead = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            dead.bind(path)
+            dead.close()
+            server = ControlServer(path, lambda command, args: format_response(True, {"cmd": command}))
+            server.start()
+            try:
+                with ControlClient(path) as client:
+                    self.assertEqual(client.call("hello"), {"cmd": "hello"})
+                with self.assertRaises(ControlError):
+                    ControlServer(path, lambda command, args: "").bind()
+            finally:
+                server.stop()
+            self.assertFalse(os.path.exists(path))
+
+    def test_client_that_stops_reading_does_not_stall_others(self):
+        """Replies queue per connection; a client that never reads leaves the rest served and stop() prompt"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "slow.sock")
+            server = ControlServer(path, lambda command, args: format_response(True, {"cmd": command}))
+            server.start()
+            stuck = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                stuck.connect(path)
+                stuck.setblocking(False)
+                # Keep writing requests until the server stops taking them, never reading a reply
+                deadline = time.monotonic() + 1.0
+                while time.monotonic() < deadline:
+                    try:
+                        stuck.send(b"ping\n" * 1024)
+                    except BlockingIOError:
+                        time.sleep(0.01)
+                with ControlClient(path, timeout=1.0) as client:
+                    self.assertEqual(client.call("status"), {"cmd": "status"})
+                start = time.monotonic()
+                server.stop()
+                self.assertLess(time.monotonic() - start, 1.0)
+            finally:
+                stuck.close()
+                server.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+
+from idle_detect import IdleGate, IdleSource, InterruptIdleSource
+
+INTERRUPTS = """           CPU0       CPU1
+  1:      {kbd}          0   IO-APIC    1-edge      i8042
+ 12:      {mouse}        3   IO-APIC   12-edge      i8042
+ 16:      9999        8888   IO-APIC   16-fasteoi   ehci_hcd:usb1
+LOC:    123456      654321   Local timer interrupts
+"""
+
+
+class FixedIdleSource(IdleSource):
+    name = "fixed"
+
+    def __init__(self, idle):
+        self.idle = idle
+
+    def idle_seconds(self):
+        return self.idle
+
+
+class TestInterruptIdleSource(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "interrupts")
+        self.now = 100.0
+        self._write(10, 20)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, kbd, mouse):
+        with open(self.path, "w") as f:
+            f.write(INTERRUPTS.format(kbd=kbd, mouse=mouse))
+
+    def test_idle_grows_until_input_counters_change(self):
+        """Only keyboard/mouse interrupt lines reset the idle time"""
+        source = InterruptIdleSource(self.path, clock=lambda: self.now)
+        self.now += 30
+        self.assertEqual(source.idle_seconds(), 30)
+        self._write(11, 20)
+        self.now += 5
+        self.assertEqual(source.idle_seconds(), 0)
+        self.now += 12
+        self.assertEqual(source.idle_seconds(), 12)
+
+    def test_missing_input_lines_raise(self):
+        """A file without input IRQs is not a usable source"""
+        with open(self.path, "w") as f:
+            f.write("LOC: 1 2 Local timer interrupts\n")
+        with self.assertRaises(OSError):
+            InterruptIdleSource(self.path)
+
+
+class TestIdleGate(unittest.TestCase):
+    def test_counts_injected_and_skipped_ticks(self):
+        """Ticks are skipped while the user is active"""
+        print("\n⌨️ Checking idle-aware injection counters...")
+        source = FixedIdleSource(5)
+        gate = IdleGate(source, threshold=60, margin=6)
+        self.assertFalse(gate.should_inject())
+        source.idle = 54
+        self.assertTrue(gate.should_inject())
+        source.idle = None
+        self.assertTrue(gate.should_inject())
+        self.assertEqual((gate.injected, gate.skipped), (2, 1))
+        self.assertIn("2 injected / 1 skipped", gate.summary())
+        print("✅ Injected vs skipped ticks counted.")
+
+    def test_zero_threshold_always_injects(self):
+        """A threshold of 0 restores the old always-inject behaviour"""
+        gate = IdleGate(FixedIdleSource(0), threshold=0)
+        self.assertTrue(gate.should_inject())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,186 @@
+import os
+import select
+import socket
+import stat
+import sys
+import tempfile
+import threading
+import unittest
+
+import dbus_wire
+from inhibitor import (InputInjectionInhibitor, InhibitorError, LogindInhibitor,
+                       SystemdInhibitInhibitor, acquire_inhibitor)
+
+
+class FakeLogind:
+    """A tiny bus endpoint that answers Hello and logind's Inhibit over a unix socket"""
+
+    def __init__(self, path, refuse=False):
+        self.path = path
+        self.refuse = refuse
+        self.calls = []
+        self.lock_readers = []
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(path)
+        self.server.listen(1)
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    @property
+    def address(self):
+        return f"unix:path={self.path}"
+
+    def serve(self):
+        conn, _ = self.server.accept()
+        with conn:
+            buffer = bytearray()
+            authenticated = False
+            while not authenticated:
+                if b"\r\n" not in buffer:
+                    chunk = conn.recv(4096)
+                    if not chunk:
+                        return
+                    buffer.extend(chunk)
+                    continue
+                line, _, rest = bytes(buffer).partition(b"\r\n")
+                buffer = bytearray(rest)
+                line = line.lstrip(b"\0")
+                if line.startswith(b"AUTH EXTERNAL"):
+                    conn.sendall(b"OK 0123456789abcdef0123456789abcdef\r\n")
+                elif line == b"NEGOTIATE_UNIX_FD":
+                    conn.sendall(b"AGREE_UNIX_FD\r\n")
+                elif line == b"BEGIN":
+                    authenticated = True
+            serial = 0
+            while True:
+                message, size = dbus_wire.parse_message(buffer)
+                if message is None:
+                    chunk = conn.recv(4096)
+                    if not chunk:
+                        return
+                    buffer.extend(chunk)
+                    continue
+                del buffer[:size]
+                serial += 1
+                self.calls.append((message.member, message.body))
+                reply_fields = {dbus_wire.FIELD_REPLY_SERIAL: message.serial}
+                if message.member == "Hello":
+                    conn.sendall(dbus_wire.build_message(dbus_wire.METHOD_RETURN, serial,
+                                                         reply_fields, "s", [":1.42"]))
+                elif message.member == "Inhibit" and self.refuse:
+                    reply_fields[dbus_wire.FIELD_ERROR_NAME] = "org.freedesktop.DBus.Error.AccessDenied"
+                    conn.sendall(dbus_wire.build_message(dbus_wire.ERROR, serial,
+                                                         reply_fields, "s", ["Permission denied"]))
+                elif message.member == "Inhibit":
+                    reader, writer = os.pipe()
+                    self.lock_readers.append(reader)
+                    data = dbus_wire.build_message(dbus_wire.METHOD_RETURN, serial,
+                                                   reply_fields, "h", [0], fds=1)
+                    dbus_wire.send_with_fds(conn, data, [writer])
+                    os.close(writer)
+
+    def close(self):
+        self.server.close()
+        for fd in self.lock_readers:
+            os.close(fd)
+
+
+@unittest.skipUnless(hasattr(socket, "AF_UNIX") and hasattr(socket.socket, "sendmsg"),
+                     "unix sockets with fd passing are required")
+class TestLogindInhibitor(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmp.name, "bus")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_lock_held_until_release(self):
+        """The inhibitor fd stays open while held and is closed on release"""
+        print("\n🔒 Taking a logind inhibitor lock from a fake bus...")
+        fake = FakeLogind(self.socket_path)
+        try:
+            backend = LogindInhibitor(bus_address=fake.address)
+            backend.acquire()
+            self.assertTrue(backend.held)
+            self.assertFalse(backend.requires_input)
+            self.assertEqual(fake.calls[0][0], "Hello")
+            self.assertEqual(fake.calls[1], ("Inhibit", ["sleep:idle", "Keep Awake Utility",
+                                                         "Keeping the PC awake", "block"]))
+            reader = fake.lock_readers[0]
+            readable, _, _ = select.select([reader], [], [], 0.05)
+            self.assertEqual(readable, [], "lock was released too early")
+
+            backend.release()
+            readable, _, _ = select.select([reader], [], [], 1)
+            self.assertEqual(readable, [reader])
+            self.assertEqual(os.read(reader, 1), b"")
+            self.assertFalse(backend.held)
+        finally:
+            fake.close()
+        print("✅ Lock held while active and released on stop.")
+
+    def test_refused_lock_raises(self):
+        """An error reply from logind surfaces as InhibitorError"""
+        fake = FakeLogind(self.socket_path, refuse=True)
+        try:
+            backend = LogindInhibitor(bus_address=fake.address)
+            with self.assertRaises(InhibitorError):
+                backend.acquire()
+            self.assertFalse(backend.held)
+        finally:
+            fake.close()
+
+    def test_missing_bus_raises(self):
+        """No bus at the address is reported, not crashed on"""
+        backend = LogindInhibitor(bus_address=f"unix:path={self.socket_path}")
+        with self.assertRaises(InhibitorError):
+            backend.acquire()
+
+
+@unittest.skipIf(sys.platform == "win32", "uses a POSIX shell script")
+class TestSystemdInhibitInhibitor(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _script(self, body):
+        path = os.path.join(self.tmp.name, "systemd-inhibit")
+        with open(path, "w") as f:
+            f.write("#!/bin/sh\n" + body)
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+        return path
+
+    def test_child_runs_until_release(self):
+        """The wrapped child blocks on stdin and exits once released"""
+        marker = os.path.join(self.tmp.name, "released")
+        script = self._script(f'shift 4\n"$@"\ntouch "{marker}"\n')
+        backend = SystemdInhibitInhibitor(command=script)
+        backend.acquire()
+        self.assertTrue(backend.held)
+        self.assertFalse(os.path.exists(marker))
+        backend.release()
+        self.assertTrue(os.path.exists(marker))
+
+    def test_refusal_is_reported(self):
+        """A systemd-inhibit that exits immediately raises InhibitorError"""
+        script = self._script('echo "Failed to inhibit: Access denied" >&2\nexit 1\n')
+        backend = SystemdInhibitInhibitor(command=script)
+        with self.assertRaises(InhibitorError) as ctx:
+            backend.acquire()
+        self.assertIn("Access denied", str(ctx.exception))
+
+
+class TestBackendSelection(unittest.TestCase):
+    def test_falls_back_to_input(self):
+        """Unknown or failing backends fall back to input injection"""
+        backend = acquire_inhibitor("no-such-backend")
+        self.assertIsInstance(backend, InputInjectionInhibitor)
+        self.assertTrue(backend.requires_input)
+        self.assertTrue(backend.held)
+
+
+if __name__ == "__main__":
+    unittest.main()
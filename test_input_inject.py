@@ -0,0 +1,35 @@
+import subprocess
+import sys
+import unittest
+
+from input_inject import KEY, MOUSE, NullInjector, create_injector
+
+
+class TestInputInjection(unittest.TestCase):
+    def test_latency_is_recorded_per_injection(self):
+        """Every injection is counted and timed"""
+        injector = create_injector("null")
+        self.assertIsInstance(injector, NullInjector)
+        injector.inject(MOUSE)
+        injector.inject(KEY)
+        injector.inject(KEY)
+        stats = injector.latency_stats()
+        self.assertEqual(stats["count"], 3)
+        self.assertEqual(injector.counts, {MOUSE: 1, KEY: 2})
+        self.assertGreaterEqual(stats["max_us"], stats["min_us"])
+        self.assertIn("null: 3 injections", injector.summary())
+
+    def test_unknown_backend_is_an_error(self):
+        """Asking for a backend that does not exist fails clearly"""
+        with self.assertRaises(RuntimeError):
+            create_injector("no-such-backend")
+
+    def test_module_does_not_import_pyautogui(self):
+        """The native backends never pull in pyautogui"""
+        code = "import sys, input_inject; input_inject.create_injector('null'); print('pyautogui' in sys.modules)"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        self.assertEqual(result.stdout.strip(), "False")
+
+
+if __name__ == "__main__":
+    unittest.main()
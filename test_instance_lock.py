@@ -0,0 +1,58 @@
+import tempfile
+import threading
+import unittest
+
+from instance_lock import InstanceLock
+
+
+class TestInstanceLock(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.first = InstanceLock("test-gui", directory=self.tmp.name)
+        self.second = InstanceLock("test-gui", directory=self.tmp.name)
+
+    def tearDown(self):
+        self.second.release()
+        self.first.release()
+        self.tmp.cleanup()
+
+    def test_second_launch_forwards_args(self):
+        """Only one instance holds the lock; a second one hands its flags over"""
+        print("\n🔒 Launching twice with the same lock...")
+        received = []
+        delivered = threading.Event()
+
+        def on_forward(args):
+            received.append(args)
+            delivered.set()
+
+        self.assertTrue(self.first.acquire())
+        self.first.serve(on_forward)
+        self.assertFalse(self.second.acquire())
+        self.assertTrue(self.second.forward(["--auto-start", "--timer=2"]))
+        self.assertTrue(delivered.wait(2))
+        self.assertEqual(received, [["--auto-start", "--timer=2"]])
+        print("✅ Second launch forwarded its arguments.")
+
+    def test_forwarded_args_keep_their_spaces(self):
+        """Arguments with spaces, tabs or nothing in them arrive exactly as given"""
+        received = []
+        self.assertTrue(self.first.acquire())
+        self.first.serve(received.append)
+        args = ["--schedule=Mon-Fri 09:00-17:00", "two  spaces", "tab\there", ""]
+        self.assertTrue(self.second.forward(args))
+        self.assertEqual(received, [args])
+
+    def test_lock_is_free_after_release(self):
+        """Releasing the lock lets the next launch become the running instance"""
+        self.assertTrue(self.first.acquire())
+        self.first.release()
+        self.assertTrue(self.second.acquire())
+
+    def test_forward_without_running_instance_fails(self):
+        """Forwarding gives up quickly when nothing is listening"""
+        self.assertFalse(self.second.forward(["--auto-start"], wait=0.1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,6 +5,12 @@ import platform
 import shutil
 import time
 
+try:
+    from icon_cache import IconCache
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
 class TestKeepAwakeUtility(unittest.TestCase):
     def setUp(self):
         self.required_files = [
@@ -90,7 +96,9 @@ class TestKeepAwakeUtility(unittest.TestCase):
         """Test CLI flags: --auto-start and --timer"""
         print("\n🧪 Running CLI auto-start + timer test...")
         result = subprocess.run(
-            ["python", "console_keep_awake.py", "--auto-start", "--timer=1", "--non-interactive"],
+            # Never touch the real user data dir: a killed child would leave a session to resume
+            ["python", "console_keep_awake.py", "--auto-start", "--timer=1", "--non-interactive",
+             "--no-resume", "--no-journal"],
             capture_output=True,
             text=True,
             timeout=10
@@ -116,5 +124,58 @@ class TestKeepAwakeUtility(unittest.TestCase):
         self.assertTrue(os.path.exists(icon_inactive))
         print("✅ Icon switch logic files exist.")
 
+
+class TestFastStart(unittest.TestCase):
+    def test_console_engine_skips_gui_libraries(self):
+        """The headless path never loads GUI, tray or imaging libraries"""
+        print("\n🚀 Checking headless imports...")
+        code = ("import sys, console_keep_awake; "
+                "print(sorted(m for m in ('tkinter', 'PIL', 'pystray', 'pyautogui', 'psutil') if m in sys.modules))")
+        result = subprocess.run(["python", "-c", code], capture_output=True, text=True)
+        self.assertEqual(result.stdout.strip(), "[]")
+        print("✅ No GUI libraries loaded.")
+
+    def test_startup_profile_report(self):
+        """--startup-profile prints per-import timings"""
+        from startup import StartupProfiler
+
+        profiler = StartupProfiler()
+        profiler.install()
+        try:
+            import wave  # noqa: F401  (any stdlib module not imported yet)
+        finally:
+            profiler.uninstall()
+        self.assertIn("wave", [name for _, name, _ in profiler.records])
+
+@unittest.skipUnless(HAS_PIL, "Pillow is not installed")
+class TestIconCache(unittest.TestCase):
+    def test_decodes_each_state_once(self):
+        """Repeated lookups are served from the pre-scaled variants"""
+        print("\n🖼️ Checking icon cache hit/miss accounting...")
+        cache = IconCache({True: "awake_icon.png", False: "sleep_icon.png"})
+        first = cache.get(True)
+        for _ in range(10):
+            self.assertIs(cache.get(True), first)
+        cache.get(False, 16)
+        stats = cache.stats()
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["hits"], 10)
+        self.assertEqual(first.size, (64, 64))
+        self.assertEqual(cache.get(False, 20).size, (24, 24))
+        print("✅ Icon cache decodes once per state.")
+
+    def test_swap_only_on_state_change(self):
+        """The tray icon is only replaced when the state flips"""
+        cache = IconCache({True: "awake_icon.png", False: "sleep_icon.png"})
+        self.assertTrue(cache.swap(False))
+        self.assertFalse(cache.swap(False))
+        self.assertTrue(cache.swap(True))
+        self.assertEqual(cache.stats()["swaps"], 2)
+
+    def test_missing_icon_falls_back(self):
+        """Unknown paths fall back to a placeholder instead of raising"""
+        cache = IconCache({True: "missing.png"}, fallback_path="also-missing.png")
+        self.assertEqual(cache.get(True, 32).size, (32, 32))
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import urllib.request
+
+from clock import VirtualClock
+from input_inject import KEY, MOUSE
+from metrics import Metrics, MetricsServer, parse_metrics_port_arg
+
+
+def samples(text):
+    """Metric lines as {name_with_labels: value}"""
+    return {line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+            for line in text.splitlines() if line and not line.startswith("#")}
+
+
+class TestMetrics(unittest.TestCase):
+    def test_counters_and_histogram(self):
+        metrics = Metrics()
+        metrics.injection(MOUSE, 0.00002)
+        metrics.injection(MOUSE, 0.0003)
+        metrics.injection(KEY, 5.0)
+        metrics.shutdown("scheduled")
+        values = samples(metrics.render())
+        self.assertEqual(values['keep_awake_injections_total{type="mouse"}'], 2)
+        self.assertEqual(values['keep_awake_injections_total{type="key"}'], 1)
+        # Buckets are cumulative and end with +Inf
+        self.assertEqual(values['keep_awake_injection_latency_seconds_bucket{le="5e-05"}'], 1)
+        self.assertEqual(values['keep_awake_injection_latency_seconds_bucket{le="0.0005"}'], 2)
+        self.assertEqual(values['keep_awake_injection_latency_seconds_bucket{le="0.1"}'], 2)
+        self.assertEqual(values['keep_awake_injection_latency_seconds_bucket{le="+Inf"}'], 3)
+        self.assertEqual(values["keep_awake_injection_latency_seconds_count"], 3)
+        self.assertEqual(values['keep_awake_shutdowns_total{event="scheduled"}'], 1)
+        self.assertGreaterEqual(values["keep_awake_threads"], 1)
+
+    def test_parse_port(self):
+        self.assertEqual(parse_metrics_port_arg(["--metrics-port=9101"]), 9101)
+        self.assertIsNone(parse_metrics_port_arg(["--metrics-port=http"]))
+        self.assertIsNone(parse_metrics_port_arg([]))
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    def test_scrape_console_app(self):
+        """A scrape shows the active state, the timer and the injections so far"""
+        print("\n📈 Scraping the metrics endpoint...")
+        from console_keep_awake import KeepAwakeConsoleApp
+
+        clock = VirtualClock()
+        app = KeepAwakeConsoleApp(clock=clock, shutdown_runner=lambda command: None)
+        try:
+            app.inhibit_preference = "input"
+            app.idle_threshold = 0
+            app.current_timer = "1 hour"
+            app.start_keep_awake()
+            clock.advance(600)
+            app.start_metrics(0)
+            with urllib.request.urlopen(f"http://127.0.0.1:{app.metrics_server.port}/metrics", timeout=5) as response:
+                self.assertTrue(response.headers["Content-Type"].startswith("text/plain"))
+                values = samples(response.read().decode())
+            self.assertEqual(values["keep_awake_active"], 1)
+            self.assertEqual(values["keep_awake_timer_remaining_seconds"], 3000)
+            injected = values['keep_awake_injections_total{type="mouse"}'] + values['keep_awake_injections_total{type="key"}']
+            self.assertEqual(injected, app.activity.fired)
+            self.assertIn("keep_awake_scheduler_wakeups_total", values)
+        finally:
+            app.shutdown()
+        print("✅ Metrics served.")
+
+
+if __name__ == "__main__":
+    unittest.main()
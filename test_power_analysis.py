@@ -0,0 +1,70 @@
+import unittest
+from collections import namedtuple
+
+from power_analysis import PowerAnalyzer
+
+try:
+    import psutil
+    HAS_PSUTIL = True
+except ImportError:
+    HAS_PSUTIL = False
+
+Battery = namedtuple("Battery", "percent power_plugged secsleft")
+
+
+class TestPowerAnalyzer(unittest.TestCase):
+    def test_ten_hour_session_in_bounded_memory(self):
+        """Rates, session cost and top consumers come from running aggregates"""
+        print("\n🔋 Streaming a synthetic 10 hour session...")
+        analyzer = PowerAnalyzer(psutil_module=object(), max_names=50)
+        percent = 100.0
+        cpu_total = 0.0
+        for i in range(1200):  # 10 hours at the default 30 s interval
+            active = i >= 600
+            analyzer.set_session(active)
+            # 10%/h with keep-awake on, 5%/h with it off
+            percent -= (10.0 if active else 5.0) * 30 / 3600.0
+            cpu_total += 3.0
+            processes = [
+                (1, "browser", i * 2.0),
+                (2, "indexer", i * 0.5),
+                # A short-lived helper with a new pid and name every sample
+                (1000 + i, f"helper-{i}", 0.1),
+            ]
+            analyzer.add_sample(i * 30.0, Battery(percent, False, 3600), cpu_total, processes)
+
+        report = analyzer.report()
+        self.assertEqual(report["samples"], 1200)
+        self.assertAlmostEqual(report["active_rate"], 10.0, places=3)
+        self.assertAlmostEqual(report["idle_rate"], 5.0, places=1)
+        self.assertAlmostEqual(report["session_cost"], 5.0, places=1)
+        self.assertAlmostEqual(report["discharge_rate"], 10.0 - 5.0 * 600 / 1200, delta=2.5)
+        self.assertEqual(report["sessions"], 1)
+        self.assertEqual([name for name, _, _ in report["top"][:2]], ["browser", "indexer"])
+        # Exited processes never pile up
+        self.assertEqual(len(analyzer.processes), 3)
+        self.assertLessEqual(len(analyzer.consumers), 50)
+        print(f"✅ Session cost {report['session_cost']:+.1f}% per hour.")
+
+    def test_charging_resets_discharge_fit(self):
+        """Plugging in starts a new discharge segment"""
+        analyzer = PowerAnalyzer(psutil_module=object())
+        analyzer.add_sample(0, Battery(50, False, 0), 0, [])
+        analyzer.add_sample(600, Battery(49, False, 0), 0, [])
+        self.assertIsNotNone(analyzer.report()["discharge_rate"])
+        analyzer.add_sample(1200, Battery(55, True, 0), 0, [])
+        self.assertIsNone(analyzer.report()["discharge_rate"])
+
+    @unittest.skipUnless(HAS_PSUTIL, "psutil is not installed")
+    def test_real_sample(self):
+        """A live sample reads this process among the consumers"""
+        analyzer = PowerAnalyzer(psutil_module=psutil)
+        analyzer.sample()
+        sum(i * i for i in range(200000))
+        analyzer.sample()
+        self.assertEqual(analyzer.samples, 2)
+        self.assertGreater(len(analyzer.processes), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
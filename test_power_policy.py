@@ -0,0 +1,250 @@
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+
+from clock import VirtualClock
+from power_policy import (PAUSE, SHUTDOWN, PowerMonitor, PowerPolicy, parse_power_args, parse_uevent,
+                          read_power_state)
+from scheduler import Scheduler
+
+
+class FakeSysfs:
+    """A /sys/class/power_supply tree in a temporary directory"""
+
+    def __init__(self):
+        self.root = tempfile.mkdtemp()
+
+    def supply(self, name, **attrs):
+        path = os.path.join(self.root, name)
+        os.makedirs(path, exist_ok=True)
+        for attr, value in attrs.items():
+            with open(os.path.join(path, attr), "w") as f:
+                f.write(f"{value}\n")
+
+    def laptop(self, online=1, percent=80):
+        self.supply("AC", type="Mains", online=online)
+        self.supply("BAT0", type="Battery", present=1, status="Charging" if online else "Discharging",
+                    energy_now=percent * 500, energy_full=50000, capacity=percent)
+
+    def close(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+class TestReadPowerState(unittest.TestCase):
+    def setUp(self):
+        self.sysfs = FakeSysfs()
+
+    def tearDown(self):
+        self.sysfs.close()
+
+    def test_laptop(self):
+        self.sysfs.laptop(online=0, percent=42)
+        # A wireless mouse battery must not count
+        self.sysfs.supply("hidpp_battery_0", type="Battery", scope="Device", capacity=5, status="Discharging")
+        state = read_power_state(self.sysfs.root)
+        self.assertIs(state.on_ac, False)
+        self.assertAlmostEqual(state.percent, 42.0)
+        self.assertEqual(state.batteries, 1)
+        self.assertEqual(state.describe(), "on battery, battery 42%")
+
+    def test_battery_status_without_adapter(self):
+        self.sysfs.supply("BAT1", type="Battery", status="Full", capacity=100)
+        state = read_power_state(self.sysfs.root)
+        self.assertIs(state.on_ac, True)
+        self.assertEqual(state.percent, 100.0)
+
+    def test_desktop_and_missing_tree(self):
+        self.assertEqual(read_power_state(self.sysfs.root).describe(), "power source unknown")
+        self.assertIsNone(read_power_state(os.path.join(self.sysfs.root, "missing")))
+
+    def test_parse_uevent(self):
+        message = b"change@/devices/LNXSYSTM:00/ACPI0003:00/power_supply/AC\0ACTION=change\0SUBSYSTEM=power_supply\0POWER_SUPPLY_ONLINE=0\0"
+        fields = parse_uevent(message)
+        self.assertEqual(fields["SUBSYSTEM"], "power_supply")
+        self.assertEqual(fields["POWER_SUPPLY_ONLINE"], "0")
+        self.assertEqual(parse_uevent(b"libudev\0junk"), {})
+
+
+class TestPowerMonitor(unittest.TestCase):
+    def test_uevent_triggers_a_read(self):
+        """A power_supply uevent is acted on at once, not at the next poll"""
+        print("\n🔌 Unplugging AC in a fake sysfs tree...")
+        sysfs = FakeSysfs()
+        sysfs.laptop(online=1)
+        scheduler = Scheduler()
+        scheduler.start()
+        changes = []
+        changed = threading.Event()
+        kernel, ours = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        ours.setblocking(False)
+
+        def on_change(state):
+            changes.append((state, threading.current_thread().name))
+            changed.set()
+
+        monitor = PowerMonitor(scheduler, on_change, sysfs.root, uevent_socket=ours)
+        try:
+            self.assertTrue(monitor.start())
+            self.assertEqual(monitor.mode, "uevents")
+            sysfs.laptop(online=0, percent=79)
+            kernel.send(b"change@/devices/power_supply/AC\0ACTION=change\0SUBSYSTEM=power_supply\0")
+            self.assertTrue(changed.wait(1))
+            # The first reading is reported too
+            self.assertIs(changes[0][0].on_ac, True)
+            changed.clear()
+            if len(changes) < 2:
+                self.assertTrue(changed.wait(1))
+            self.assertIs(changes[-1][0].on_ac, False)
+            self.assertEqual(changes[-1][1], scheduler.name)
+            self.assertEqual(monitor.events, 1)
+        finally:
+            monitor.stop()
+            kernel.close()
+            scheduler.stop()
+            sysfs.close()
+        print("✅ Change seen without polling.")
+
+    def test_polling_fallback(self):
+        clock = VirtualClock()
+        scheduler = Scheduler(clock)
+        scheduler.start()
+        sysfs = FakeSysfs()
+        sysfs.laptop(online=1)
+        changes = []
+        monitor = PowerMonitor(scheduler, changes.append, sysfs.root, uevents=False)
+        try:
+            monitor.start()
+            self.assertTrue(monitor.mode.startswith("polling"))
+            clock.advance(10)
+            self.assertEqual([state.on_ac for state in changes], [True])
+            sysfs.laptop(online=0)
+            clock.advance(5)
+            self.assertEqual([state.on_ac for state in changes], [True, False])
+        finally:
+            monitor.stop()
+            scheduler.stop()
+            sysfs.close()
+
+
+class TestPowerPolicy(unittest.TestCase):
+    def setUp(self):
+        from console_keep_awake import KeepAwakeConsoleApp
+
+        self.clock = VirtualClock()
+        self.sysfs = FakeSysfs()
+        self.sysfs.laptop(online=1, percent=90)
+        self.shutdowns = []
+        self.app = KeepAwakeConsoleApp(clock=self.clock, shutdown_runner=self.shutdowns.append)
+        self.app.inhibit_preference = "input"
+        self.app.idle_threshold = 0
+
+    def tearDown(self):
+        self.app.shutdown()
+        self.sysfs.close()
+
+    def start_policy(self, policy):
+        self.app.power_policy = policy
+        self.app.power_monitor = PowerMonitor(self.app.scheduler, self.app.on_power_change, self.sysfs.root,
+                                              uevents=False)
+        self.app.power_monitor.start()
+
+    def remaining(self):
+        return self.app.timer_deadline - self.clock()
+
+    def test_low_battery_brings_timer_forward_and_back(self):
+        self.start_policy(PowerPolicy(threshold=20, low_action=15.0))
+        self.app.current_timer = "2 hours"
+        self.app.start_keep_awake()
+        self.sysfs.laptop(online=0, percent=50)
+        self.clock.advance(600)
+        self.assertAlmostEqual(self.remaining(), 6600, delta=1)
+        self.sysfs.laptop(online=0, percent=19)
+        self.clock.advance(5)
+        self.assertAlmostEqual(self.remaining(), 900, delta=5)
+        # Power returns before the shortened timer runs out: the original deadline comes back
+        self.sysfs.laptop(online=1, percent=19)
+        self.clock.advance(5)
+        self.assertTrue(self.app.timer_active)
+        self.assertAlmostEqual(self.remaining(), 7200 - 610, delta=5)
+
+    def test_pause_on_battery_and_resume(self):
+        """Unplugging pauses keep-awake; plugging back in resumes it with the timer it had"""
+        self.start_policy(PowerPolicy(on_battery=PAUSE))
+        self.app.current_timer = "1 hour"
+        self.app.start_keep_awake()
+        self.sysfs.laptop(online=0, percent=60)
+        self.clock.advance(5)
+        self.assertFalse(self.app.active)
+        self.clock.advance(595)
+        self.sysfs.laptop(online=1, percent=60)
+        self.clock.advance(5)
+        self.assertTrue(self.app.active)
+        self.assertAlmostEqual(self.remaining(), 3600 - 605, delta=5)
+
+    def test_critical_battery_shuts_down(self):
+        self.start_policy(PowerPolicy(on_battery=PAUSE, threshold=5, low_action=SHUTDOWN))
+        self.app.start_keep_awake()
+        self.sysfs.laptop(online=0, percent=30)
+        self.clock.advance(5)
+        self.assertFalse(self.app.active)
+        self.sysfs.laptop(online=0, percent=4)
+        self.clock.advance(5)
+        self.assertTrue(self.app.active)
+        self.assertTrue(self.app.shutdown_scheduled)
+        self.clock.advance(60)
+        self.assertEqual(len(self.shutdowns), 1)
+
+    def test_session_started_on_battery(self):
+        """Starting while already unplugged applies the policy right away"""
+        self.sysfs.laptop(online=0, percent=60)
+        self.start_policy(PowerPolicy(on_battery=PAUSE))
+        self.clock.advance(5)
+        self.assertFalse(self.app.active)
+        self.app.start_keep_awake()
+        self.assertFalse(self.app.active)
+        # Power returns: the paused session comes back
+        self.sysfs.laptop(online=1, percent=60)
+        self.clock.advance(5)
+        self.assertTrue(self.app.active)
+
+    def test_policy_engages_after_starting_on_battery(self):
+        policy = PowerPolicy(on_battery=15.0)
+        from power_policy import PowerState
+
+        on_battery = PowerState(False, 60.0)
+        self.assertIsNone(policy.apply(self.app, on_battery))
+        self.app.start_keep_awake()
+        self.assertEqual(policy.apply(self.app, on_battery), "timer")
+        self.assertAlmostEqual(self.remaining(), 900, delta=1)
+
+    def test_stopped_session_is_left_alone(self):
+        self.start_policy(PowerPolicy(on_battery=PAUSE))
+        self.sysfs.laptop(online=0)
+        self.clock.advance(5)
+        self.sysfs.laptop(online=1)
+        self.clock.advance(5)
+        self.assertFalse(self.app.active)
+
+    def test_hysteresis(self):
+        policy = PowerPolicy(threshold=20)
+        from power_policy import PowerState
+
+        self.assertEqual(policy.desired(PowerState(False, 19.0)), PAUSE)
+        self.assertEqual(policy.desired(PowerState(False, 21.0)), PAUSE)
+        self.assertIsNone(policy.desired(PowerState(False, 23.5)))
+        self.assertIsNone(policy.desired(PowerState(True, 10.0)))
+
+    def test_parse_args(self):
+        policy, root = parse_power_args(["--on-battery=timer=30", "--battery-below=10:shutdown",
+                                         "--power-supply-dir=/tmp/ps"])
+        self.assertEqual((policy.on_battery, policy.threshold, policy.low_action), (30.0, 10.0, SHUTDOWN))
+        self.assertEqual(root, "/tmp/ps")
+        self.assertEqual(parse_power_args(["--battery-below=15"])[0].low_action, PAUSE)
+        self.assertIsNone(parse_power_args(["--on-battery=sleep"])[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import json
+import os
+import pstats
+import tempfile
+import threading
+import time
+import unittest
+
+import profiling
+from profiling import SessionProfiler, parse_profile_args, span
+
+
+class TestSpan(unittest.TestCase):
+    def tearDown(self):
+        profiling.PROFILER = None
+
+    def test_off_returns_function_unchanged(self):
+        """With profiling off the hook is the original function: no wrapper, no cost"""
+        def tick():
+            return 42
+
+        self.assertIs(span("tick")(tick), tick)
+
+    def test_on_records_calls(self):
+        profiler = SessionProfiler("sample", directory=tempfile.mkdtemp(), memory_interval=0)
+        profiling.PROFILER = profiler
+
+        @span("tick")
+        def tick(value):
+            """One tick"""
+            return value * 2
+
+        self.assertEqual(tick(21), 42)
+        self.assertEqual(tick.__doc__, "One tick")
+        for _ in range(9):
+            tick(1)
+        summary = profiler.spans["tick"].summary()
+        self.assertEqual(summary["count"], 10)
+        self.assertGreaterEqual(summary["max_us"], summary["p50_us"])
+
+    def test_parse_args(self):
+        self.assertIsNone(parse_profile_args(["--auto-start"]))
+        self.assertEqual(parse_profile_args(["--profile"]), ("cprofile", None, 60.0))
+        self.assertEqual(parse_profile_args(["--profile=sample", "--profile-dir=/tmp/p", "--profile-memory=5"]),
+                         ("sample", "/tmp/p", 5.0))
+        self.assertEqual(parse_profile_args(["--profile=perf"])[0], "cprofile")
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += sum(range(100))
+    return total
+
+
+class TestSessionProfiler(unittest.TestCase):
+    def run_session(self, mode):
+        directory = tempfile.mkdtemp()
+        profiler = SessionProfiler(mode, directory=directory, memory_interval=0.05).start()
+        results = []
+        try:
+            profiler.record("tick", 1500)
+            worker = threading.Thread(target=lambda: results.append(busy(0.2)), name="busy-worker")
+            worker.start()
+            busy(0.1)
+            worker.join()
+            profiler.dump()
+        finally:
+            profiler.stop()
+        # Profiling must never keep a thread from running (3.12+ allows only one cProfile at a time)
+        self.assertEqual(len(results), 1)
+        return profiler, directory
+
+    def test_cprofile_covers_threads(self):
+        """cProfile output includes work done on threads started after profiling began"""
+        print("\n🔬 Profiling a session with cProfile...")
+        profiler, directory = self.run_session("cprofile")
+        files = os.listdir(directory)
+        self.assertIn("cprofile.pstats", files)
+        with open(os.path.join(directory, "cprofile.txt")) as f:
+            self.assertIn("function calls", f.read())
+        # busy ran once on the main thread and once on the worker; both calls must be in the profile
+        stats = pstats.Stats(os.path.join(directory, "cprofile.pstats")).stats
+        self.assertEqual(sum(stat[1] for func, stat in stats.items() if func[2] == "busy"), 2)
+        with open(os.path.join(directory, "spans.json")) as f:
+            self.assertEqual(json.load(f)["tick"]["count"], 1)
+        self.assertTrue(any(name.startswith("memory-") and name.endswith(".txt") for name in files))
+        self.assertEqual(profiler.dumps, 2)
+        print("✅ Profile written.")
+
+    def test_sampling(self):
+        profiler, directory = self.run_session("sample")
+        self.assertGreater(profiler.sample_count, 0)
+        with open(os.path.join(directory, "samples.folded")) as f:
+            stacks = f.read()
+        self.assertIn("test_profiling.py:busy", stacks)
+
+
+if __name__ == "__main__":
+    unittest.main()
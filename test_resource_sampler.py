@@ -0,0 +1,136 @@
+import contextlib
+import io
+import time
+import unittest
+from collections import namedtuple
+from unittest import mock
+
+from clock import VirtualClock
+from resource_sampler import RingBuffer, ResourceSampler
+from scheduler import Scheduler
+
+try:
+    import psutil
+    HAS_PSUTIL = True
+except ImportError:
+    HAS_PSUTIL = False
+
+Freq = namedtuple("Freq", "current")
+Usage = namedtuple("Usage", "percent")
+Battery = namedtuple("Battery", "percent power_plugged secsleft")
+
+
+class FakePsutil:
+    """Replays a CPU ramp of 0, 1, 2, ... percent"""
+    POWER_TIME_UNLIMITED = -2
+
+    def __init__(self):
+        self.calls = 0
+
+    def cpu_percent(self, interval=None):
+        value = float(self.calls)
+        self.calls += 1
+        return value
+
+    def cpu_freq(self):
+        return Freq(2400.0)
+
+    def virtual_memory(self):
+        return Usage(40.0)
+
+    def disk_usage(self, path):
+        return Usage(70.0)
+
+    def sensors_battery(self):
+        return Battery(80, False, 3600)
+
+
+class TestRingBuffer(unittest.TestCase):
+    def test_wraps_and_keeps_order(self):
+        ring = RingBuffer(4)
+        for value in range(6):
+            ring.append(value)
+        self.assertEqual(len(ring), 4)
+        self.assertEqual(list(ring.recent(4)), [2.0, 3.0, 4.0, 5.0])
+        self.assertEqual(list(ring.recent(2)), [4.0, 5.0])
+        self.assertEqual(ring.latest(), 5.0)
+
+
+class TestResourceSampler(unittest.TestCase):
+    def setUp(self):
+        self.clock = VirtualClock()
+        self.scheduler = Scheduler(self.clock)
+        self.scheduler.start()
+        self.sampler = ResourceSampler(1.0, psutil_module=FakePsutil(), clock=self.clock)
+        self.sampler.start(self.scheduler)
+
+    def tearDown(self):
+        self.scheduler.stop()
+
+    def test_window_stats(self):
+        """Windows only cover their own time span and percentiles use nearest rank"""
+        self.clock.advance(999)  # 1000 samples; the ring holds the last 901
+        self.assertEqual(len(self.sampler.times), 901)
+        minute = self.sampler.window_stats("cpu", 60)
+        self.assertEqual(minute["samples"], 60)
+        self.assertEqual((minute["min"], minute["max"]), (941.0, 1000.0))
+        self.assertEqual(minute["p50"], 970.0)
+        self.assertEqual(minute["p95"], 997.0)
+        self.assertEqual(self.sampler.window_stats("cpu", 900)["samples"], 900)
+        self.assertEqual(self.sampler.window_stats("memory", 300)["avg"], 40.0)
+        self.assertEqual(self.sampler.current()["battery"], 80.0)
+
+    def test_monitor_returns_instantly(self):
+        """The monitor command reads history instead of blocking on psutil"""
+        from console_keep_awake import KeepAwakeConsoleApp
+
+        self.clock.advance(300)
+        app = KeepAwakeConsoleApp()
+        try:
+            app.resource_sampler = self.sampler
+            output = io.StringIO()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(output):
+                app.show_resource_monitor()
+            elapsed = time.perf_counter() - start
+        finally:
+            app.shutdown()
+        self.assertLess(elapsed, 0.05)
+        self.assertIn("CPU Usage: 301.0%", output.getvalue())
+        self.assertIn("Battery Time Left: 01:00:00", output.getvalue())
+
+    def test_sampler_starts_when_monitor_opens(self):
+        """Nothing is sampled until the resource monitor is first opened"""
+        import console_keep_awake
+
+        clock = VirtualClock()
+        app = console_keep_awake.KeepAwakeConsoleApp(clock=clock)
+        fake = lambda interval, clock: ResourceSampler(interval, psutil_module=FakePsutil(), clock=clock)
+        try:
+            with mock.patch.object(console_keep_awake, "ResourceSampler", fake):
+                clock.advance(60)
+                self.assertIsNone(app.resource_sampler)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    app.show_resource_monitor()
+                self.assertIsNotNone(app.resource_sampler)
+                clock.advance(10)
+                self.assertEqual(app.resource_sampler.samples, 6)
+        finally:
+            app.shutdown()
+
+
+@unittest.skipUnless(HAS_PSUTIL, "psutil is not installed")
+class TestSamplerOverhead(unittest.TestCase):
+    def test_overhead_below_a_tenth_of_a_percent(self):
+        """One sample costs well under 0.1% of the default 2 second interval"""
+        print("\n📈 Measuring sampler overhead...")
+        sampler = ResourceSampler(2.0, psutil_module=psutil)
+        for _ in range(50):
+            sampler.sample()
+        overhead = sampler.cpu_time / (sampler.samples * sampler.interval) * 100.0
+        self.assertLess(overhead, 0.1)
+        print(f"✅ Sampler overhead {overhead:.4f}% CPU.")
+
+
+if __name__ == "__main__":
+    unittest.main()
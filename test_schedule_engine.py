@@ -0,0 +1,132 @@
+import threading
+import time
+import unittest
+from datetime import datetime, timezone
+
+from clock import VirtualClock
+from schedule_engine import ScheduleEngine, ScheduleError, ScheduleRunner, load_timezone, parse_rule
+from scheduler import Scheduler
+
+try:
+    NEW_YORK = load_timezone("America/New_York")
+except ScheduleError:
+    NEW_YORK = None
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+class TestScheduleEngine(unittest.TestCase):
+    def setUp(self):
+        self.engine = ScheduleEngine(tz=timezone.utc)
+
+    def test_weekly_window_transitions(self):
+        """Transitions come straight from the rule, skipping excluded days"""
+        self.engine.add("mon-fri 09:00-17:00")
+        friday = utc(2026, 10, 16, 8, 0)
+        self.assertEqual(self.engine.next_transitions(friday, 3), [
+            (utc(2026, 10, 16, 9, 0), True),
+            (utc(2026, 10, 16, 17, 0), False),
+            (utc(2026, 10, 19, 9, 0), True),
+        ])
+        self.assertTrue(self.engine.is_active(utc(2026, 10, 16, 12, 0)))
+        self.assertFalse(self.engine.is_active(utc(2026, 10, 17, 12, 0)))
+
+    def test_overnight_and_overlapping_windows_merge(self):
+        self.engine.add("daily 22:00-06:00")
+        self.engine.add("sat 05:00-08:00")
+        self.assertTrue(self.engine.is_active(utc(2026, 10, 16, 23, 0)))
+        self.assertTrue(self.engine.is_active(utc(2026, 10, 17, 5, 30)))
+        # Saturday's window extends the overnight one instead of adding a stop/start pair
+        self.assertEqual(self.engine.next_transition(utc(2026, 10, 17, 1, 0)), (utc(2026, 10, 17, 8, 0), False))
+
+    def test_cron_rules(self):
+        """Cron rules follow cron's day-of-month OR day-of-week semantics"""
+        self.engine.add("cron 30 9 * * 1-5 for 1h")
+        self.assertEqual(self.engine.next_transition(utc(2026, 10, 17, 0, 0)), (utc(2026, 10, 19, 9, 30), True))
+        leap = ScheduleEngine([parse_rule("cron 0 0 29 2 * for 1h")], tz=timezone.utc)
+        self.assertEqual(leap.next_transition(utc(2026, 10, 17)), (utc(2028, 2, 29), True))
+        with self.assertRaises(ScheduleError):
+            parse_rule("cron 0 25 * * * for 1h")
+        with self.assertRaises(ScheduleError):
+            parse_rule("mon-fri 9-5")
+
+    def test_always_on_never_stops(self):
+        self.engine.add("daily 00:00-24:00")
+        self.assertTrue(self.engine.is_active(utc(2026, 10, 17, 3, 0)))
+        self.assertEqual(self.engine.next_transitions(utc(2026, 10, 17), 5), [])
+
+    @unittest.skipIf(NEW_YORK is None, "time zone data is not installed")
+    def test_dst_changes(self):
+        """Windows stay on local wall time across DST in both directions"""
+        engine = ScheduleEngine([parse_rule("daily 08:00-09:00")], tz=NEW_YORK)
+        starts = [ts for ts, active in engine.next_transitions(utc(2026, 3, 7), 4) if active]
+        self.assertEqual(starts, [utc(2026, 3, 7, 13, 0), utc(2026, 3, 8, 12, 0)])
+        # On fall-back night 01:00-02:00 wall time covers two real hours
+        engine = ScheduleEngine([parse_rule("daily 01:00-02:00")], tz=NEW_YORK)
+        start, stop = engine.next_transitions(utc(2026, 11, 1, 0, 0), 2)
+        self.assertEqual(stop[0] - start[0], 7200)
+
+    def test_hundreds_of_rules_stay_fast(self):
+        """Next-N queries merge rule streams lazily instead of scanning time"""
+        days = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+        for i in range(300):
+            hour, minute = i % 24, (i * 7) % 60
+            self.engine.add(f"{days[i % 7]} {hour:02d}:{minute:02d}-{(hour + 1) % 24:02d}:{minute:02d}")
+        start = time.perf_counter()
+        transitions = self.engine.next_transitions(utc(2026, 10, 17), 50)
+        elapsed = time.perf_counter() - start
+        self.assertEqual(len(transitions), 50)
+        self.assertEqual([ts for ts, _ in transitions], sorted(ts for ts, _ in transitions))
+        self.assertLess(elapsed, 0.5)
+
+
+class TestScheduleRunner(unittest.TestCase):
+    def test_runner_sleeps_until_transitions_and_survives_clock_jumps(self):
+        """The runner wakes for transitions and re-plans after a wall clock jump"""
+        print("\n📅 Running a schedule on a virtual clock...")
+        clock = VirtualClock(wall_start=utc(2026, 10, 16, 8, 0))
+        scheduler = Scheduler(clock)
+        scheduler.start()
+        changes = []
+        engine = ScheduleEngine([parse_rule("mon-fri 09:00-17:00")], tz=timezone.utc)
+        runner = ScheduleRunner(engine, scheduler, changes.append)
+        runner.start()
+        self.assertEqual(changes, [False])
+        clock.advance(3600)
+        self.assertEqual(changes, [False, True])
+        # Guarded sleeps: at most one wakeup a minute, never one per second
+        self.assertLessEqual(runner.wakeups, 61)
+
+        # Suspend/resume: wall time jumps past 17:00 while monotonic time does not
+        clock.wall_offset += 9 * 3600
+        clock.advance(60)
+        self.assertEqual(changes, [False, True, False])
+        self.assertEqual(runner.jumps, 1)
+        scheduler.stop()
+        print("✅ Transitions and clock jumps handled.")
+
+    def test_console_drives_the_runner_from_the_scheduler_thread(self):
+        """Starting and clearing the schedule from the menu thread leaves no second wakeup chain"""
+        from console_keep_awake import KeepAwakeConsoleApp
+
+        app = KeepAwakeConsoleApp()
+        calls = []
+        app.on_schedule_change = lambda active: calls.append(threading.current_thread())
+        try:
+            baseline = app.scheduler.pending()
+            app.scheduler.run_sync(app.schedule.add, "mon-fri 09:00-17:00")
+            app.start_schedule()
+            app.start_schedule()
+            self.assertEqual(calls, [app.scheduler._thread])
+            self.assertEqual(app.scheduler.pending(), baseline + 1)
+            app.clear_schedule()
+            self.assertIsNone(app.schedule_runner)
+            self.assertEqual(app.scheduler.pending(), baseline)
+        finally:
+            app.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from scheduler import Scheduler
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = Scheduler()
+        self.scheduler.start()
+
+    def tearDown(self):
+        self.scheduler.stop()
+
+    def test_call_later_fires_once(self):
+        """One-shot jobs run once at their deadline"""
+        fired = threading.Event()
+        job = self.scheduler.call_later(0.05, fired.set)
+        self.assertTrue(fired.wait(1))
+        time.sleep(0.05)
+        self.assertFalse(job.active)
+        self.assertEqual(self.scheduler.fired, 1)
+
+    def test_call_every_is_anchored_to_deadlines(self):
+        """Repeating jobs keep their period instead of accumulating sleep overhead"""
+        stamps = []
+        done = threading.Event()
+
+        def tick():
+            stamps.append(time.monotonic())
+            time.sleep(0.01)  # simulated work must not push later ticks back
+            if len(stamps) == 5:
+                done.set()
+
+        job = self.scheduler.call_every(0.05, tick, first_delay=0)
+        self.assertTrue(done.wait(2))
+        job.cancel()
+        self.assertAlmostEqual(stamps[4] - stamps[0], 0.2, delta=0.03)
+
+    def test_cancel_prevents_firing(self):
+        """Cancelled jobs never run"""
+        fired = threading.Event()
+        job = self.scheduler.call_later(0.05, fired.set)
+        job.cancel()
+        self.assertFalse(fired.wait(0.2))
+        self.assertEqual(self.scheduler.pending(), 0)
+
+    def test_earlier_job_wakes_sleeping_thread(self):
+        """A new earliest deadline interrupts a long wait"""
+        self.scheduler.call_later(60, lambda: None)
+        fired = threading.Event()
+        self.scheduler.call_later(0.02, fired.set)
+        self.assertTrue(fired.wait(1))
+
+    def test_drift_stats(self):
+        """Drift report covers fired jobs and wall clock skew"""
+        fired = threading.Event()
+        self.scheduler.call_later(0.01, fired.set)
+        fired.wait(1)
+        stats = self.scheduler.drift_stats()
+        self.assertEqual(stats["fired"], 1)
+        self.assertGreaterEqual(stats["max_drift_ms"], 0.0)
+        self.assertLess(abs(stats["wall_skew_ms"]), 1000.0)
+
+    def test_wait_idle_covers_running_callback(self):
+        """wait_idle returns only after an in-flight callback has finished"""
+        entered = threading.Event()
+        finished = []
+
+        def slow():
+            entered.set()
+            time.sleep(0.05)
+            finished.append(True)
+
+        self.scheduler.call_later(0, slow)
+        self.assertTrue(entered.wait(1))
+        self.assertTrue(self.scheduler.wait_idle(1))
+        self.assertEqual(finished, [True])
+
+    def test_run_sync_runs_on_the_scheduler_thread(self):
+        ran_on = []
+        result = self.scheduler.run_sync(lambda value: ran_on.append(threading.current_thread()) or value, 7)
+        self.assertEqual(result, 7)
+        self.assertEqual(ran_on[0].name, self.scheduler.name)
+        with self.assertRaises(ValueError):
+            self.scheduler.run_sync(int, "not a number")
+        # From the scheduler thread itself it is a plain call
+        nested = []
+        self.scheduler.run_sync(lambda: nested.append(self.scheduler.run_sync(threading.current_thread)))
+        self.assertEqual(nested[0].name, self.scheduler.name)
+
+
+class TestConsoleTimerJobs(unittest.TestCase):
+    def test_changing_timer_keeps_one_countdown(self):
+        """Re-applying the timer replaces the countdown instead of stacking threads"""
+        from console_keep_awake import KeepAwakeConsoleApp
+
+        app = KeepAwakeConsoleApp()
+        try:
+            app.current_timer = "1 hour"
+            app.start_keep_awake()
+            app.current_timer = "2 hours"
+            app.check_timer_selection()
+            app.current_timer = "5 hours"
+            app.check_timer_selection()
+            # Activity tick plus a single countdown deadline
+            self.assertEqual(app.scheduler.pending(), 2)
+            self.assertEqual(app.update_remaining_time(), 5 * 3600)
+            workers = [t for t in threading.enumerate() if t.name == app.scheduler.name]
+            self.assertEqual(len(workers), 1)
+        finally:
+            app.stop_keep_awake()
+            app.scheduler.stop()
+
+    def test_stop_is_immediate_and_joins_threads(self):
+        """Stop takes effect within 50 ms and shutdown leaves no worker thread behind"""
+        from console_keep_awake import KeepAwakeConsoleApp
+
+        print("\n⏱️ Measuring stop latency...")
+        app = KeepAwakeConsoleApp()
+        app.inhibit_preference = "input"
+        app.current_timer = "1 hour"
+        app.start_keep_awake()
+        self.assertTrue(app.scheduler.is_alive())
+        worker = app.scheduler._thread
+        start = time.perf_counter()
+        app.stop_keep_awake()
+        elapsed = time.perf_counter() - start
+        self.assertEqual(app.scheduler.pending(), 0)
+        self.assertLess(app.stop_latency, 0.05)
+        self.assertLess(elapsed, 0.05)
+        self.assertTrue(app.shutdown())
+        self.assertTrue(app.exit_requested.is_set())
+        self.assertFalse(app.scheduler.is_alive())
+        self.assertFalse(worker.is_alive())
+        print(f"✅ Stopped in {app.stop_latency * 1000.0:.2f} ms with no threads left.")
+
+    def test_keep_awake_lock_stays_on_one_thread(self):
+        """The lock is taken and dropped on the scheduler thread, whoever asks"""
+        import console_keep_awake
+        from inhibitor import InputInjectionInhibitor
+
+        threads = []
+
+        class RecordingInhibitor(InputInjectionInhibitor):
+            def acquire(self):
+                threads.append(("acquire", threading.current_thread().name))
+                super().acquire()
+
+            def release(self):
+                threads.append(("release", threading.current_thread().name))
+                super().release()
+
+        def acquire(preference):
+            backend = RecordingInhibitor()
+            backend.acquire()
+            return backend
+
+        app = console_keep_awake.KeepAwakeConsoleApp()
+        try:
+            with mock.patch.object(console_keep_awake, "acquire_inhibitor", acquire):
+                app.start_keep_awake()
+                # A second caller, like the daemon's control thread
+                stopper = threading.Thread(target=app.stop_keep_awake, name="control")
+                stopper.start()
+                stopper.join()
+        finally:
+            app.shutdown()
+        self.assertFalse(app.active)
+        self.assertEqual({name for _, name in threads}, {app.scheduler.name})
+        self.assertEqual([kind for kind, _ in threads], ["acquire", "release"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from clock import VirtualClock
+from session_journal import (INJECT, RECORD, SHUTDOWN_CANCELLED, SHUTDOWN_SCHEDULED, START, STOP, TIMER,
+                             SessionJournal, _list_segments, _read_index, read_range, summarize)
+
+
+def local(*args):
+    return datetime(*args).timestamp()
+
+
+class TestSessionJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.clock = VirtualClock(wall_start=local(2026, 1, 1, 9, 0))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def journal(self, **kwargs):
+        return SessionJournal(self.tmp.name, clock=self.clock, **kwargs)
+
+    def session(self, journal, hours=8, injections=10):
+        journal.record(START)
+        journal.record(TIMER, 10)
+        for _ in range(injections):
+            self.clock.wall_offset += hours * 3600 / injections
+            journal.record_injection()
+        journal.record(STOP)
+
+    def test_sessions_survive_a_restart(self):
+        """Events written by one journal are summarized after reopening"""
+        journal = self.journal()
+        self.session(journal, injections=960)
+        journal.record(SHUTDOWN_SCHEDULED)
+        journal.record(SHUTDOWN_CANCELLED)
+        journal.close()
+
+        start, end = local(2026, 1, 1), local(2026, 1, 2)
+        summary = self.journal().summarize(start, end)
+        self.assertEqual(summary["sessions"], 1)
+        self.assertEqual(summary["injections"], 960)
+        self.assertEqual(summary["timers"], 1)
+        self.assertEqual((summary["shutdowns_scheduled"], summary["shutdowns_cancelled"]), (1, 1))
+        self.assertAlmostEqual(summary["active_seconds"], 8 * 3600)
+        # Injections are coalesced per bucket rather than stored one by one
+        records = list(read_range(self.tmp.name, start, end))
+        self.assertLess(sum(1 for record in records if record[1] == INJECT), 100)
+
+    def test_background_writer_batches(self):
+        journal = self.journal(flush_interval=0.05)
+        journal.start()
+        journal.record(START)
+        deadline = time.monotonic() + 2
+        while journal.records_written == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(journal.records_written, 1)
+        journal.close()
+
+    def test_torn_tail_is_cut_and_index_repaired(self):
+        """A crash mid-write leaves a partial record that the next open drops"""
+        journal = self.journal()
+        self.session(journal)
+        journal.close()
+        path = os.path.join(self.tmp.name, "journal-000001.bin")
+        size = os.path.getsize(path)
+        with open(path, "ab") as f:
+            f.write(b"\x01" * (RECORD.size + 5))
+        # The index entry for a day that never reached it is rebuilt from the data
+        self.clock.wall_offset += 86400
+        journal = self.journal()
+        journal.record(START)
+        journal.close()
+        self.assertEqual(journal.truncated, 2)
+        self.assertEqual(os.path.getsize(path), size + RECORD.size)
+        self.assertEqual(len(_read_index(self.tmp.name)), 2)
+
+    def test_index_rewrite_is_atomic(self):
+        """A failed index rewrite on open leaves the previous index whole"""
+        journal = self.journal()
+        self.session(journal)
+        journal.close()
+        before = _read_index(self.tmp.name)
+        self.assertTrue(before)
+        reopened = self.journal()
+        with mock.patch("session_journal.os.replace", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                reopened._open()
+        reopened._file.close()
+        self.assertEqual(_read_index(self.tmp.name), before)
+        self.assertEqual([name for name in os.listdir(self.tmp.name) if name.startswith(".")], [])
+
+    def test_rotation_and_year_range_query(self):
+        """A year of daily sessions spans several segments and still queries quickly"""
+        print("\n📚 Writing a year of sessions to the journal...")
+        journal = self.journal(max_bytes=64 * 1024)
+        for day in range(365):
+            self.clock.wall_offset = local(2025, 1, 1, 9, 0) + day * 86400
+            self.session(journal, hours=8, injections=96)
+            journal.flush()
+        journal.close()
+        self.assertGreater(len(_list_segments(self.tmp.name)), 3)
+
+        started = time.perf_counter()
+        year = summarize(read_range(self.tmp.name, local(2025, 1, 1), local(2026, 1, 1)),
+                         local(2025, 1, 1), local(2026, 1, 1))
+        elapsed = time.perf_counter() - started
+        self.assertEqual(year["sessions"], 365)
+        self.assertEqual(year["injections"], 365 * 96)
+        self.assertLess(elapsed, 0.5)
+
+        march = summarize(read_range(self.tmp.name, local(2025, 3, 1), local(2025, 4, 1)),
+                          local(2025, 3, 1), local(2025, 4, 1))
+        self.assertEqual(march["sessions"], 31)
+        print(f"✅ Year summarized in {elapsed * 1000.0:.1f} ms.")
+
+    def test_session_open_at_range_start(self):
+        records = [(100.0, INJECT, 5.0), (150.0, STOP, 0.0), (200.0, START, 0.0), (260.0, INJECT, 1.0)]
+        summary = summarize(iter(records), 50.0, 300.0)
+        self.assertEqual(summary["active_seconds"], 100.0 + 60.0)
+        self.assertEqual(summary["sessions"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import json
+import os
+import tempfile
+import unittest
+
+from clock import VirtualClock
+from timer_state import TimerState, discard_interrupted, parse_resume_arg, resume_delay
+
+
+class TestTimerState(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "state", "timer-state.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_saves_atomically_and_only_on_change(self):
+        state = TimerState(self.path)
+        self.assertTrue(state.save(True, "2 hours", 1000.0))
+        self.assertFalse(state.save(True, "2 hours", 1000.0))
+        self.assertEqual(state.writes, 1)
+        self.assertEqual(state.load()["deadline"], 1000.0)
+        # No temporary files are left next to the state file
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["timer-state.json"])
+        state.clear()
+        self.assertIsNone(state.load())
+
+    def test_unreadable_state_is_ignored(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, "w") as f:
+            f.write('{"version": 1, "act')
+        self.assertIsNone(TimerState(self.path).load())
+        with open(self.path, "w") as f:
+            json.dump({"version": 99, "active": True}, f)
+        self.assertIsNone(TimerState(self.path).load())
+
+    def test_resume_delay(self):
+        self.assertEqual(resume_delay({"active": True, "deadline": 500.0}, 200.0), 300.0)
+        self.assertEqual(resume_delay({"active": True, "deadline": 500.0}, 900.0), 0.0)
+        self.assertIsNone(resume_delay({"active": True, "deadline": None}, 200.0))
+        self.assertIsNone(resume_delay(None, 200.0))
+
+
+class TestConsoleResume(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "timer-state.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_app(self, clock, commands):
+        from console_keep_awake import KeepAwakeConsoleApp
+
+        app = KeepAwakeConsoleApp(clock=clock, shutdown_runner=commands.append)
+        app.inhibit_preference = "input"
+        app.timer_state = TimerState(self.path)
+        return app
+
+    def test_restart_resumes_the_countdown(self):
+        """A crashed session resumes with the time it had left, not a fresh timer"""
+        print("\n⏯️ Restarting in the middle of a 2 hour timer...")
+        clock = VirtualClock(wall_start=10000.0)
+        commands = []
+        app = self.make_app(clock, commands)
+        app.current_timer = "2 hours"
+        app.start_keep_awake()
+        writes = app.timer_state.writes
+        clock.advance(1800)
+        # Ticking the countdown writes nothing
+        self.assertEqual(app.timer_state.writes, writes)
+        # Killed: the scheduler dies with the process and nothing clears the state
+        app.scheduler.stop()
+        self.assertEqual(TimerState(self.path).load()["deadline"], 10000.0 + 7200)
+
+        clock = VirtualClock(wall_start=10000.0 + 1800 + 600)  # down for ten minutes
+        app = self.make_app(clock, commands)
+        try:
+            self.assertTrue(app.resume_session())
+            self.assertTrue(app.active)
+            self.assertEqual(app.current_timer, "2 hours")
+            self.assertEqual(app.update_remaining_time(), 7200 - 2400)
+            clock.advance(7200 - 2400)
+            self.assertTrue(app.shutdown_scheduled)
+        finally:
+            app.shutdown()
+        print("✅ Countdown resumed where it left off.")
+
+    def test_expired_deadline_fires_immediately(self):
+        TimerState(self.path).save(True, "1 hour", 500.0)
+        clock = VirtualClock(wall_start=9000.0)
+        app = self.make_app(clock, [])
+        try:
+            app.resume_session()
+            clock.advance(0)
+            self.assertTrue(app.shutdown_scheduled)
+        finally:
+            app.shutdown()
+
+    def test_explicit_stop_forgets_the_session(self):
+        app = self.make_app(VirtualClock(), [])
+        try:
+            app.current_timer = "1 hour"
+            app.start_keep_awake()
+            self.assertIsNotNone(app.timer_state.load())
+            app.stop_keep_awake()
+            self.assertIsNone(app.timer_state.load())
+            self.assertFalse(app.resume_session())
+        finally:
+            app.shutdown()
+
+    def test_deliberate_exit_forgets_the_session(self):
+        """Exiting on purpose (Ctrl+C, SIGTERM, quit) must not come back on the next launch"""
+        app = self.make_app(VirtualClock(), [])
+        app.current_timer = "1 hour"
+        app.start_keep_awake()
+        app.shutdown()
+        self.assertIsNone(TimerState(self.path).load())
+
+    def test_resume_is_opt_in(self):
+        TimerState(self.path).save(True, "1 hour", 500.0)
+        self.assertFalse(parse_resume_arg([]))
+        self.assertTrue(parse_resume_arg(["--resume"]))
+        self.assertFalse(parse_resume_arg(["--resume", "--no-resume"]))
+        # Without --resume the leftover session is dropped, so it cannot start a shutdown later
+        self.assertTrue(discard_interrupted(TimerState(self.path)))
+        self.assertIsNone(TimerState(self.path).load())
+        self.assertFalse(discard_interrupted(TimerState(self.path)))
+
+
+if __name__ == "__main__":
+    unittest.main()
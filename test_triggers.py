@@ -0,0 +1,152 @@
+import os
+import select
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from clock import VirtualClock
+from scheduler import Scheduler
+from triggers import (EventWatcher, FileIdleTrigger, ProcessExitTrigger, ThresholdTrigger, TriggerSet,
+                      parse_trigger_args)
+
+
+class TestTriggers(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = Scheduler()
+        self.scheduler.start()
+        self.fired = []
+        self.event = threading.Event()
+        self.set = TriggerSet(self.scheduler, self.on_fire)
+
+    def tearDown(self):
+        self.set.close()
+        self.scheduler.stop()
+
+    def on_fire(self, trigger):
+        self.fired.append((trigger, threading.current_thread().name))
+        self.event.set()
+
+    @unittest.skipUnless(hasattr(os, "pidfd_open"), "pidfd is not available")
+    def test_process_exit_fires_without_polling(self):
+        """A pidfd reports the exit immediately, on the scheduler thread"""
+        print("\n👀 Watching a child process exit...")
+        child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(0.2)"])
+        trigger = ProcessExitTrigger(pids=[child.pid])
+        self.set.add(trigger)
+        self.assertEqual(self.set.arm(), [])
+        self.assertIn("pidfd", trigger.describe())
+        self.assertFalse(self.event.wait(0.05))
+        child.wait()
+        self.assertTrue(self.event.wait(2))
+        self.assertEqual(self.fired, [(trigger, self.scheduler.name)])
+        self.assertEqual(trigger.watching, {})
+        print("✅ Exit detected.")
+
+    @unittest.skipUnless(hasattr(select, "epoll"), "epoll is not available")
+    def test_unregister_waits_for_a_running_handler(self):
+        """Once unregister returns the handler is done, so the caller may close the fd"""
+        watcher = EventWatcher()
+        read_fd, write_fd = os.pipe()
+        entered = threading.Event()
+        finished = []
+
+        def handler():
+            entered.set()
+            time.sleep(0.2)
+            os.read(read_fd, 64)
+            finished.append(True)
+
+        try:
+            watcher.register(read_fd, handler)
+            os.write(write_fd, b"x")
+            self.assertTrue(entered.wait(2))
+            watcher.unregister(read_fd)
+            self.assertEqual(finished, [True])
+        finally:
+            watcher.close()
+            os.close(read_fd)
+            os.close(write_fd)
+
+    def test_missing_process_cannot_be_armed(self):
+        self.set.add(ProcessExitTrigger(name="no-such-process-name"))
+        failed = self.set.arm()
+        self.assertEqual(len(failed), 1)
+
+    def test_file_idle_after_writes_stop(self):
+        """Writes push the quiet deadline back; silence fires the trigger"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "render.log")
+            open(path, "w").close()
+            trigger = FileIdleTrigger(path, minutes=0.3 / 60)
+            self.set.add(trigger)
+            self.assertEqual(self.set.arm(), [])
+            started = time.monotonic()
+            for _ in range(4):
+                time.sleep(0.1)
+                with open(path, "a") as f:
+                    f.write("frame\n")
+            self.assertFalse(self.event.is_set())
+            self.assertTrue(self.event.wait(2))
+            # Last write at ~0.4 s plus 0.3 s of silence
+            self.assertGreater(time.monotonic() - started, 0.6)
+
+
+class TestThresholdTrigger(unittest.TestCase):
+    def test_fires_after_sustained_low_readings(self):
+        """The condition must hold for the whole window; a spike restarts it"""
+        clock = VirtualClock()
+        scheduler = Scheduler(clock)
+        scheduler.start()
+        readings = iter([50, 2, 2, 2, 80] + [1] * 100)
+        fired = []
+        trigger = ThresholdTrigger("cpu", 5, minutes=1, interval=10, reader=lambda: next(readings))
+        trigger.arm(scheduler, None, fired.append)
+        clock.advance(50)  # a spike at 50 s resets the quiet period
+        self.assertEqual(fired, [])
+        clock.advance(60)
+        self.assertEqual(fired, [])
+        clock.advance(10)
+        self.assertEqual(fired, [trigger])
+        scheduler.stop()
+
+
+class TestParseTriggers(unittest.TestCase):
+    def test_parse_flags(self):
+        triggers, action = parse_trigger_args([
+            "--until-pid=12,34", "--until-cpu-below=5:15", "--until-file-idle=C:\\out\\a.log",
+            "--until-process=ffmpeg", "--on-trigger=stop"])
+        self.assertEqual(action, "stop")
+        self.assertEqual(triggers[0].initial_pids, {12, 34})
+        self.assertEqual((triggers[1].threshold, triggers[1].minutes), (5.0, 15.0))
+        self.assertTrue(triggers[2].path.endswith("a.log"))
+        self.assertEqual(triggers[2].minutes, 10)
+        self.assertEqual(triggers[3].name, "ffmpeg")
+
+
+class TestConsoleTrigger(unittest.TestCase):
+    def test_trigger_starts_shutdown_flow(self):
+        """A fired trigger goes through schedule_shutdown and the grace period"""
+        from console_keep_awake import KeepAwakeConsoleApp
+
+        clock = VirtualClock()
+        commands = []
+        app = KeepAwakeConsoleApp(clock=clock, shutdown_runner=commands.append)
+        try:
+            app.inhibit_preference = "input"
+            app.current_timer = "10 hours"
+            app.triggers.add(ThresholdTrigger("net", 10, minutes=5, reader=lambda: 0.0))
+            app.start_keep_awake()
+            clock.advance(5 * 60 + 10)
+            self.assertTrue(app.shutdown_scheduled)
+            self.assertFalse(app.timer_active)
+            clock.advance(60)
+            self.assertEqual(len(commands), 1)
+        finally:
+            app.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
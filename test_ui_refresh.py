@@ -0,0 +1,102 @@
+import threading
+import unittest
+
+from ui_refresh import RefreshLoop, UiQueue
+
+
+class FakeRoot:
+    """Stands in for Tk's after/after_cancel; run() plays the pending callbacks in time order"""
+
+    def __init__(self):
+        self.now = 0
+        self.jobs = {}
+        self.next_id = 0
+        self.visible = True
+
+    def after(self, ms, fn, *args):
+        self.next_id += 1
+        self.jobs[self.next_id] = (self.now + ms, fn, args)
+        return self.next_id
+
+    def after_cancel(self, job):
+        self.jobs.pop(job, None)
+
+    def run(self, until_ms):
+        while self.jobs:
+            job, (at, fn, args) = min(self.jobs.items(), key=lambda item: item[1][0])
+            if at > until_ms:
+                break
+            del self.jobs[job]
+            self.now = at
+            fn(*args)
+        self.now = until_ms
+
+
+class TestRefreshLoop(unittest.TestCase):
+    def setUp(self):
+        self.root = FakeRoot()
+        self.drawn = []
+        self.value = "a"
+        self.loop = RefreshLoop(self.root.after, self.root.after_cancel, lambda: self.root.visible,
+                                interval=1, hidden_interval=5)
+        self.loop.add("label", lambda: self.value, self.drawn.append)
+
+    def test_only_changed_values_are_redrawn(self):
+        self.loop.start()
+        self.root.run(10000)
+        self.assertEqual(self.drawn, ["a"])
+        self.value = "b"
+        self.root.run(11000)
+        self.assertEqual(self.drawn, ["a", "b"])
+        self.assertEqual(self.loop.redraws, 2)
+        self.assertEqual(self.loop.ticks, 12)
+
+    def test_hidden_window_pauses_labels_and_slows_down(self):
+        """While hidden, labels are left alone and the loop wakes 5x less often"""
+        print("\n🙈 Hiding the window during a countdown...")
+        tray = []
+        self.loop.add("tray", lambda: self.value, tray.append, visible_only=False)
+        self.loop.start()
+        self.root.visible = False
+        self.root.run(1000)
+        ticks = self.loop.ticks
+        self.value = "hidden"
+        self.root.run(61000)
+        self.assertEqual(self.loop.ticks - ticks, 12)
+        self.assertEqual(self.drawn, ["a"])
+        self.assertEqual(tray, ["a", "hidden"])
+        # Showing the window redraws at once
+        self.root.visible = True
+        self.loop.wake()
+        self.assertEqual(self.drawn, ["a", "hidden"])
+        print("✅ Hidden refreshes: 12 per minute instead of 60.")
+
+    def test_loop_stops_when_nothing_needs_it(self):
+        loop = RefreshLoop(self.root.after, self.root.after_cancel, lambda: False, interval=1)
+        loop.start()
+        self.assertEqual(self.root.jobs, {})
+
+
+class TestUiQueue(unittest.TestCase):
+    def test_bursts_share_one_wakeup(self):
+        """Updates posted from worker threads run in order on one drain"""
+        wakes = []
+        ui = UiQueue(lambda: wakes.append(1))
+        seen = []
+        threads = [threading.Thread(target=lambda i=i: [ui.post(seen.append, (i, n)) for n in range(50)])
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(wakes), 1)
+        ui.drain()
+        self.assertEqual(len(seen), 200)
+        for i in range(4):
+            self.assertEqual([n for t, n in seen if t == i], list(range(50)))
+        ui.post(seen.append, "later")
+        self.assertEqual(len(wakes), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+Persistent timer state for the Keep Awake Utility.
+While a session is active its timer is kept in a small JSON file as an
+absolute wall-clock deadline, so a crash, restart or reboot does not
+silently reset the countdown. A deliberate exit clears the file, and a
+session left behind is only picked up again with --resume. The file is
+rewritten only when the state changes (start, timer change, shutdown
+warning, stop), never per tick, and always atomically: a temporary file
+is written, synced and renamed over the old one, so a reader sees either
+the old state or the new one.
+"""
+
+import json
+import os
+import tempfile
+
+from session_journal import default_data_dir
+
+STATE_VERSION = 1
+
+
+def default_state_path():
+    return os.path.join(default_data_dir(), "timer-state.json")
+
+
+class TimerState:
+    def __init__(self, path=None):
+        self.path = path or default_state_path()
+        self.writes = 0
+        self._last = None
+
+    def load(self):
+        """The saved state as a dict, or None when there is none or it is unreadable"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(state, dict) or state.get("version") != STATE_VERSION:
+            return None
+        return state
+
+    def save(self, active, timer="Never", deadline=None, shutdown_scheduled=False):
+        """Record the session; deadline is the wall-clock time the timer runs out"""
+        state = {
+            "version": STATE_VERSION,
+            "active": bool(active),
+            "timer": timer,
+            "deadline": deadline,
+            "shutdown_scheduled": bool(shutdown_scheduled),
+        }
+        if state == self._last:
+            return False
+        self._write(json.dumps(state))
+        self._last = state
+        return True
+
+    def clear(self):
+        """Forget the session, e.g. after an explicit stop"""
+        self._last = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _write(self, text):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix=".timer-state-", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        self.writes += 1
+
+
+def resume_delay(state, now):
+    """Seconds left on a saved timer (0 if it already ran out), or None when it had no timer"""
+    if not state or not state.get("active") or state.get("deadline") is None:
+        return None
+    return max(0.0, state["deadline"] - now)
+
+
+def discard_interrupted(timer_state):
+    """Drop a session a crash left behind, saying how it could have been resumed; True if there was one"""
+    state = timer_state.load() if timer_state is not None else None
+    if not state or not state.get("active"):
+        return False
+    print("Note: The previous session did not exit cleanly and was not resumed (start with --resume to resume it)")
+    timer_state.clear()
+    return True
+
+
+def parse_resume_arg(argv):
+    """True when --resume asks to pick up a session a crash or restart left behind"""
+    return "--resume" in argv and "--no-resume" not in argv
+
+
+def parse_state_args(argv):
+    """State file path from --state-file=PATH; None when --no-resume is given"""
+    if "--no-resume" in argv:
+        return None
+    for arg in argv:
+        if arg.startswith("--state-file="):
+            return arg.split("=", 1)[1] or default_state_path()
+    return default_state_path()
@@ -0,0 +1,537 @@
+"""
+End-condition triggers for the Keep Awake Utility.
+Instead of guessing a fixed number of hours, keep-awake can end when a
+watched process exits, when CPU or network throughput stays low for a
+while, or when a file stops changing. Process exits are watched through
+pidfds and file changes through inotify, both on one epoll thread; where
+those are missing the triggers fall back to slow polling on the scheduler.
+Every trigger fires on the scheduler thread.
+"""
+
+import os
+import struct
+import sys
+import threading
+
+from startup import lazy_import
+
+ctypes = lazy_import("ctypes")
+select = lazy_import("select")
+
+# Minutes a condition must hold when the flag does not say
+DEFAULT_QUIET_MINUTES = 10
+# Seconds between readings for threshold triggers and polling fallbacks
+CONDITION_INTERVAL = 10
+POLL_INTERVAL = 5
+TRIGGER_ACTIONS = ["shutdown", "stop"]
+
+# inotify event bits (linux/inotify.h)
+IN_MODIFY = 0x002
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+FILE_CHANGE_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class TriggerError(Exception):
+    """Raised for trigger specs that cannot be watched"""
+
+
+class Inotify:
+    def __init__(self):
+        """Non-blocking inotify instance through libc"""
+        import ctypes.util
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path, mask):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        return wd
+
+    def read_events(self):
+        """Drain pending events as (wd, mask, name) tuples"""
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 4096)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset + INOTIFY_EVENT.size <= len(data):
+                wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                offset += INOTIFY_EVENT.size
+                name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+                offset += length
+                events.append((wd, mask, name))
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class EventWatcher:
+    def __init__(self):
+        """One epoll thread dispatching readable fds to handlers"""
+        self.epoll = select.epoll()
+        self.handlers = {}
+        self._lock = threading.Condition()
+        # fd whose handler is running right now; unregister waits for it
+        self._dispatching = None
+        self._running = True
+        self._wake_r, self._wake_w = os.pipe()
+        self.epoll.register(self._wake_r, select.EPOLLIN)
+        self.thread = threading.Thread(target=self._run, name="keep-awake-triggers", daemon=True)
+        self.thread.start()
+
+    def register(self, fd, handler):
+        with self._lock:
+            self.handlers[fd] = handler
+            self.epoll.register(fd, select.EPOLLIN)
+
+    def unregister(self, fd):
+        """Stop watching fd; on return its handler is neither running nor due, so fd may be closed"""
+        with self._lock:
+            if self.handlers.pop(fd, None) is not None:
+                try:
+                    self.epoll.unregister(fd)
+                except (OSError, ValueError):
+                    pass
+            if self.thread is not threading.current_thread():
+                self._lock.wait_for(lambda: self._dispatching != fd)
+
+    def _run(self):
+        while self._running:
+            try:
+                events = self.epoll.poll()
+            except InterruptedError:
+                continue
+            for fd, _ in events:
+                if fd == self._wake_r:
+                    os.read(self._wake_r, 64)
+                    continue
+                with self._lock:
+                    handler = self.handlers.get(fd)
+                    if handler is None:
+                        continue
+                    self._dispatching = fd
+                try:
+                    handler()
+                except Exception as e:
+                    print(f"Error in trigger watcher: {str(e)}")
+                finally:
+                    with self._lock:
+                        self._dispatching = None
+                        self._lock.notify_all()
+
+    def close(self):
+        self._running = False
+        os.write(self._wake_w, b"x")
+        if self.thread is not threading.current_thread():
+            self.thread.join(1)
+        self.epoll.close()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+
+def find_pids(name):
+    """PIDs of running processes called name, excluding this one"""
+    pids = set()
+    try:
+        import psutil
+        for proc in psutil.process_iter(["name"]):
+            if proc.info["name"] == name:
+                pids.add(proc.pid)
+    except ImportError:
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/comm") as f:
+                    if f.read().strip() == name:
+                        pids.add(int(entry))
+            except OSError:
+                continue
+    pids.discard(os.getpid())
+    return pids
+
+
+def pid_alive(pid):
+    try:
+        import psutil
+        return psutil.pid_exists(pid)
+    except ImportError:
+        pass
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Trigger:
+    kind = "trigger"
+
+    def __init__(self):
+        self.fired = False
+        self.scheduler = None
+        self._callback = None
+
+    def arm(self, scheduler, watcher, callback):
+        """Start watching; callback(trigger) runs once on the scheduler thread"""
+        self.fired = False
+        self.scheduler = scheduler
+        self._callback = callback
+
+    def disarm(self):
+        self._callback = None
+
+    def describe(self):
+        return self.kind
+
+    def fire(self):
+        callback = self._callback
+        if self.fired or callback is None:
+            return
+        self.fired = True
+        self.disarm()
+        self.scheduler.call_later(0, callback, self)
+
+
+class ProcessExitTrigger(Trigger):
+    kind = "process"
+
+    def __init__(self, pids=(), name=None):
+        """Fire once every watched PID (or every process called name) has exited"""
+        super().__init__()
+        self.initial_pids = set(pids)
+        self.name = name
+        self.watching = {}
+        self.poll_job = None
+        self.watcher = None
+
+    def describe(self):
+        target = f"'{self.name}'" if self.name else ", ".join(str(pid) for pid in sorted(self.initial_pids))
+        method = "polling" if self.poll_job is not None else "pidfd"
+        return f"when process {target} exits ({len(self.watching)} running, {method})"
+
+    def arm(self, scheduler, watcher, callback):
+        super().arm(scheduler, watcher, callback)
+        self.watcher = watcher
+        pids = set(self.initial_pids)
+        if self.name:
+            pids |= find_pids(self.name)
+        if not pids:
+            raise TriggerError(f"No running process matches {self.name or sorted(self.initial_pids)}")
+        for pid in pids:
+            self._watch(pid)
+        if not self.watching:
+            # Everything exited between lookup and watch
+            self.fire()
+
+    def _watch(self, pid):
+        if pid in self.watching:
+            return
+        if self.watcher is not None and hasattr(os, "pidfd_open"):
+            try:
+                fd = os.pidfd_open(pid)
+            except ProcessLookupError:
+                return
+            except OSError:
+                fd = None
+            if fd is not None:
+                self.watching[pid] = fd
+                self.watcher.register(fd, lambda: self._pidfd_ready(fd, pid))
+                return
+        if not pid_alive(pid):
+            return
+        self.watching[pid] = None
+        if self.poll_job is None:
+            self.poll_job = self.scheduler.call_every(POLL_INTERVAL, self._poll)
+
+    def _poll(self):
+        for pid, fd in list(self.watching.items()):
+            if fd is None and not pid_alive(pid):
+                self._exited(pid)
+
+    def _pidfd_ready(self, fd, pid):
+        # On the watcher thread: a pidfd stays readable once its process exits, so stop
+        # polling it here and leave the watch bookkeeping to the scheduler thread
+        self.watcher.unregister(fd)
+        self.scheduler.call_later(0, self._exited, pid)
+
+    def _exited(self, pid):
+        """Runs on the scheduler thread, like arm and disarm, so they never race over watching"""
+        fd = self.watching.pop(pid, None)
+        if fd is not None:
+            self.watcher.unregister(fd)
+            os.close(fd)
+        if self.watching or self._callback is None:
+            return
+        # A render farm or build may start a fresh process with the same name
+        if self.name:
+            for new_pid in find_pids(self.name):
+                self._watch(new_pid)
+        if not self.watching:
+            self.fire()
+
+    def disarm(self):
+        super().disarm()
+        if self.poll_job is not None:
+            self.poll_job.cancel()
+            self.poll_job = None
+        for pid in list(self.watching):
+            fd = self.watching.pop(pid, None)
+            if fd is not None:
+                self.watcher.unregister(fd)
+                os.close(fd)
+
+
+class ThresholdTrigger(Trigger):
+    kind = "threshold"
+
+    def __init__(self, metric, threshold, minutes=DEFAULT_QUIET_MINUTES, interval=CONDITION_INTERVAL, reader=None):
+        """Fire when reader() stays below threshold for `minutes`"""
+        super().__init__()
+        self.metric = metric
+        self.threshold = threshold
+        self.minutes = minutes
+        self.interval = interval
+        self.reader = reader
+        self.below_since = None
+        self.job = None
+
+    def describe(self):
+        unit = "%" if self.metric == "cpu" else " KB/s"
+        state = ""
+        if self.below_since is not None and self.scheduler is not None:
+            state = f", quiet for {(self.scheduler.clock() - self.below_since) / 60.0:.1f} min"
+        return f"when {self.metric} stays below {self.threshold:g}{unit} for {self.minutes:g} min{state}"
+
+    def arm(self, scheduler, watcher, callback):
+        super().arm(scheduler, watcher, callback)
+        if self.reader is None:
+            self.reader = make_reader(self.metric, scheduler.clock)
+        self.below_since = None
+        self.job = scheduler.call_every(self.interval, self.check)
+
+    def check(self):
+        value = self.reader()
+        if value is None:
+            return
+        now = self.scheduler.clock()
+        if value >= self.threshold:
+            self.below_since = None
+        elif self.below_since is None:
+            self.below_since = now
+        elif now - self.below_since >= self.minutes * 60:
+            self.fire()
+
+    def disarm(self):
+        super().disarm()
+        if self.job is not None:
+            self.job.cancel()
+            self.job = None
+
+
+def make_reader(metric, clock):
+    """Reading function for a threshold metric: CPU percent or network KB/s"""
+    import psutil
+    if metric == "cpu":
+        psutil.cpu_percent(interval=None)
+        return lambda: psutil.cpu_percent(interval=None)
+
+    last = {}
+
+    def net_rate():
+        counters = psutil.net_io_counters()
+        total = counters.bytes_sent + counters.bytes_recv
+        now = clock()
+        rate = None
+        if last and now > last["time"]:
+            rate = (total - last["total"]) / (now - last["time"]) / 1024.0
+        last.update(total=total, time=now)
+        return rate
+
+    net_rate()
+    return net_rate
+
+
+class FileIdleTrigger(Trigger):
+    kind = "file"
+
+    def __init__(self, path, minutes=DEFAULT_QUIET_MINUTES):
+        """Fire once path has not changed for `minutes`"""
+        super().__init__()
+        self.path = os.path.abspath(path)
+        self.minutes = minutes
+        self.last_change = None
+        self.inotify = None
+        self.watcher = None
+        self.job = None
+        self.poll_job = None
+        self._stat = None
+        self._name = None
+
+    def describe(self):
+        method = "inotify" if self.inotify is not None else "polling"
+        state = ""
+        if self.last_change is not None and self.scheduler is not None:
+            state = f", unchanged for {(self.scheduler.clock() - self.last_change) / 60.0:.1f} min"
+        return f"when {self.path} stops changing for {self.minutes:g} min ({method}{state})"
+
+    def arm(self, scheduler, watcher, callback):
+        super().arm(scheduler, watcher, callback)
+        self.watcher = watcher
+        self.last_change = scheduler.clock()
+        if watcher is not None and sys.platform.startswith("linux"):
+            try:
+                self.inotify = Inotify()
+                # Watch the directory so atomic replaces and re-creates are seen too
+                if os.path.isdir(self.path):
+                    self.inotify.add_watch(self.path, FILE_CHANGE_MASK)
+                    self._name = None
+                else:
+                    self.inotify.add_watch(os.path.dirname(self.path), FILE_CHANGE_MASK)
+                    self._name = os.path.basename(self.path)
+                watcher.register(self.inotify.fd, self._on_events)
+            except OSError:
+                if self.inotify is not None:
+                    self.inotify.close()
+                self.inotify = None
+        if self.inotify is None:
+            self._stat = self._read_stat()
+            self.poll_job = scheduler.call_every(POLL_INTERVAL, self._poll)
+        self.job = scheduler.call_later(self.minutes * 60, self._check_quiet)
+
+    def _on_events(self):
+        for _, _, name in self.inotify.read_events():
+            if self._name is None or name == self._name:
+                self.last_change = self.scheduler.clock()
+
+    def _read_stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _poll(self):
+        current = self._read_stat()
+        if current != self._stat:
+            self._stat = current
+            self.last_change = self.scheduler.clock()
+
+    def _check_quiet(self):
+        if self._callback is None:
+            return
+        # Events only move last_change; the single deadline job is re-armed here
+        quiet_for = self.scheduler.clock() - self.last_change
+        if quiet_for >= self.minutes * 60:
+            self.fire()
+        else:
+            self.job = self.scheduler.call_later(self.minutes * 60 - quiet_for, self._check_quiet)
+
+    def disarm(self):
+        super().disarm()
+        for job in (self.job, self.poll_job):
+            if job is not None:
+                job.cancel()
+        self.job = self.poll_job = None
+        if self.inotify is not None:
+            self.watcher.unregister(self.inotify.fd)
+            self.inotify.close()
+            self.inotify = None
+
+
+class TriggerSet:
+    def __init__(self, scheduler, on_fire, action="shutdown"):
+        """The triggers of one app, armed while keep-awake is active"""
+        self.scheduler = scheduler
+        self.on_fire = on_fire
+        self.action = action
+        self.triggers = []
+        self.watcher = None
+
+    def add(self, trigger):
+        self.triggers.append(trigger)
+
+    def arm(self):
+        """Arm every trigger; returns the list of (trigger, error) that could not be armed"""
+        failed = []
+        if self.triggers and self.watcher is None and hasattr(select, "epoll"):
+            try:
+                self.watcher = EventWatcher()
+            except OSError:
+                self.watcher = None
+        for trigger in self.triggers:
+            try:
+                trigger.arm(self.scheduler, self.watcher, self.on_fire)
+            except (TriggerError, OSError, ImportError) as e:
+                trigger.disarm()
+                failed.append((trigger, e))
+        return failed
+
+    def disarm(self):
+        for trigger in self.triggers:
+            trigger.disarm()
+
+    def close(self):
+        self.disarm()
+        if self.watcher is not None:
+            self.watcher.close()
+            self.watcher = None
+
+    def describe(self):
+        return [trigger.describe() for trigger in self.triggers]
+
+
+def _split_minutes(value):
+    """'X:MINUTES' -> ('X', minutes); a trailing non-number stays part of X (Windows paths)"""
+    head, sep, tail = value.rpartition(":")
+    if sep:
+        try:
+            return head, float(tail)
+        except ValueError:
+            pass
+    return value, DEFAULT_QUIET_MINUTES
+
+
+def parse_trigger_args(argv):
+    """Build triggers and the trigger action from --until-*/--on-trigger flags"""
+    triggers = []
+    action = "shutdown"
+    for arg in argv:
+        if not arg.startswith("--until-") and not arg.startswith("--on-trigger="):
+            continue
+        flag, _, value = arg.partition("=")
+        try:
+            if flag == "--until-pid":
+                triggers.append(ProcessExitTrigger(pids=[int(pid) for pid in value.split(",")]))
+            elif flag == "--until-process":
+                triggers.append(ProcessExitTrigger(name=value))
+            elif flag in ("--until-cpu-below", "--until-net-below"):
+                threshold, minutes = _split_minutes(value)
+                metric = "cpu" if flag == "--until-cpu-below" else "net"
+                triggers.append(ThresholdTrigger(metric, float(threshold), minutes))
+            elif flag == "--until-file-idle":
+                path, minutes = _split_minutes(value)
+                triggers.append(FileIdleTrigger(path, minutes))
+            elif flag == "--on-trigger":
+                if value not in TRIGGER_ACTIONS:
+                    raise ValueError(value)
+                action = value
+            else:
+                print(f"Warning: Unknown trigger option: {arg}")
+        except ValueError:
+            print(f"Warning: Invalid trigger parameter: {arg}")
+    return triggers, action
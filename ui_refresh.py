@@ -0,0 +1,109 @@
+"""
+UI refresh for the Keep Awake Utility GUI.
+Worker threads (scheduler, tray, control socket) never touch Tk. They
+post callables to one UiQueue, which wakes the Tk thread once per burst
+rather than once per update. Periodic display values (countdown, tray
+tooltip and icon) are redrawn by a single RefreshLoop on the Tk thread:
+each field is recomputed every tick but only redrawn when its value
+changed, fields marked visible-only are skipped while the window is
+hidden, and the loop slows down (or stops entirely) while nothing on
+screen needs it.
+"""
+
+import queue
+import threading
+
+
+class UiQueue:
+    def __init__(self, wake):
+        """wake() must arrange for drain() to run on the UI thread (e.g. root.after(0, ...))"""
+        self.wake = wake
+        self.posted = 0
+        self.wakeups = 0
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._scheduled = False
+
+    def post(self, fn, *args):
+        """Run fn(*args) on the UI thread; safe from any thread"""
+        self._queue.put((fn, args))
+        with self._lock:
+            self.posted += 1
+            if self._scheduled:
+                return
+            self._scheduled = True
+            self.wakeups += 1
+        self.wake()
+
+    def drain(self):
+        """Run everything posted so far; called on the UI thread"""
+        with self._lock:
+            self._scheduled = False
+        while True:
+            try:
+                fn, args = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"Error in UI update: {str(e)}")
+
+
+class RefreshLoop:
+    def __init__(self, after, cancel, is_visible, interval=1.0, hidden_interval=None):
+        """Tick every interval seconds while visible, every hidden_interval (None = never) while hidden"""
+        self.after = after
+        self.cancel = cancel
+        self.is_visible = is_visible
+        self.interval = interval
+        self.hidden_interval = hidden_interval
+        self.fields = []
+        self.last = {}
+        self.ticks = 0
+        self.redraws = 0
+        self._job = None
+
+    def add(self, name, compute, draw, visible_only=True):
+        """Redraw draw(value) whenever compute() returns something new"""
+        self.fields.append((name, compute, draw, visible_only))
+
+    def start(self):
+        self.wake()
+
+    def stop(self):
+        if self._job is not None:
+            self.cancel(self._job)
+            self._job = None
+
+    def wake(self):
+        """Refresh now and restart the timer, e.g. when the window is shown again"""
+        self.stop()
+        self.tick()
+
+    def invalidate(self, name=None):
+        """Force a redraw of name (or every field) on the next tick"""
+        if name is None:
+            self.last.clear()
+        else:
+            self.last.pop(name, None)
+
+    def tick(self):
+        self._job = None
+        self.ticks += 1
+        visible = self.is_visible()
+        for name, compute, draw, visible_only in self.fields:
+            if visible_only and not visible:
+                continue
+            value = compute()
+            if name in self.last and self.last[name] == value:
+                continue
+            self.last[name] = value
+            self.redraws += 1
+            draw(value)
+        delay = self.interval if visible else self.hidden_interval
+        if delay is not None:
+            self._job = self.after(int(delay * 1000), self.tick)
+
+    def stats(self):
+        return {"ticks": self.ticks, "redraws": self.redraws}